@@ -1,157 +1,272 @@
 """
 CIIA Enhanced Vercel Function with Intelligent Context Retrieval
 Fixed version - handles ServiceNow API response correctly
+
+Cold starts: module import only loads the standard library and the light
+ciia modules, so a GET health check never loads the Groq SDK, requests or
+NumPy. The environment is read once per process (enrichment_config); the
+first POST also starts building the shared Groq client in the background
+while ServiceNow is queried. NumPy is imported only for ranking and for
+searching the local incident store or vector index.
+
+Every request runs against a Deadline (ciia/deadline.py) started on entry:
+ServiceNow and Groq calls take their timeouts from what is left of it, the
+similar-incident search and the Groq analysis are skipped or cut short when
+it runs low, and the work-note PATCH always has a reserved slice, so a
+partial enrichment is written instead of the platform timing the function out.
+Async jobs are not under the function timeout and get their own budgets
+(CIIA_JOB_DEADLINE_S, CIIA_BATCH_DEADLINE_S; none by default).
 """
 
 from http.server import BaseHTTPRequestHandler
 import json
 import os
-import re
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from typing import List, Dict, Any
+from urllib.parse import urlparse, parse_qs
 
-try:
-    from groq import Groq
-    import requests
-    from requests.auth import HTTPBasicAuth
-except ImportError as e:
-    print(f"Import error: {e}")
+# Shared library lives at the project root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Only light modules here; NumPy (ranking, store signatures, vector index),
+# requests and the Groq SDK are imported on first use
+from ciia.http_pool import get_session, table_url, pool_stats
+from ciia.fields import table_params
+from ciia.search_index import configured_index, index_settings
+from ciia.incident_store import configured_store, get_store, store_settings
+from ciia.resolutions import extract_resolution, has_resolution
+from ciia.resolution_kb import configured_kb
+from ciia.keywords import extract_keywords
+from ciia.llm_cache import configured_cache, cache_key
+from ciia.jobs import configured_queue, ensure_workers, queue_settings, worker_pool, job_view
+from ciia.batch import SharedSearches, FETCH_CHUNK, chunked, sys_id_query, unique
+from ciia.candidate_cache import candidate_cache_settings, configured_candidate_cache, MISS, STALE
+from ciia.coalesce import enrichment_flight
+from ciia.groq_client import shared_groq, groq_scheduler
+from ciia.prompt_budget import fit_prompt, configured_budget
+from ciia.timing import StageTimer, server_timing, log_timings, stage_stats
+from ciia.fingerprints import configured_fingerprints, enrichment_fingerprint
+from ciia.deadline import (Deadline, DeadlineExceeded, DEFAULT_IO_TIMEOUT_S, MIN_CALL_S,
+                           configured_batch_deadline_s, configured_deadline_s, configured_job_deadline_s,
+                           configured_reserve_s)
 
-class handler(BaseHTTPRequestHandler):
-    """Enhanced Vercel serverless handler with smart context"""
+
+ANALYSIS_MODEL = "llama-3.1-8b-instant"
+ANALYSIS_TEMPERATURE = 0.5
+ANALYSIS_MAX_TOKENS = 2000
+ANALYSIS_SYSTEM_PROMPT = "You are a senior L3 incident analyst."
+
+# Part of every enrichment fingerprint: bump when search, ranking or prompt
+# changes should re-enrich incidents whose fields have not changed
+RETRIEVAL_VERSION = '1'
+
+# Per-call caps; the request deadline shortens them as it runs out
+SEARCH_TIMEOUT_S = 10
+BATCH_FETCH_TIMEOUT_S = 30
+
+# Optional stages are skipped when less than this is left above the reserve
+SEARCH_MIN_S = 0.5
+ANALYSIS_MIN_S = 2.0
+
+# Requests that run even when only the write-back reserve is left
+ESSENTIAL_REQUESTS = ('fetch', 'update')
+
+ANALYSIS_SKIPPED = ("AI analysis skipped: the enrichment's time budget ran out before the model could be called."
+                    "\n\nPlease review the similar incidents and resolutions below.")
+ANALYSIS_TRUNCATED = "\n\n[Analysis cut short by the enrichment time budget]"
+
+
+class IncidentEnricher:
+    """Enrichment pipeline: fetch, search, extract, analyze, write back
+
+    Runs inside the request handler (sync mode) or on a job worker (async mode).
+    """
     
-    def do_POST(self):
-        """Handle POST requests from ServiceNow"""
-        try:
-            content_length = int(self.headers['Content-Length'])
-            post_data = self.rfile.read(content_length)
-            body = json.loads(post_data.decode('utf-8'))
-            
-            if 'incident_sys_id' not in body:
-                self.send_error_response(400, 'Missing incident_sys_id')
-                return
-            
-            snow_instance = os.environ.get('SNOW_INSTANCE')
-            snow_user = os.environ.get('SNOW_USER')
-            snow_password = os.environ.get('SNOW_PASSWORD')
-            groq_api_key = os.environ.get('GROQ_API_KEY')
-            
-            if not all([snow_instance, snow_user, snow_password, groq_api_key]):
-                self.send_error_response(500, 'Missing environment variables')
-                return
-            
-            incident_sys_id = body['incident_sys_id']
-            
-            result = self.enrich_incident(
-                incident_sys_id,
-                snow_instance,
-                snow_user,
-                snow_password,
-                groq_api_key
-            )
+    def enrich_incident(self, incident_sys_id, snow_instance, snow_user, snow_password, groq_api_key,
+                        deadline=None, force=False):
+        """Main enrichment logic with intelligent context
+        
+        An incident whose fingerprint matches its last enrichment is skipped
+        after the fetch unless `force` is set. Without a `deadline` the run
+        has no time budget.
+        """
+        
+        def run():
+            self.timer = StageTimer()
+            self.deadline = deadline or Deadline(None)
+            self.force = force
             
-            self.send_response(200)
-            self.send_header('Content-type', 'application/json')
-            self.end_headers()
-            self.wfile.write(json.dumps(result).encode())
+            # 1. Fetch current incident (projected to the fields we use)
+            with self.timer.stage('fetch'):
+                incident = self.fetch_incident_detailed(
+                    incident_sys_id,
+                    snow_instance,
+                    snow_user,
+                    snow_password
+                )
+            self._emit('progress', stage='fetch', incident_number=incident.get('number'))
             
-        except Exception as e:
-            import traceback
-            error_detail = traceback.format_exc()
-            self.send_error_response(500, f"{str(e)} | Trace: {error_detail}")
-    
-    def do_GET(self):
-        """Health check endpoint"""
-        self.send_response(200)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        response = {
-            'status': 'healthy',
-            'service': 'CIIA Enhanced Enrichment API',
-            'version': '2.0.1'
-        }
-        self.wfile.write(json.dumps(response).encode())
+            return self.enrich_fetched_incident(incident, snow_instance, snow_user, snow_password, groq_api_key)
+        
+        return self._coalesced(incident_sys_id, run, force)
     
-    def send_error_response(self, code, message):
-        """Send error response"""
-        self.send_response(code)
-        self.send_header('Content-type', 'application/json')
-        self.end_headers()
-        error = {'error': message}
-        self.wfile.write(json.dumps(error).encode())
+    def _coalesced(self, incident_sys_id, run, force=False):
+        """Run once per incident: repeat triggers join the in-flight or just-finished run
+        
+        A forced run never reuses another run's result; later triggers in
+        the window reuse the forced one.
+        """
+        
+        result, coalesced = enrichment_flight().do(incident_sys_id, run, fresh=force)
+        if coalesced:
+            result = dict(result, coalesced=coalesced)
+        return result
     
-    def enrich_incident(self, incident_sys_id, snow_instance, snow_user, snow_password, groq_api_key):
-        """Main enrichment logic with intelligent context"""
+    def enrich_fetched_incident(self, incident, snow_instance, snow_user, snow_password, groq_api_key):
+        """Steps 2-6 for an incident record that has already been fetched"""
         
-        # 1. Fetch current incident with ALL fields
-        incident = self.fetch_incident_detailed(
-            incident_sys_id,
-            snow_instance,
-            snow_user,
-            snow_password
-        )
+        incident_sys_id = incident['sys_id']
+        if getattr(self, 'timer', None) is None:
+            self.timer = StageTimer()
+        if getattr(self, 'deadline', None) is None:
+            self.deadline = Deadline(None)
+        timer = self.timer
+        deadline = self.deadline
         
-        # 2. Intelligent similar incident search
-        similar_incidents = self.search_similar_incidents_smart(
-            incident,
-            snow_instance,
-            snow_user,
-            snow_password
-        )
+        # Unchanged since the last enrichment: don't search, analyze or append another note
+        fingerprints = configured_fingerprints()
+        fingerprint = None
+        if fingerprints is not None:
+            fingerprint = enrichment_fingerprint(incident, self.retrieval_version())
+            previous = fingerprints.check(incident_sys_id, fingerprint, force=getattr(self, 'force', False))
+            if previous is not None:
+                self._emit('progress', stage='skipped', reason='unchanged')
+                return {
+                    'status': 'skipped',
+                    'reason': 'unchanged',
+                    'incident_number': incident.get('number', 'Unknown'),
+                    'fingerprint': fingerprint[:16],
+                    'previous': previous,
+                    'timings': timer.as_dict()
+                }
+        
+        # 2. Intelligent similar incident search (optional under the deadline)
+        if deadline.allows(SEARCH_MIN_S):
+            with timer.stage('search'):
+                similar_incidents = self.search_similar_incidents_smart(
+                    incident,
+                    snow_instance,
+                    snow_user,
+                    snow_password
+                )
+        else:
+            deadline.skip('search', 'budget low')
+            similar_incidents = []
+            self.search_stats = {'skipped': 'deadline'}
+        self._emit('progress', stage='search', similar_found=len(similar_incidents))
         
         # 3. Extract resolutions from similar tickets
-        resolution_knowledge = self.extract_resolution_intelligence(
-            similar_incidents
-        )
+        with timer.stage('extract'):
+            resolution_knowledge = self.extract_resolution_intelligence(
+                similar_incidents
+            )
+        self._emit('progress', stage='resolutions', resolutions_extracted=len(resolution_knowledge))
         
         # 4. Two-stage AI analysis
-        analysis = self.analyze_with_groq_enhanced(
-            incident,
-            similar_incidents,
-            resolution_knowledge,
-            groq_api_key
-        )
+        with timer.stage('analyze'):
+            analysis = self.analyze_with_groq_enhanced(
+                incident,
+                similar_incidents,
+                resolution_knowledge,
+                groq_api_key
+            )
         
         # 5. Format enrichment
-        enrichment = self.format_enrichment_enhanced(
-            analysis,
-            similar_incidents,
-            resolution_knowledge
-        )
+        with timer.stage('format'):
+            enrichment = self.format_enrichment_enhanced(
+                analysis,
+                similar_incidents,
+                resolution_knowledge
+            )
         
         # 6. Update incident
-        incident_url = f"https://{snow_instance}/api/now/table/incident/{incident_sys_id}"
-        auth = HTTPBasicAuth(snow_user, snow_password)
+        incident_url = f"{table_url(snow_instance)}/{incident_sys_id}"
+        session = get_session(snow_instance, snow_user, snow_password)
         
-        update_response = requests.patch(
-            incident_url,
-            auth=auth,
-            headers={"Content-Type": "application/json"},
-            data=json.dumps({"work_notes": enrichment})
-        )
+        with timer.stage('update'):
+            update_response = self._snow_request(
+                'update',
+                session.patch,
+                incident_url,
+                headers={"Content-Type": "application/json"},
+                data=json.dumps({"work_notes": enrichment})
+            )
         
         if update_response.status_code != 200:
             raise Exception(f'Failed to update incident: {update_response.text}')
+        self._emit('progress', stage='update')
         
-        return {
-            'status': 'success',
+        timings = timer.as_dict()
+        stage_stats.observe(timings)
+        log_timings(timings, incident=incident.get('number'), sys_id=incident_sys_id)
+        
+        # Partial runs and failed analyses are not recorded, so the next trigger retries them
+        summary = {
             'incident_number': incident.get('number', 'Unknown'),
             'similar_found': len(similar_incidents),
-            'resolutions_extracted': len(resolution_knowledge),
+            'resolutions_extracted': len(resolution_knowledge)
+        }
+        if fingerprint and not deadline.skipped and 'error' not in self.analysis_stats:
+            fingerprints.record(incident_sys_id, fingerprint, summary)
+        
+        return {
+            'status': 'success',
+            'partial': bool(deadline.skipped),
+            'fingerprint': fingerprint[:16] if fingerprint else None,
+            **summary,
+            'search': getattr(self, 'search_stats', None),
+            'analysis': getattr(self, 'analysis_stats', None),
+            'prompt': getattr(self, 'prompt_stats', None),
+            'timings': timings,
+            'deadline': deadline.as_dict(),
             'enriched_at': datetime.utcnow().isoformat()
         }
     
+    def retrieval_version(self):
+        """What besides the incident decides the enrichment: code version, model, local store sync"""
+        
+        parts = [RETRIEVAL_VERSION, ANALYSIS_MODEL]
+        store = local_store()
+        if store is not None:
+            try:
+                parts.append(store.sync_metrics().get('watermark') or '')
+            except Exception as e:
+                print(f"Store watermark lookup error: {e}")
+        index = vector_index()
+        if index is not None:
+            try:
+                parts.append(index.meta().get('updated_at') or '')
+            except Exception as e:
+                print(f"Vector index version lookup error: {e}")
+        return '|'.join(parts)
+    
     def fetch_incident_detailed(self, incident_sys_id, snow_instance, snow_user, snow_password):
-        """Fetch incident with all relevant fields - FIXED VERSION"""
+        """Fetch incident with the fields the pipeline reads - FIXED VERSION"""
         
-        incident_url = f"https://{snow_instance}/api/now/table/incident/{incident_sys_id}"
-        auth = HTTPBasicAuth(snow_user, snow_password)
+        incident_url = f"{table_url(snow_instance)}/{incident_sys_id}"
+        session = get_session(snow_instance, snow_user, snow_password)
         
-        response = requests.get(
+        response = self._snow_request(
+            'fetch',
+            session.get,
             incident_url,
-            auth=auth,
-            headers={"Accept": "application/json"}
+            headers={"Accept": "application/json"},
+            params=table_params('incident_detail')
         )
         
         if response.status_code != 200:
@@ -171,14 +286,200 @@ class handler(BaseHTTPRequestHandler):
         
         return incident
     
+    def enrich_batch(self, incident_sys_ids, snow_instance, snow_user, snow_password, groq_api_key,
+                     deadline=None, force=False):
+        """Enrich many incidents with one fetch and shared similar-incident searches
+        
+        Incidents are fetched with `sys_idIN` queries, identical ServiceNow
+        searches are issued once per batch, and the per-incident analyses run
+        on CIIA_BATCH_CONCURRENCY workers (default 4). All incidents share the
+        batch's deadline (none if not given); one that has not started when
+        too little of it is left for an analysis is reported as not started
+        instead of written.
+        """
+        
+        started = time.monotonic()
+        sys_ids = unique(incident_sys_ids)
+        shared = SharedSearches()
+        self.shared_searches = shared
+        self.timer = StageTimer()
+        self.deadline = deadline = deadline or Deadline(None)
+        
+        with self.timer.stage('fetch'):
+            incidents = self.fetch_incidents_batch(sys_ids, snow_instance, snow_user, snow_password)
+        
+        def enrich_one(incident):
+            if not deadline.allows(ANALYSIS_MIN_S):
+                return {'status': 'error', 'error': 'Deadline reached before the incident was started',
+                        'not_started': True}
+            # Separate enricher per incident: search/analysis stats are per run
+            enricher = IncidentEnricher()
+            enricher.shared_searches = shared
+            enricher.deadline = deadline.share()
+            enricher.force = force
+            return enricher._coalesced(
+                incident['sys_id'],
+                lambda: enricher.enrich_fetched_incident(incident, snow_instance, snow_user, snow_password, groq_api_key),
+                force
+            )
+        
+        results = {}
+        found = [incidents[sys_id] for sys_id in sys_ids if sys_id in incidents]
+        concurrency = enrichment_config()['batch_concurrency']
+        if found:
+            with self.timer.stage('enrich'), ThreadPoolExecutor(max_workers=min(concurrency, len(found))) as pool:
+                futures = {pool.submit(enrich_one, incident): incident['sys_id'] for incident in found}
+                for future in as_completed(futures):
+                    sys_id = futures[future]
+                    try:
+                        results[sys_id] = future.result()
+                    except Exception as e:
+                        results[sys_id] = {'status': 'error', 'error': str(e)}
+        
+        per_incident = []
+        for sys_id in sys_ids:
+            result = results.get(sys_id, {'status': 'error', 'error': 'Incident not found'})
+            per_incident.append(dict(result, incident_sys_id=sys_id))
+        
+        succeeded = sum(1 for r in per_incident if r['status'] in ('success', 'skipped'))
+        return {
+            'status': 'success' if succeeded == len(per_incident) else ('partial' if succeeded else 'error'),
+            'incidents': len(per_incident),
+            'succeeded': succeeded,
+            'skipped': sum(1 for r in per_incident if r['status'] == 'skipped'),
+            'results': per_incident,
+            'batch': shared.stats(),
+            'timings': self.timer.as_dict(),
+            'deadline': deadline.as_dict(),
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+            'enriched_at': datetime.utcnow().isoformat()
+        }
+    
+    def fetch_incidents_batch(self, sys_ids, snow_instance, snow_user, snow_password):
+        """sys_id -> incident for every sys_id that exists, via `sys_idIN` queries"""
+        
+        session = get_session(snow_instance, snow_user, snow_password)
+        incidents = {}
+        for chunk in chunked(sys_ids, FETCH_CHUNK):
+            response = self._snow_request(
+                'fetch',
+                session.get,
+                table_url(snow_instance),
+                headers={"Accept": "application/json"},
+                params=table_params(
+                    'incident_detail',
+                    sysparm_query=sys_id_query(chunk),
+                    sysparm_limit=len(chunk)
+                ),
+                timeout=BATCH_FETCH_TIMEOUT_S
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f'Failed to fetch incidents: HTTP {response.status_code} - {response.text}')
+            
+            for incident in response.json().get('result', []):
+                incidents[incident.get('sys_id')] = incident
+        
+        return incidents
+    
+    def _emit(self, event, **data):
+        """Report pipeline progress to a streaming caller, if there is one"""
+        sink = getattr(self, 'event_sink', None)
+        if sink is not None:
+            sink(dict(data, event=event))
+    
+    def _snow_request(self, kind, method, url, strategy=None, timeout=None, **kwargs):
+        """One ServiceNow round trip, timed on the run's StageTimer and counted for batches
+        
+        The timeout comes from the run's deadline (capped at `timeout`);
+        raises DeadlineExceeded without calling when too little is left.
+        """
+        
+        timeout = self._io_timeout(kind, timeout)
+        started = time.monotonic()
+        status = 'error'
+        try:
+            response = method(url, timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            self._count_request(kind)
+            timer = getattr(self, 'timer', None)
+            if timer is not None:
+                attrs = {'strategy': strategy} if strategy else {}
+                timer.add_query(kind, (time.monotonic() - started) * 1000, status=status, **attrs)
+    
+    def _io_timeout(self, kind, cap=None):
+        """Seconds the next `kind` request may take under the run's deadline"""
+        
+        deadline = getattr(self, 'deadline', None)
+        if deadline is None:
+            return cap or DEFAULT_IO_TIMEOUT_S
+        return deadline.timeout(cap, essential=kind in ESSENTIAL_REQUESTS)
+    
+    def _count_request(self, kind):
+        """Count a ServiceNow round trip when running inside a batch"""
+        shared = getattr(self, 'shared_searches', None)
+        if shared is not None:
+            shared.count(kind)
+    
     def search_similar_incidents_smart(self, incident, snow_instance, snow_user, snow_password):
         """Multi-strategy search for truly similar incidents"""
         
-        auth = HTTPBasicAuth(snow_user, snow_password)
-        base_url = f"https://{snow_instance}/api/now/table/incident"
+        session = get_session(snow_instance, snow_user, snow_password)
+        base_url = table_url(snow_instance)
         
-        all_similar = []
-        seen_sys_ids = {incident.get('sys_id', '')}
+        strategies = self._build_search_strategies(incident)
+        
+        # Strategies are independent round trips, so by default they are fanned
+        # out concurrently; CIIA_SEARCH_MODE=sequential restores one-by-one
+        mode = enrichment_config()['search_mode']
+        if mode != 'sequential' and len(strategies) > 1:
+            mode = 'concurrent'
+        else:
+            mode = 'sequential'
+        
+        merged = {}
+        timings = {}
+        started = time.monotonic()
+        
+        if mode == 'concurrent':
+            max_workers = enrichment_config()['search_max_workers']
+            with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(strategies)))) as pool:
+                futures = {
+                    pool.submit(self._timed_search, base_url, session, strategy): idx
+                    for idx, strategy in enumerate(strategies)
+                }
+                for future in as_completed(futures):
+                    idx = futures[future]
+                    results, timing = future.result()
+                    timing['new'] = self._merge_search_results(merged, idx, results, incident)
+                    timings[idx] = timing
+        else:
+            for idx, strategy in enumerate(strategies):
+                results, timing = self._timed_search(base_url, session, strategy)
+                timing['new'] = self._merge_search_results(merged, idx, results, incident)
+                timings[idx] = timing
+        
+        # Keep strategy priority order regardless of arrival order
+        all_similar = [record for _, _, record in sorted(merged.values(), key=lambda m: (m[0], m[1]))]
+        
+        self.search_stats = {
+            'mode': mode,
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1),
+            'strategies': [timings[idx] for idx in sorted(timings)]
+        }
+        
+        # Rank by relevance if too many
+        if len(all_similar) > 10:
+            all_similar = self._rank_by_relevance(incident, all_similar)[:10]
+        
+        return all_similar[:5]  # Return top 5
+    
+    def _build_search_strategies(self, incident):
+        """Build the search strategies (name, query, limit) for an incident"""
+        
+        strategies = []
         
         # Get incident sys_id safely
         current_sys_id = incident.get('sys_id', '')
@@ -186,10 +487,15 @@ class handler(BaseHTTPRequestHandler):
         # Strategy 1: Exact category match with resolved tickets
         category = incident.get('category', '')
         if category:
-            query1 = f"category={category}^state=6^ORstate=7^sys_id!={current_sys_id}"
-            results1 = self._execute_search(base_url, auth, query1, limit=10)
-            all_similar.extend(results1)
-            seen_sys_ids.update(r.get('sys_id', '') for r in results1)
+            base1 = f"category={category}^state=6^ORstate=7"
+            strategies.append({
+                'name': 'category',
+                'query': f"{base1}^sys_id!={current_sys_id}",
+                'base_query': base1,
+                'limit': 10,
+                'match': ('category', category),
+                'exclude_sys_id': current_sys_id
+            })
         
         # Strategy 2: Keywords from description
         keywords = self._extract_technical_keywords(incident)
@@ -199,199 +505,360 @@ class handler(BaseHTTPRequestHandler):
                 keyword_queries.append(f"short_descriptionLIKE{kw}")
             
             if keyword_queries:
-                query2 = '^OR'.join(keyword_queries) + f"^state=6^ORstate=7^sys_id!={current_sys_id}"
-                results2 = self._execute_search(base_url, auth, query2, limit=15)
-                
-                # Filter out already seen
-                results2 = [r for r in results2 if r.get('sys_id', '') not in seen_sys_ids]
-                all_similar.extend(results2)
-                seen_sys_ids.update(r.get('sys_id', '') for r in results2)
+                base2 = '^OR'.join(keyword_queries) + "^state=6^ORstate=7"
+                strategies.append({
+                    'name': 'keywords',
+                    'query': f"{base2}^sys_id!={current_sys_id}",
+                    'base_query': base2,
+                    'limit': 15,
+                    'keywords': keywords[:3],
+                    'exclude_sys_id': current_sys_id
+                })
+        
+        # Strategy 2b: Near-duplicate text via MinHash LSH (local store only)
+        if local_store() is not None:
+            strategies.append({
+                'name': 'minhash',
+                'query': None,
+                'limit': 15,
+                'similar_to': incident,
+                'exclude_sys_id': current_sys_id
+            })
+        
+        # Strategy 2c: Reworded descriptions via the hashed n-gram vector index
+        if vector_index() is not None:
+            strategies.append({
+                'name': 'vector',
+                'query': None,
+                'limit': 15,
+                'vector_of': incident,
+                'exclude_sys_id': current_sys_id
+            })
         
         # Strategy 3: Same CI (Configuration Item)
         cmdb_ci = incident.get('cmdb_ci', '')
         if cmdb_ci:
-            query3 = f"cmdb_ci={cmdb_ci}^state=6^ORstate=7^sys_id!={current_sys_id}"
-            results3 = self._execute_search(base_url, auth, query3, limit=10)
-            results3 = [r for r in results3 if r.get('sys_id', '') not in seen_sys_ids]
-            all_similar.extend(results3)
+            base3 = f"cmdb_ci={cmdb_ci}^state=6^ORstate=7"
+            strategies.append({
+                'name': 'cmdb_ci',
+                'query': f"{base3}^sys_id!={current_sys_id}",
+                'base_query': base3,
+                'limit': 10,
+                'match': ('cmdb_ci', cmdb_ci),
+                'exclude_sys_id': current_sys_id
+            })
         
-        # Rank by relevance if too many
-        if len(all_similar) > 10:
-            all_similar = self._rank_by_relevance(incident, all_similar)[:10]
+        return strategies
+    
+    def _timed_search(self, url, session, strategy):
+        """Run one search strategy and record how long it took"""
         
-        return all_similar[:5]  # Return top 5
+        started = time.monotonic()
+        source, results = self._search_local(strategy)
+        
+        if results is None and strategy['query'] is None:
+            # Local-only strategy and nothing local available
+            source, results = 'skipped', []
+        elif results is None:
+            source, results = self._servicenow_search(url, session, strategy)
+        
+        timing = {
+            'strategy': strategy['name'],
+            'source': source,
+            'results': len(results),
+            'elapsed_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+        return results, timing
+    
+    def _servicenow_search(self, url, session, strategy):
+        """(source, results) from ServiceNow, shared across a batch when possible
+        
+        Category and CI candidate sets are the same for every incident in
+        that category or on that CI, so they come from the process-wide
+        candidate cache when it is enabled.
+        """
+        
+        cache = None
+        if strategy.get('match') and strategy.get('base_query'):
+            cache = configured_candidate_cache(enrichment_config()['candidate_cache'])
+        if cache is not None:
+            return self._cached_search(cache, url, session, strategy)
+        
+        shared = getattr(self, 'shared_searches', None)
+        if shared is None or not strategy.get('base_query'):
+            return 'servicenow', self._execute_search(
+                url, session, strategy['query'], limit=strategy['limit'], strategy=strategy['name'])
+        
+        # The query minus this incident's exclusion is identical across the
+        # batch; fetch one extra row and drop the incident itself locally
+        limit = strategy['limit']
+        
+        def fetch():
+            return self._execute_search(
+                url, session, strategy['base_query'], limit=limit + 1, strategy=strategy['name'])
+        
+        results, reused = shared.search((strategy['base_query'], limit), fetch)
+        exclude = strategy.get('exclude_sys_id')
+        results = [r for r in results if r.get('sys_id') != exclude][:limit]
+        return ('batch_shared' if reused else 'servicenow'), results
     
-    def _execute_search(self, url, auth, query, limit=10):
-        """Execute ServiceNow query"""
+    def _cached_search(self, cache, url, session, strategy):
+        """(source, results) for a candidate set looked up without the self-exclusion"""
+        
+        limit = strategy['limit']
+        base_query = strategy['base_query']
+        
+        def fetch():
+            return self._query_candidates(url, session, base_query, limit + 1, strategy['name'])
+        
+        def refresh():
+            # Background refresh: outlives this request, so it runs without its deadline
+            return IncidentEnricher()._query_candidates(url, session, base_query, limit + 1, strategy['name'])
+        
         try:
-            response = requests.get(
-                url,
-                auth=auth,
-                headers={"Accept": "application/json"},
-                params={
-                    'sysparm_query': query,
-                    'sysparm_limit': limit
-                },
-                timeout=10
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                return data.get('result', [])
+            # Waiting on another request's fetch is bounded by this run's own deadline
+            results, how = cache.get((url, base_query, limit), fetch, refresh, timeout=self.deadline.timeout)
+        except DeadlineExceeded:
+            self.deadline.skip('search', f"{strategy['name']} not started")
+            return 'servicenow', []
         except Exception as e:
             print(f"Search error: {e}")
+            return 'servicenow', []
         
-        return []
+        exclude = strategy.get('exclude_sys_id')
+        results = [r for r in results if r.get('sys_id') != exclude][:limit]
+        if how == MISS:
+            return 'servicenow', results
+        return ('candidate_cache_stale' if how == STALE else 'candidate_cache'), results
     
-    def _extract_technical_keywords(self, incident):
-        """Extract technical keywords (error codes, system names, etc.)"""
+    def _search_local(self, strategy):
+        """Serve a strategy from the synced incident store, the keyword or the vector index
         
-        short_desc = incident.get('short_description', '')
-        description = incident.get('description', '')
-        text = (short_desc + ' ' + description).upper()
+        Returns (source, results), with results None when the strategy has to
+        go to ServiceNow (nothing local configured, stale, or failing).
+        """
         
-        keywords = []
+        store = local_store()
+        try:
+            if store is not None and strategy.get('match'):
+                field, value = strategy['match']
+                return 'local_store', store.find_by(
+                    field, value,
+                    limit=strategy['limit'],
+                    exclude_sys_id=strategy.get('exclude_sys_id')
+                )
+            
+            if store is not None and strategy.get('similar_to'):
+                return 'local_store', store.find_similar_text(
+                    strategy['similar_to'],
+                    limit=strategy['limit'],
+                    exclude_sys_id=strategy.get('exclude_sys_id')
+                )
+            
+            if strategy.get('vector_of'):
+                index = vector_index()
+                if index is not None:
+                    return 'local_vectors', index.search(
+                        strategy['vector_of'],
+                        limit=strategy['limit'],
+                        exclude_sys_id=strategy.get('exclude_sys_id')
+                    )
+            
+            if strategy.get('keywords'):
+                index = store or configured_index(enrichment_config()['search_index'])
+                if index is not None:
+                    source = 'local_store' if store is not None else 'local_index'
+                    return source, index.search(
+                        strategy['keywords'],
+                        limit=strategy['limit'],
+                        exclude_sys_id=strategy.get('exclude_sys_id')
+                    )
+        except Exception as e:
+            print(f"Local search error, falling back to ServiceNow: {e}")
         
-        # Extract error codes (ERW, E001, HTTP 500, etc.)
-        error_patterns = [
-            r'\b[A-Z]{2,4}\d{2,4}\b',
-            r'\bERROR\s*[:\-]?\s*\d+\b',
-            r'\b[A-Z]+\s*\d{3,4}\b',
-            r'\b\d{3}\s*ERROR\b',
-        ]
+        return None, None
+    
+    def _merge_search_results(self, merged, rank, results, incident):
+        """Merge one strategy's results into merged, deduplicating by sys_id
         
-        for pattern in error_patterns:
-            matches = re.findall(pattern, text)
-            keywords.extend(matches)
+        A record found by several strategies is attributed to the highest
+        priority (lowest rank) one, so the merged order matches a sequential
+        run no matter in which order the strategies complete.
+        Returns the number of records that were not seen before.
+        """
         
-        # Extract application names (all caps words)
-        app_names = re.findall(r'\b[A-Z]{3,}(?:\s+[A-Z]{3,})*\b', text)
-        keywords.extend(app_names)
+        current_sys_id = incident.get('sys_id', '')
+        new = 0
+        for position, record in enumerate(results):
+            sys_id = record.get('sys_id', '')
+            if sys_id == current_sys_id:
+                continue
+            if sys_id not in merged:
+                new += 1
+            elif merged[sys_id][0] <= rank:
+                continue
+            merged[sys_id] = (rank, position, record)
+        return new
+    
+    def _query_candidates(self, url, session, query, limit=10, strategy=None):
+        """Execute ServiceNow query over the shared pooled session; raises on any failure"""
         
-        # Extract technical terms
-        technical_terms = ['TIMEOUT', 'CONNECTION', 'DATABASE', 'LOGIN', 'AUTH',
-                          'PERMISSION', 'DENIED', 'FAILED', 'ERROR', 'EXCEPTION',
-                          'CRASH', 'FREEZE', 'SLOW', 'LATENCY', 'UNAVAILABLE']
+        response = self._snow_request(
+            'search',
+            session.get,
+            url,
+            strategy=strategy,
+            headers={"Accept": "application/json"},
+            params=table_params(
+                'similar_candidate',
+                sysparm_query=query,
+                sysparm_limit=limit
+            ),
+            timeout=SEARCH_TIMEOUT_S
+        )
+        if response.status_code != 200:
+            raise Exception(f"HTTP {response.status_code}")
+        return response.json().get('result', [])
+    
+    def _execute_search(self, url, session, query, limit=10, strategy=None):
+        """ServiceNow query with failures logged and answered with no results"""
+        try:
+            return self._query_candidates(url, session, query, limit=limit, strategy=strategy)
+        except DeadlineExceeded:
+            self.deadline.skip('search', f"{strategy or 'query'} not started")
+        except Exception as e:
+            print(f"Search error: {e}")
         
-        for term in technical_terms:
-            if term in text:
-                keywords.append(term)
+        return []
+    
+    def _extract_technical_keywords(self, incident):
+        """Extract technical keywords (error codes, system names, etc.)"""
         
-        # Deduplicate and return top 5
-        keywords = list(set(keywords))
-        return keywords[:5]
+        return extract_keywords(
+            incident.get('short_description', ''),
+            incident.get('description', ''),
+            k=5
+        )
     
     def _rank_by_relevance(self, current_incident, similar_incidents):
-        """Simple relevance ranking"""
+        """Relevance ranking: MinHash Jaccard estimate + category/notes boosts"""
         
-        current_desc = (current_incident.get('short_description', '') + ' ' +
-                       current_incident.get('description', '')).lower()
-        current_words = set(current_desc.split())
+        import numpy as np
+        from ciia.ranking import rank_records
         
-        scored = []
-        for inc in similar_incidents:
-            inc_desc = (inc.get('short_description', '') + ' ' +
-                       inc.get('description', '')).lower()
-            inc_words = set(inc_desc.split())
-            
-            # Jaccard similarity
-            intersection = len(current_words & inc_words)
-            union = len(current_words | inc_words)
-            score = intersection / union if union > 0 else 0
-            
-            # Boost if same category
-            if inc.get('category') == current_incident.get('category'):
-                score += 0.2
-            
-            # Boost if has resolution notes
-            if inc.get('close_notes') or inc.get('work_notes'):
-                score += 0.1
-            
-            scored.append((score, inc))
+        # Use signatures precomputed at sync time when every candidate has one
+        signatures = None
+        store = local_store()
+        if store is not None:
+            try:
+                stored = store.signatures_for(inc.get('sys_id', '') for inc in similar_incidents)
+                if len(stored) == len(similar_incidents):
+                    signatures = np.stack([stored[inc['sys_id']] for inc in similar_incidents])
+            except Exception as e:
+                print(f"Stored signature lookup error: {e}")
         
-        scored.sort(key=lambda x: x[0], reverse=True)
-        return [inc for score, inc in scored]
+        return rank_records(current_incident, similar_incidents, signatures)
     
     def extract_resolution_intelligence(self, similar_incidents):
-        """Extract actual resolutions and workarounds from similar tickets"""
+        """Extract actual resolutions and workarounds from similar tickets
         
-        resolutions = []
+        A keyed lookup in the resolution knowledge base when it is enabled;
+        only incidents it has not seen (or that changed since) are parsed.
+        """
         
-        for inc in similar_incidents:
-            resolution_data = {
-                'incident_number': inc.get('number', 'Unknown'),
-                'short_description': inc.get('short_description', '')[:100],
-                'resolution': None,
-                'workaround': None,
-                'root_cause': None
-            }
-            
-            # Combine all resolution sources
-            all_notes = []
-            if inc.get('close_notes'):
-                all_notes.append(('close_notes', inc['close_notes']))
-            if inc.get('work_notes'):
-                all_notes.append(('work_notes', inc['work_notes']))
-            
-            for source, notes in all_notes:
-                if not notes:
-                    continue
-                    
-                notes_lower = notes.lower()
-                
-                # Extract resolution
-                resolution_keywords = ['resolution:', 'resolved by', 'fix:', 'fixed by', 'solution:']
-                for keyword in resolution_keywords:
-                    if keyword in notes_lower:
-                        idx = notes_lower.index(keyword)
-                        resolution_text = notes[idx:idx+200].strip()
-                        if resolution_text:
-                            resolution_data['resolution'] = resolution_text
-                            break
-                
-                # Extract workaround
-                workaround_keywords = ['workaround:', 'temporary fix', 'interim solution']
-                for keyword in workaround_keywords:
-                    if keyword in notes_lower:
-                        idx = notes_lower.index(keyword)
-                        workaround_text = notes[idx:idx+200].strip()
-                        if workaround_text:
-                            resolution_data['workaround'] = workaround_text
-                            break
-                
-                # Extract root cause
-                rootcause_keywords = ['root cause:', 'caused by', 'issue was']
-                for keyword in rootcause_keywords:
-                    if keyword in notes_lower:
-                        idx = notes_lower.index(keyword)
-                        rootcause_text = notes[idx:idx+200].strip()
-                        if rootcause_text:
-                            resolution_data['root_cause'] = rootcause_text
-                            break
-            
-            # If no structured resolution found, extract last work note
-            if not resolution_data['resolution'] and inc.get('work_notes'):
-                resolution_data['resolution'] = inc['work_notes'][-300:].strip()
-            
-            if resolution_data['resolution'] or resolution_data['workaround']:
-                resolutions.append(resolution_data)
+        kb = configured_kb()
+        if kb is not None:
+            extracted = kb.resolutions(similar_incidents)
+        else:
+            extracted = [extract_resolution(inc) for inc in similar_incidents]
         
+        resolutions = [data for data in extracted if has_resolution(data)]
         return resolutions[:5]
     
     def analyze_with_groq_enhanced(self, incident, similar_incidents, resolutions, api_key):
-        """Enhanced AI analysis with resolution context"""
+        """Enhanced AI analysis with resolution context (cached by prompt content)"""
         
-        groq_client = Groq(api_key=api_key)
+        messages = [
+            {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+            {"role": "user", "content": self.render_analysis_prompt(incident, similar_incidents, resolutions)}
+        ]
+        
+        # Identical model + parameters + prompt => reuse the earlier analysis
+        cache = configured_cache()
+        key = cache_key(ANALYSIS_MODEL, messages, ANALYSIS_TEMPERATURE, ANALYSIS_MAX_TOKENS)
+        cached = cache.get(key) if cache else None
+        self.analysis_stats = {'cached': cached is not None, 'cache_key': key[:16]}
+        streaming = getattr(self, 'event_sink', None) is not None
+        if cached is not None:
+            self._emit('analysis', delta=cached)
+            return cached
         
-        # Build context
-        context = self._build_analysis_context(incident, similar_incidents, resolutions)
+        deadline = getattr(self, 'deadline', None)
+        if deadline is not None and not deadline.allows(ANALYSIS_MIN_S):
+            # Not worth starting: write the similar incidents without an analysis
+            deadline.skip('analyze', 'budget low')
+            self.analysis_stats['skipped'] = 'deadline'
+            self._emit('analysis_error', error='skipped: time budget exhausted')
+            return ANALYSIS_SKIPPED
         
-        prompt = f"""You are an expert L3 IT incident analyst. Analyze this incident using historical resolution data.
+        self._emit('progress', stage='analysis', streaming=streaming)
+        try:
+            # Shared client; queues briefly for the RPM/TPM budget instead of failing
+            client = shared_groq(api_key)
+            params = dict(model=ANALYSIS_MODEL, temperature=ANALYSIS_TEMPERATURE, max_tokens=ANALYSIS_MAX_TOKENS,
+                          timeout=deadline.available() if deadline is not None and deadline.budget_s else None)
+            if streaming:
+                analysis, call_stats = client.stream(
+                    messages,
+                    on_delta=lambda delta: self._emit('analysis', delta=delta),
+                    **params
+                )
+            else:
+                analysis, call_stats = client.complete(messages, **params)
+            self.analysis_stats.update(call_stats)
+        except Exception as e:
+            if deadline is not None and not deadline.allows(MIN_CALL_S):
+                deadline.skip('analyze', 'timed out')
+            self.analysis_stats['error'] = str(e)
+            self._emit('analysis_error', error=str(e))
+            return f"AI Analysis unavailable: {str(e)}\n\nPlease review similar incidents manually."
+        
+        if call_stats.get('truncated'):
+            # Partial text is worth writing, not caching
+            deadline.skip('analyze', 'truncated')
+            return analysis + ANALYSIS_TRUNCATED
+        if cache and analysis:
+            cache.put(key, analysis, model=ANALYSIS_MODEL)
+        return analysis
+    
+    def render_analysis_prompt(self, incident, similar_incidents, resolutions):
+        """Render the user prompt within the token budget; the analysis cache is keyed on its exact text"""
+        
+        def render(description, resolutions, similar_incidents):
+            context = self._build_analysis_context(incident, similar_incidents, resolutions)
+            prompt = self._analysis_prompt(incident, description, context)
+            return prompt, {
+                'description': description,
+                'resolutions': context['resolutions_text'],
+                'similar': context['similar_summary']
+            }
+        
+        prompt, self.prompt_stats = fit_prompt(
+            render,
+            incident.get('description') or 'No details',
+            resolutions,
+            similar_incidents,
+            budget=configured_budget()
+        )
+        return prompt
+    
+    def _analysis_prompt(self, incident, description, context):
+        return f"""You are an expert L3 IT incident analyst. Analyze this incident using historical resolution data.
 
 **CURRENT INCIDENT:**
 Number: {incident.get('number', 'N/A')}
 Description: {incident.get('short_description', 'N/A')}
-Details: {incident.get('description', 'No details')}
+Details: {description}
 Category: {incident.get('category', 'Unknown')} / {incident.get('subcategory', 'N/A')}
 Priority: {incident.get('priority', 'Unknown')} (1=Critical, 5=Low)
 
@@ -421,21 +888,6 @@ Priority: {incident.get('priority', 'Unknown')} (1=Critical, 5=Low)
 5. **Estimated Resolution Time**
 
 Be specific. Reference incident numbers. Cite proven solutions."""
-
-        try:
-            chat_completion = groq_client.chat.completions.create(
-                messages=[
-                    {"role": "system", "content": "You are a senior L3 incident analyst."},
-                    {"role": "user", "content": prompt}
-                ],
-                model="llama-3.1-8b-instant",
-                temperature=0.5,
-                max_tokens=2000
-            )
-            
-            return chat_completion.choices[0].message.content
-        except Exception as e:
-            return f"AI Analysis unavailable: {str(e)}\n\nPlease review similar incidents manually."
     
     def _build_analysis_context(self, incident, similar_incidents, resolutions):
         """Build structured context for AI"""
@@ -499,4 +951,356 @@ Be specific. Reference incident numbers. Cite proven solutions."""
 ⚡ Powered by Groq AI + Resolution Intelligence
 """
         
-        return enrichment
\ No newline at end of file
+        return enrichment
+
+
+_config = None
+_config_lock = threading.Lock()
+_warming = False
+
+
+def enrichment_config(warm=True):
+    """Handler settings, read from the environment once per process
+    
+    Health checks read it with warm=False. The first other call (a POST or
+    job) also warms NumPy/ranking and the shared Groq client (SDK import +
+    HTTP client) on a background thread, overlapping them with the
+    ServiceNow fetch and search, which mostly wait on the network.
+    """
+    
+    global _config, _warming
+    with _config_lock:
+        if _config is None:
+            _config = _read_config()
+        if warm and not _warming and _config['credentials']:
+            _warming = True
+            threading.Thread(target=_warm_up, args=(_config['credentials'][3],), daemon=True).start()
+        return _config
+
+
+def _read_config():
+    """Every setting the handler reads from the environment"""
+    credentials = (
+        os.environ.get('SNOW_INSTANCE'),
+        os.environ.get('SNOW_USER'),
+        os.environ.get('SNOW_PASSWORD'),
+        os.environ.get('GROQ_API_KEY')
+    )
+    return {
+        'credentials': credentials if all(credentials) else None,
+        'enrich_mode': os.environ.get('CIIA_ENRICH_MODE', 'sync').lower(),
+        'batch_max': int(os.environ.get('CIIA_BATCH_MAX', '100')),
+        'batch_concurrency': max(1, int(os.environ.get('CIIA_BATCH_CONCURRENCY', '4'))),
+        'search_mode': os.environ.get('CIIA_SEARCH_MODE', 'concurrent').lower(),
+        'search_max_workers': int(os.environ.get('CIIA_SEARCH_MAX_WORKERS', '3')),
+        'incident_store': store_settings(),
+        'search_index': index_settings(),
+        'vector_index': os.environ.get('CIIA_VECTOR_INDEX'),
+        'candidate_cache': candidate_cache_settings(),
+        'job_queue': queue_settings(),
+        'deadline_s': configured_deadline_s(),
+        'deadline_reserve_s': configured_reserve_s(),
+        'job_deadline_s': configured_job_deadline_s(),
+        'batch_deadline_s': configured_batch_deadline_s(),
+    }
+
+
+def _warm_up(api_key):
+    """Import what the later pipeline stages need, in the order they need it"""
+    
+    try:
+        import ciia.ranking  # noqa: F401  (NumPy)
+        shared_groq(api_key)
+    except Exception as e:
+        # The stage that needs it imports (and reports) it again
+        print(f"Warm-up failed: {e}")
+
+
+def new_deadline():
+    """A Deadline for one synchronous request, starting now (CIIA_DEADLINE_S, CIIA_DEADLINE_RESERVE_S)"""
+    config = enrichment_config()
+    return Deadline(config['deadline_s'], config['deadline_reserve_s'])
+
+
+def job_deadline(batch=False):
+    """A Deadline for one async job, starting now (CIIA_JOB_DEADLINE_S or CIIA_BATCH_DEADLINE_S)"""
+    config = enrichment_config()
+    return Deadline(config['batch_deadline_s' if batch else 'job_deadline_s'], config['deadline_reserve_s'])
+
+
+def enrichment_credentials():
+    """(instance, user, password, groq_api_key) from the cached config, or None"""
+    return enrichment_config()['credentials']
+
+
+def local_store():
+    """The synced incident store if one is configured and fresh, else None"""
+    
+    settings = enrichment_config()['incident_store']
+    if not settings[0]:
+        return None
+    return configured_store(settings)
+
+
+def vector_index():
+    """The local vector index if CIIA_VECTOR_INDEX names a built one, else None (NumPy only then)"""
+    
+    if not enrichment_config()['vector_index']:
+        return None
+    from ciia.vector_index import configured_vector_index
+    return configured_vector_index(enrichment_config()['vector_index'])
+
+
+def run_enrichment_job(job):
+    """Worker entry point for async mode: full pipeline including the PATCH"""
+    
+    credentials = enrichment_credentials()
+    if credentials is None:
+        raise Exception('Missing environment variables')
+    batch = job['payload'].get('incident_sys_ids')
+    force = bool(job['payload'].get('force'))
+    if batch:
+        return IncidentEnricher().enrich_batch(batch, *credentials, deadline=job_deadline(batch=True), force=force)
+    return IncidentEnricher().enrich_incident(job['incident_sys_id'], *credentials, deadline=job_deadline(),
+                                              force=force)
+
+
+class handler(IncidentEnricher, BaseHTTPRequestHandler):
+    """Enhanced Vercel serverless handler with smart context"""
+    
+    def do_POST(self):
+        """Handle POST requests from ServiceNow"""
+        try:
+            # The budget covers the whole request, body parsing included
+            deadline = new_deadline()
+            content_length = int(self.headers['Content-Length'])
+            post_data = self.rfile.read(content_length)
+            body = json.loads(post_data.decode('utf-8'))
+            
+            batch = body.get('incident_sys_ids')
+            if 'incident_sys_id' not in body and not batch:
+                self.send_error_response(400, 'Missing incident_sys_id')
+                return
+            
+            if batch is not None:
+                max_batch = enrichment_config()['batch_max']
+                if not isinstance(batch, list) or not all(isinstance(s, str) and s for s in batch):
+                    self.send_error_response(400, 'incident_sys_ids must be a list of sys_ids')
+                    return
+                if len(batch) > max_batch:
+                    self.send_error_response(413, f'Batch larger than {max_batch} incidents')
+                    return
+            
+            credentials = enrichment_credentials()
+            if credentials is None:
+                self.send_error_response(500, 'Missing environment variables')
+                return
+            
+            force = self._force_requested(body)
+            
+            if batch is not None:
+                if self._async_requested(body):
+                    self.enqueue_enrichment(f"batch:{len(batch)}", {'incident_sys_ids': batch, 'force': force})
+                    return
+                result = self.enrich_batch(batch, *credentials, deadline=deadline, force=force)
+                self.send_json(200, result, {'Server-Timing': server_timing(result['timings'])})
+                return
+            
+            incident_sys_id = body['incident_sys_id']
+            
+            if self._async_requested(body):
+                self.enqueue_enrichment(incident_sys_id, {'force': True} if force else None)
+                return
+            
+            if self._stream_requested(body):
+                self.stream_enrichment(incident_sys_id, credentials, deadline, force)
+                return
+            
+            result = self.enrich_incident(incident_sys_id, *credentials, deadline=deadline, force=force)
+            
+            self.send_json(200, result, {'Server-Timing': server_timing(result.get('timings'))})
+            
+        except Exception as e:
+            error_detail = traceback.format_exc()
+            self.send_error_response(500, f"{str(e)} | Trace: {error_detail}")
+    
+    def _async_requested(self, body):
+        """Body "async" flag, else ?mode=async, else CIIA_ENRICH_MODE (default sync)"""
+        
+        if 'async' in body:
+            return bool(body['async'])
+        query = parse_qs(urlparse(self.path).query)
+        mode = query.get('mode', [enrichment_config()['enrich_mode']])[0]
+        return mode.lower() == 'async'
+    
+    def _stream_requested(self, body):
+        """Body "stream" flag, else ?stream=1"""
+        
+        if 'stream' in body:
+            return bool(body['stream'])
+        query = parse_qs(urlparse(self.path).query)
+        return query.get('stream', ['0'])[0].lower() in ('1', 'true', 'yes')
+    
+    def _force_requested(self, body):
+        """Body "force" flag, else ?force=1: re-enrich even if the incident is unchanged"""
+        
+        if 'force' in body:
+            return bool(body['force'])
+        query = parse_qs(urlparse(self.path).query)
+        return query.get('force', ['0'])[0].lower() in ('1', 'true', 'yes')
+    
+    def stream_enrichment(self, incident_sys_id, credentials, deadline=None, force=False):
+        """Run the pipeline while streaming NDJSON events with chunked encoding
+        
+        Events: progress (per stage), analysis (text deltas as Groq generates
+        them), analysis_error, then done (the usual result, plus stream
+        timings) or error. The work-note PATCH still happens after the
+        analysis completes, even if the caller has gone away.
+        """
+        
+        # Chunked transfer encoding needs HTTP/1.1 for this response only
+        self.protocol_version = 'HTTP/1.1'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        
+        started = time.monotonic()
+        stream = {'connected': True, 'first_analysis_ms': None, 'events': 0}
+        
+        def send(event):
+            elapsed_ms = round((time.monotonic() - started) * 1000, 1)
+            if event['event'] == 'analysis' and stream['first_analysis_ms'] is None:
+                stream['first_analysis_ms'] = elapsed_ms
+            if not stream['connected']:
+                return
+            event['t_ms'] = elapsed_ms
+            try:
+                self._write_chunk(json.dumps(event).encode() + b'\n')
+                stream['events'] += 1
+            except OSError:
+                # Caller went away; keep going so the work note is still written
+                stream['connected'] = False
+        
+        self.event_sink = send
+        try:
+            result = self.enrich_incident(incident_sys_id, *credentials, deadline=deadline, force=force)
+            result['stream'] = {
+                'first_analysis_ms': stream['first_analysis_ms'],
+                'total_ms': round((time.monotonic() - started) * 1000, 1),
+                'events': stream['events']
+            }
+            send({'event': 'done', 'result': result})
+        except Exception as e:
+            send({'event': 'error', 'error': str(e)})
+        finally:
+            self.event_sink = None
+        
+        if stream['connected']:
+            try:
+                self.wfile.write(b'0\r\n\r\n')
+                self.wfile.flush()
+            except OSError:
+                pass
+    
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+    
+    def enqueue_enrichment(self, incident_sys_id, payload=None):
+        """Queue the pipeline and answer 202 straight away"""
+        
+        settings = enrichment_config()['job_queue']
+        job = configured_queue(settings).enqueue(incident_sys_id, payload)
+        ensure_workers(run_enrichment_job, settings)
+        
+        self.send_json(202, {
+            'status': 'accepted',
+            'job_id': job['job_id'],
+            'incident_sys_id': incident_sys_id,
+            'status_url': f"{urlparse(self.path).path}?job_id={job['job_id']}",
+            'queue': queue.stats()
+        })
+    
+    def do_GET(self):
+        """Health check endpoint; ?job_id=... returns the status of an async job"""
+        
+        config = enrichment_config(warm=False)
+        query = parse_qs(urlparse(self.path).query)
+        if 'job_id' in query:
+            job = configured_queue(config['job_queue']).get(query['job_id'][0])
+            if job is None:
+                self.send_error_response(404, 'Unknown job_id')
+            else:
+                self.send_json(200, job_view(job))
+            return
+        
+        response = {
+            'status': 'healthy',
+            'service': 'CIIA Enhanced Enrichment API',
+            'version': '2.0.1',
+            'http_pool': pool_stats()
+        }
+        
+        cache = configured_cache()
+        if cache:
+            response['llm_cache'] = cache.stats()
+        
+        fingerprints = configured_fingerprints()
+        if fingerprints:
+            response['fingerprints'] = fingerprints.stats()
+        
+        kb = configured_kb()
+        if kb:
+            response['resolution_kb'] = kb.stats()
+        
+        candidates = configured_candidate_cache(config['candidate_cache'])
+        if candidates:
+            response['candidate_cache'] = candidates.stats()
+        
+        response['coalescing'] = enrichment_flight().stats()
+        response['groq'] = groq_scheduler().stats()
+        response['timings'] = stage_stats.summary()
+        
+        jobs = configured_queue(config['job_queue']).stats()
+        pool = worker_pool()
+        jobs['workers'] = pool.alive() if pool else 0
+        response['jobs'] = jobs
+        
+        # Both read SQLite only: no NumPy on a health check
+        store_path = config['incident_store'][0]
+        if store_path and os.path.exists(store_path):
+            try:
+                response['incident_store'] = get_store(store_path).sync_metrics()
+            except Exception as e:
+                response['incident_store'] = {'error': str(e)}
+        
+        vector_path = config['vector_index']
+        if vector_path and os.path.exists(vector_path):
+            try:
+                from ciia.vector_files import index_stats
+                response['vector_index'] = index_stats(vector_path)
+            except Exception as e:
+                response['vector_index'] = {'error': str(e)}
+        
+        self.send_json(200, response)
+    
+    def send_json(self, code, payload, headers=None):
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        for name, value in (headers or {}).items():
+            if value:
+                self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+    
+    def send_error_response(self, code, message):
+        """Send error response"""
+        self.send_response(code)
+        self.send_header('Content-type', 'application/json')
+        self.end_headers()
+        error = {'error': message}
+        self.wfile.write(json.dumps(error).encode())
@@ -0,0 +1,4 @@
+"""
+CIIA shared library
+Building blocks used by the Vercel function (api/), the local scripts and the dashboard
+"""
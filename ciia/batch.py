@@ -0,0 +1,80 @@
+"""
+Shared retrieval for batch enrichment
+
+During an outage dozens of incidents arrive for the same CI and category, and
+every one of them used to repeat the same category / cmdb_ci searches. A
+batch fetches all incidents with one `sys_idIN` query, and SharedSearches
+memoizes ServiceNow searches by query string for the lifetime of the batch:
+the first incident to need a query issues it, concurrent and later ones wait
+for and reuse its result. It also counts the ServiceNow requests the batch
+actually made.
+"""
+
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from typing import List, Dict, Any, Callable, Iterable, Tuple
+
+
+# sys_ids per `sys_idIN` fetch (keeps the URL well under proxy limits)
+FETCH_CHUNK = 100
+
+
+def chunked(items: List[Any], size) -> Iterable[List[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def sys_id_query(sys_ids: Iterable[str]) -> str:
+    return 'sys_idIN' + ','.join(sys_ids)
+
+
+def unique(items: Iterable[str]) -> List[str]:
+    """Items in first-seen order without duplicates"""
+    return list(dict.fromkeys(items))
+
+
+class SharedSearches:
+    """Single-flight memo of search results plus a ServiceNow request count"""
+
+    def __init__(self):
+        self._results = {}
+        self._lock = threading.Lock()
+        self.requests = Counter()
+        self.lookups = 0
+        self.shared = 0
+
+    def count(self, kind, n=1):
+        with self._lock:
+            self.requests[kind] += n
+
+    def search(self, key, fetch: Callable[[], List[Dict[str, Any]]]) -> Tuple[List[Dict[str, Any]], bool]:
+        """(results, reused): runs fetch() only for the first caller of a key"""
+
+        with self._lock:
+            self.lookups += 1
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._results[key] = future
+            else:
+                self.shared += 1
+
+        if owner:
+            try:
+                future.set_result(fetch())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result(), not owner
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = dict(self.requests)
+            requests['total'] = sum(self.requests.values())
+            return {
+                'servicenow_requests': requests,
+                'search_lookups': self.lookups,
+                'search_queries_shared': self.shared,
+                'search_queries_issued': len(self._results),
+            }
@@ -0,0 +1,235 @@
+"""
+Warm cache of per-category and per-CI candidate sets
+
+The category and cmdb_ci strategies send the same `category=...^state=6^ORstate=7`
+and `cmdb_ci=...` queries for every incident in that category or on that CI;
+only the `sys_id!=` self-exclusion differs. During an outage storm that is
+the bulk of the ServiceNow search traffic. CandidateCache keeps these
+candidate sets per process, keyed by the query without the exclusion (one
+extra row is fetched so each caller can drop itself locally):
+
+- fresh for `ttl` seconds;
+- for another `stale` seconds served as is while one background refresh
+  fetches the new set (stale-while-revalidate);
+- misses are single-flight: concurrent callers wait for one fetch, each
+  for no longer than its own budget allows, and fetch for themselves when
+  that runs out or the shared fetch ran out of *its* budget;
+- an approximate memory cap (`max_bytes`) with LRU eviction.
+
+Failed fetches are never cached, and a failed refresh keeps serving the
+stale set until it expires.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ciia.deadline import DeadlineExceeded
+
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+SHARED = 'shared'
+
+DEFAULT_TTL = 300.0
+DEFAULT_STALE = 900.0
+DEFAULT_MAX_MB = 16.0
+
+# Rough per-record and per-field overhead of the Python objects behind a result
+RECORD_OVERHEAD = 200
+FIELD_OVERHEAD = 100
+
+
+def result_size(results: List[Dict[str, Any]]) -> int:
+    """Approximate bytes held by a result list (string lengths plus object overhead)"""
+    return sum(RECORD_OVERHEAD + sum(FIELD_OVERHEAD + len(k) + len(str(v)) for k, v in record.items())
+               for record in results)
+
+
+class CandidateCache:
+    """TTL + stale-while-revalidate LRU of search results, capped by approximate size"""
+
+    def __init__(self, ttl=DEFAULT_TTL, stale=DEFAULT_STALE, max_bytes=int(DEFAULT_MAX_MB * 1e6)):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_bytes = max_bytes
+        # key -> (results, fetched_at, size)
+        self._entries = OrderedDict()
+        self._pending = {}
+        self._refreshing = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {'lookups': 0, FRESH: 0, STALE: 0, MISS: 0, SHARED: 0,
+                         'refreshes': 0, 'refresh_errors': 0, 'fetch_errors': 0, 'evictions': 0,
+                         'shared_fallbacks': 0}
+
+    def get(self, key, fetch: Callable[[], List[Dict[str, Any]]],
+            refresh: Optional[Callable[[], List[Dict[str, Any]]]] = None,
+            timeout: Optional[Callable[[], float]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """(results, how) with how one of 'fresh', 'stale', 'shared' or 'miss'
+
+        fetch() runs on the caller's thread on a miss and must raise instead
+        of returning a partial result. refresh() (default fetch) runs on a
+        background thread for stale entries, so it should not depend on the
+        caller's request. timeout() gives the seconds the caller may wait for
+        another caller's fetch (default: no limit); past it, or when that
+        fetch raised DeadlineExceeded, the caller runs its own fetch().
+        """
+
+        now = time.monotonic()
+        with self._lock:
+            self.counters['lookups'] += 1
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[1]
+                if age < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters[FRESH] += 1
+                    return entry[0], FRESH
+                if age < self.ttl + self.stale:
+                    self._entries.move_to_end(key)
+                    self.counters[STALE] += 1
+                    start_refresh = key not in self._refreshing
+                    if start_refresh:
+                        self._refreshing.add(key)
+                    results = entry[0]
+                else:
+                    self._drop(key)
+                    entry = None
+
+            if entry is None:
+                future = self._pending.get(key)
+                owner = future is None
+                if owner:
+                    future = self._pending[key] = Future()
+                    self.counters[MISS] += 1
+                else:
+                    self.counters[SHARED] += 1
+
+        if entry is not None:
+            if start_refresh:
+                threading.Thread(target=self._refresh, args=(key, refresh or fetch),
+                                 name='candidate-cache-refresh', daemon=True).start()
+            return results, STALE
+
+        if not owner:
+            try:
+                return future.result(timeout=timeout() if timeout else None), SHARED
+            except (FutureTimeout, DeadlineExceeded):
+                # The other caller's budget is not ours
+                with self._lock:
+                    self.counters['shared_fallbacks'] += 1
+                try:
+                    results = fetch()
+                except Exception:
+                    with self._lock:
+                        self.counters['fetch_errors'] += 1
+                    raise
+                with self._lock:
+                    self._store(key, results)
+                return results, MISS
+
+        try:
+            results = fetch()
+        except Exception as e:
+            with self._lock:
+                self.counters['fetch_errors'] += 1
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            del self._pending[key]
+            self._store(key, results)
+        future.set_result(results)
+        return results, MISS
+
+    def _refresh(self, key, refresh):
+        try:
+            results = refresh()
+        except Exception as e:
+            print(f"Candidate cache refresh failed: {e}")
+            with self._lock:
+                self.counters['refresh_errors'] += 1
+                self._refreshing.discard(key)
+            return
+        with self._lock:
+            self.counters['refreshes'] += 1
+            self._refreshing.discard(key)
+            self._store(key, results)
+
+    def _store(self, key, results):
+        size = result_size(results)
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (results, time.monotonic(), size)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.counters['evictions'] += 1
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            hits = self.counters[FRESH] + self.counters[STALE] + self.counters[SHARED]
+            stats.update({
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_s': self.ttl,
+                'stale_s': self.stale,
+                'refreshing_now': len(self._refreshing),
+                'hit_ratio': round(hits / self.counters['lookups'], 3) if self.counters['lookups'] else None,
+            })
+            return stats
+
+
+_cache = None
+_cache_config = None
+_cache_lock = threading.Lock()
+
+
+def candidate_cache_settings():
+    """(max MB, ttl, stale) from the environment
+
+    CIIA_CANDIDATE_CACHE_MB (approximate memory cap, default 16; 0 disables
+    the cache), CIIA_CANDIDATE_CACHE_TTL (seconds a set is fresh, default
+    300) and CIIA_CANDIDATE_CACHE_STALE (further seconds it is served while
+    being refreshed, default 900; 0 = refresh on the request path).
+    """
+
+    return (
+        float(os.environ.get('CIIA_CANDIDATE_CACHE_MB', str(DEFAULT_MAX_MB))),
+        float(os.environ.get('CIIA_CANDIDATE_CACHE_TTL', str(DEFAULT_TTL))),
+        float(os.environ.get('CIIA_CANDIDATE_CACHE_STALE', str(DEFAULT_STALE))),
+    )
+
+
+def configured_candidate_cache(settings=None) -> Optional[CandidateCache]:
+    """Shared candidate cache for `settings` (default: candidate_cache_settings()), or None when disabled"""
+
+    global _cache, _cache_config
+    config = settings or candidate_cache_settings()
+    if config[0] <= 0:
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache_config != config:
+            _cache = CandidateCache(ttl=config[1], stale=config[2], max_bytes=int(config[0] * 1e6))
+            _cache_config = config
+        return _cache
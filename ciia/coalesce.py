@@ -0,0 +1,126 @@
+"""
+Single-flight coalescing of enrichment runs
+
+Business rules can fire several times for one incident within seconds
+(assignment change, then state update). Each trigger used to become its own
+run with its own Groq call and its own work note. SingleFlight runs the work
+once per key: callers arriving while it is in flight wait for it and share its
+result, and callers arriving up to `window` seconds after it finished reuse
+the finished result. Failures are shared with in-flight waiters but never
+reused afterwards. A `fresh` call (a forced re-enrichment) never reuses
+anything: it drops the finished result and runs even while another run is
+in flight, and its result is what later callers in the window get.
+
+Coalescing is per process (a warm serverless instance or a local server).
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple, Optional
+
+
+IN_FLIGHT = 'in_flight'
+RECENT = 'recent'
+
+DEFAULT_WINDOW = 10.0
+
+
+class SingleFlight:
+    """Per-key single-flight execution with a reuse window after completion"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.window = window
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'executions': 0, IN_FLIGHT: 0, RECENT: 0, 'fresh': 0, 'errors': 0}
+
+    def do(self, key, fn: Callable[[], Any], fresh=False) -> Tuple[Any, Optional[str]]:
+        """(result, how) where how is None for the caller that ran fn,
+        otherwise 'in_flight' or 'recent'"""
+
+        now = time.monotonic()
+        with self._lock:
+            self.counters['calls'] += 1
+            self._prune(now)
+            entry = self._entries.get(key)
+            if fresh:
+                self.counters['fresh'] += 1
+                self.counters['executions'] += 1
+                future = Future()
+                # Alongside a run already in flight (its waiters keep it); otherwise later callers join this one
+                if entry is None or entry[1] is not None:
+                    self._entries[key] = (future, None)
+                how = None
+            elif entry is not None:
+                future, finished_at = entry
+                how = IN_FLIGHT if finished_at is None else RECENT
+                self.counters[how] += 1
+            else:
+                future = Future()
+                self._entries[key] = (future, None)
+                self.counters['executions'] += 1
+                how = None
+
+        if how is not None:
+            return future.result(), how
+
+        try:
+            result = fn()
+        except Exception as e:
+            with self._lock:
+                self.counters['errors'] += 1
+                if self._entries.get(key, (None,))[0] is future:
+                    self._entries.pop(key)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            if self.window > 0:
+                self._entries[key] = (future, time.monotonic())
+            elif self._entries.get(key, (None,))[0] is future:
+                self._entries.pop(key)
+        future.set_result(result)
+        return result, None
+
+    def _prune(self, now):
+        expired = [key for key, (_, finished_at) in self._entries.items()
+                   if finished_at is not None and now - finished_at >= self.window]
+        for key in expired:
+            del self._entries[key]
+
+    def forget(self, key):
+        """Drop a finished result so the next call runs again (in-flight runs are kept)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['coalesced'] = self.counters[IN_FLIGHT] + self.counters[RECENT]
+            stats['in_flight_now'] = sum(1 for _, finished_at in self._entries.values() if finished_at is None)
+            stats['window_s'] = self.window
+            return stats
+
+
+_flight = None
+_flight_lock = threading.Lock()
+
+
+def enrichment_flight() -> SingleFlight:
+    """Process-wide SingleFlight for enrichments
+
+    CIIA_COALESCE_WINDOW: seconds a finished run's result is reused (default
+    10; 0 coalesces only concurrent calls).
+    """
+
+    global _flight
+    window = float(os.environ.get('CIIA_COALESCE_WINDOW', str(DEFAULT_WINDOW)))
+    with _flight_lock:
+        if _flight is None:
+            _flight = SingleFlight(window)
+        _flight.window = window
+        return _flight
@@ -0,0 +1,120 @@
+"""
+End-to-end time budget for one enrichment request
+
+A Deadline is started when the request arrives and every ServiceNow and Groq
+call takes its timeout from it, so the time left shrinks stage by stage
+instead of each call getting a fixed allowance. `reserve_s` of the budget is
+held back for the work-note PATCH: optional stages (similar-incident search,
+the Groq analysis) only get what is left above the reserve and are skipped
+once that runs low, so a partial enrichment is still written before the
+platform kills the function.
+
+CIIA_DEADLINE_S is the whole budget (default 9s, under Vercel's default 10s
+function timeout; 0 = no deadline) and CIIA_DEADLINE_RESERVE_S the part kept
+for the write-back (default 1.5s). Jobs run by the async worker are not bound
+by a function timeout, so they have their own budgets: CIIA_JOB_DEADLINE_S
+for a single incident and CIIA_BATCH_DEADLINE_S for a whole batch (both
+default 0 = no deadline).
+"""
+
+import copy
+import os
+import time
+from typing import Dict, Any, List, Optional
+
+
+DEFAULT_BUDGET_S = 9.0
+DEFAULT_RESERVE_S = 1.5
+
+# Timeout for calls made without a deadline (scripts, budget disabled)
+DEFAULT_IO_TIMEOUT_S = 30.0
+
+# Don't start a call that cannot get at least this long
+MIN_CALL_S = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """Not enough of the request's time budget left to start a call"""
+
+
+class Deadline:
+    """Wall-clock budget shared by every stage of one request"""
+
+    def __init__(self, budget_s: Optional[float] = DEFAULT_BUDGET_S, reserve_s: float = DEFAULT_RESERVE_S):
+        self.budget_s = budget_s if budget_s and budget_s > 0 else None
+        self.reserve_s = min(reserve_s, self.budget_s / 2) if self.budget_s else 0.0
+        self.started = time.monotonic()
+        self.expires_at = self.started + self.budget_s if self.budget_s else None
+        self.skipped: List[Dict[str, Any]] = []
+
+    def share(self) -> 'Deadline':
+        """Same expiry with its own skip record (one per incident of a batch)"""
+        other = copy.copy(self)
+        other.skipped = []
+        return other
+
+    def remaining(self) -> float:
+        """Seconds until the hard limit (inf without a budget)"""
+        if self.expires_at is None:
+            return float('inf')
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def available(self) -> float:
+        """Seconds optional work may still use, i.e. what is left above the reserve"""
+        return max(0.0, self.remaining() - self.reserve_s)
+
+    def allows(self, seconds) -> bool:
+        """Whether an optional stage needing `seconds` should still start"""
+        return self.available() >= seconds
+
+    def timeout(self, cap: Optional[float] = None, essential=False) -> float:
+        """Timeout for the next I/O call: the budget left, capped at `cap`
+
+        Optional calls may not eat into the reserve; essential ones (the
+        incident fetch and the write-back) may use everything up to the hard
+        limit. Raises DeadlineExceeded when too little is left to start.
+        """
+
+        left = self.remaining() if essential else self.available()
+        if left < MIN_CALL_S:
+            raise DeadlineExceeded(f"{'deadline' if essential else 'time budget above the reserve'} "
+                                   f"reached after {self.elapsed():.2f}s")
+        cap = cap or DEFAULT_IO_TIMEOUT_S
+        return min(cap, left)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def skip(self, stage, reason):
+        """Record an optional stage that was skipped or cut short"""
+        self.skipped.append({'stage': stage, 'reason': reason, 'at_ms': round(self.elapsed() * 1000, 1)})
+
+    def as_dict(self) -> Dict[str, Any]:
+        remaining = self.remaining()
+        return {
+            'budget_s': self.budget_s,
+            'reserve_s': self.reserve_s,
+            'elapsed_ms': round(self.elapsed() * 1000, 1),
+            'remaining_ms': round(remaining * 1000, 1) if self.budget_s else None,
+            'skipped': list(self.skipped),
+        }
+
+
+def configured_deadline_s() -> float:
+    """CIIA_DEADLINE_S: the whole request's budget in seconds (0 = no deadline)"""
+    return float(os.environ.get('CIIA_DEADLINE_S', str(DEFAULT_BUDGET_S)))
+
+
+def configured_reserve_s() -> float:
+    """CIIA_DEADLINE_RESERVE_S: seconds of the budget kept for the work-note PATCH"""
+    return float(os.environ.get('CIIA_DEADLINE_RESERVE_S', str(DEFAULT_RESERVE_S)))
+
+
+def configured_job_deadline_s() -> float:
+    """CIIA_JOB_DEADLINE_S: budget of one async single-incident job (default 0 = no deadline)"""
+    return float(os.environ.get('CIIA_JOB_DEADLINE_S', '0'))
+
+
+def configured_batch_deadline_s() -> float:
+    """CIIA_BATCH_DEADLINE_S: budget of one async batch job, all incidents together (default 0 = no deadline)"""
+    return float(os.environ.get('CIIA_BATCH_DEADLINE_S', '0'))
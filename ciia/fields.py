@@ -0,0 +1,109 @@
+"""
+Field projections for ServiceNow Table API calls
+
+Each consumer of incident records (ranking, resolution extraction, prompt
+builder, ...) declares the fields it reads. A projection is the union of the
+consumers served by one call site, so every Table API request asks for exactly
+the columns that are used downstream instead of the whole record (and its
+full comments journal).
+"""
+
+from typing import Dict, List, Any
+
+
+# Fields read by each consumer of an incident record
+CONSUMER_FIELDS = {
+    # Strategy builder + technical keyword extraction (api/enrich.py)
+    'search': ['sys_id', 'category', 'cmdb_ci', 'short_description', 'description'],
+    # handler._rank_by_relevance
+    'ranking': ['sys_id', 'short_description', 'description', 'category', 'close_notes', 'work_notes'],
+    # handler.extract_resolution_intelligence
+    # (sys_updated_on keys the resolution knowledge base, ciia/resolution_kb.py)
+    'resolution': ['number', 'short_description', 'close_notes', 'work_notes', 'sys_updated_on'],
+    # Current incident section of the analysis prompt
+    'prompt': ['number', 'short_description', 'description', 'category', 'subcategory', 'priority'],
+    # Similar incident summary in the prompt and the work note
+    'summary': ['number', 'short_description'],
+    # IncidentEnrichmentEngine.get_historical_context
+    'history': ['sys_id', 'number', 'short_description', 'state', 'close_notes'],
+    # Local incident store attributes and sync watermark (ciia/incident_store.py)
+    'store': ['sys_id', 'state', 'category', 'cmdb_ci', 'sys_updated_on'],
+    # Streamlit dashboard table and detail viewer (ciia/dashboard_data.py)
+    'dashboard': ['sys_id', 'number', 'short_description', 'description', 'priority', 'state',
+                  'category', 'assigned_to', 'sys_created_on'],
+    # Dashboard enrichment flag: sys_ids matching the work-note marker
+    'dashboard_enriched': ['sys_id'],
+    # Work notes shown by the dashboard's detail viewer, fetched per incident
+    'dashboard_notes': ['sys_id', 'work_notes'],
+}
+
+# Call sites and the consumers their results feed
+PROJECTIONS = {
+    'incident_detail': {
+        'consumers': ['search', 'prompt'],
+        'display_value': 'false',
+    },
+    'similar_candidate': {
+        'consumers': ['ranking', 'resolution', 'summary'],
+        'display_value': 'false',
+    },
+    'historical_context': {
+        'consumers': ['history'],
+        'display_value': 'false',
+    },
+    'incident_list': {
+        'consumers': ['dashboard'],
+        'display_value': 'false',
+    },
+    'incident_ids': {
+        'consumers': ['dashboard_enriched'],
+        'display_value': 'false',
+    },
+    'incident_notes': {
+        'consumers': ['dashboard_notes'],
+        'display_value': 'false',
+    },
+    # Records stored in the local search index serve both retrieval paths
+    'index_record': {
+        'consumers': ['ranking', 'resolution', 'summary', 'history'],
+        'display_value': 'false',
+    },
+    'sync_record': {
+        'consumers': ['ranking', 'resolution', 'summary', 'history', 'store'],
+        'display_value': 'false',
+    },
+}
+
+
+def fields_for(projection) -> List[str]:
+    """Ordered, de-duplicated field list for a projection"""
+
+    if projection not in PROJECTIONS:
+        raise KeyError(f"Unknown field projection: {projection}")
+
+    fields = []
+    for consumer in PROJECTIONS[projection]['consumers']:
+        for field in CONSUMER_FIELDS[consumer]:
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+
+def table_params(projection, **params) -> Dict[str, Any]:
+    """Table API query parameters for a projection, merged with extra params
+
+    Reference fields come back as plain sys_id strings (no link objects) and
+    values follow the projection's sysparm_display_value policy. Passing
+    projection=None leaves the request unprojected.
+    """
+
+    if projection is None:
+        return dict(params)
+
+    projected = {
+        'sysparm_fields': ','.join(fields_for(projection)),
+        'sysparm_exclude_reference_link': 'true',
+        'sysparm_display_value': PROJECTIONS[projection].get('display_value', 'false'),
+    }
+    projected.update(params)
+    return projected
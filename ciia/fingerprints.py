@@ -0,0 +1,256 @@
+"""
+Enrichment fingerprints: skip re-enriching unchanged incidents
+
+Business rules fire on every update (reassignment, state change, a new
+comment), and each full run appends another multi-KB work note. After a
+successful enrichment the incident's fingerprint (a SHA-256 of the fields
+the analysis reads plus the retrieval set version) is recorded per sys_id;
+a later trigger whose fingerprint matches returns the previous outcome
+straight away unless it is forced.
+
+Two tiers like the LLM cache: an in-memory LRU (warm invocations) and an
+optional SQLite file shared by every instance that can see it, which also
+keeps daily check/skip counts for the skip-ratio report
+(scripts/fingerprint_report.py).
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrichment_fingerprints (
+    sys_id TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    summary TEXT,
+    recorded_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_daily (
+    day TEXT PRIMARY KEY,
+    checks INTEGER NOT NULL DEFAULT 0,
+    skipped INTEGER NOT NULL DEFAULT 0,
+    forced INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# What the analysis reads from the incident itself
+FINGERPRINT_FIELDS = ('short_description', 'description', 'category', 'subcategory', 'cmdb_ci', 'priority')
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_TTL = 7 * 24 * 3600
+
+UNCHANGED = 'unchanged'
+CHANGED = 'changed'
+NEW = 'new'
+FORCED = 'forced'
+
+
+def enrichment_fingerprint(incident: Dict[str, Any], retrieval_version='') -> str:
+    """SHA-256 over the fingerprinted fields (whitespace-normalized) and the retrieval version"""
+
+    payload = json.dumps({
+        'fields': {name: ' '.join(str(incident.get(name) or '').split()) for name in FINGERPRINT_FIELDS},
+        'retrieval': retrieval_version,
+    }, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _today():
+    return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+
+class FingerprintStore:
+    """Last enrichment fingerprint per sys_id: in-memory LRU with an optional SQLite tier"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {'checks': 0, UNCHANGED: 0, CHANGED: 0, NEW: 0, FORCED: 0,
+                         'records': 0, 'expirations': 0, 'disk_errors': 0}
+
+    def _disk(self):
+        if self.path and self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _expired(self, recorded_at, now):
+        return bool(self.ttl) and now - recorded_at > self.ttl
+
+    def check(self, sys_id, fingerprint, force=False) -> Optional[Dict[str, Any]]:
+        """The previous enrichment's summary when `fingerprint` matches it, else None
+
+        Forced checks never match but are counted, so the skip ratio shows
+        how much a caller overrides it.
+        """
+
+        now = time.time()
+        with self._lock:
+            self.counters['checks'] += 1
+            if force:
+                outcome, previous = FORCED, None
+            else:
+                entry = self._lookup(sys_id, now)
+                if entry is None:
+                    outcome, previous = NEW, None
+                elif entry[0] != fingerprint:
+                    outcome, previous = CHANGED, None
+                else:
+                    enriched_at = datetime.fromtimestamp(entry[1], timezone.utc).replace(tzinfo=None)
+                    outcome, previous = UNCHANGED, dict(entry[2], enriched_at=enriched_at.isoformat())
+            self.counters[outcome] += 1
+            self._count_daily(outcome)
+            return previous
+
+    def record(self, sys_id, fingerprint, summary: Optional[Dict[str, Any]] = None):
+        """Remember a successful enrichment of `sys_id`"""
+
+        now = time.time()
+        summary = summary or {}
+        with self._lock:
+            self._remember(sys_id, (fingerprint, now, summary))
+            self.counters['records'] += 1
+            try:
+                conn = self._disk()
+                if conn is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO enrichment_fingerprints (sys_id, fingerprint, summary, recorded_at) "
+                        "VALUES (?, ?, ?, ?)", (sys_id, fingerprint, json.dumps(summary), now))
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"Fingerprint store write error: {e}")
+                self.counters['disk_errors'] += 1
+
+    def forget(self, sys_id):
+        with self._lock:
+            self._entries.pop(sys_id, None)
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM enrichment_fingerprints WHERE sys_id = ?", (sys_id,))
+                conn.commit()
+
+    def _lookup(self, sys_id, now):
+        entry = self._entries.get(sys_id)
+        if entry is None:
+            entry = self._disk_get(sys_id)
+            if entry is None:
+                return None
+            self._remember(sys_id, entry)
+        if self._expired(entry[1], now):
+            self._entries.pop(sys_id, None)
+            self.counters['expirations'] += 1
+            return None
+        self._entries.move_to_end(sys_id)
+        return entry
+
+    def _remember(self, sys_id, entry):
+        self._entries[sys_id] = entry
+        self._entries.move_to_end(sys_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, sys_id):
+        try:
+            conn = self._disk()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT fingerprint, recorded_at, summary FROM enrichment_fingerprints "
+                               "WHERE sys_id = ?", (sys_id,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Fingerprint store read error: {e}")
+            self.counters['disk_errors'] += 1
+            return None
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2]) if row[2] else {}
+
+    def _count_daily(self, outcome):
+        try:
+            conn = self._disk()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT INTO fingerprint_daily (day, checks, skipped, forced) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET checks = checks + 1, skipped = skipped + excluded.skipped, "
+                "forced = forced + excluded.forced",
+                (_today(), int(outcome == UNCHANGED), int(outcome == FORCED)))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Fingerprint store write error: {e}")
+            self.counters['disk_errors'] += 1
+
+    def daily(self, days=30) -> List[Dict[str, Any]]:
+        """Per-day checks, skips and forced runs from the SQLite tier, newest first"""
+
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return []
+            rows = conn.execute("SELECT day, checks, skipped, forced FROM fingerprint_daily "
+                                "ORDER BY day DESC LIMIT ?", (days,)).fetchall()
+        return [{'day': day, 'checks': checks, 'skipped': skipped, 'forced': forced,
+                 'skip_ratio': round(skipped / checks, 3) if checks else None}
+                for day, checks, skipped, forced in rows]
+
+    def tracked(self) -> int:
+        """Incidents with a recorded fingerprint (the SQLite tier if there is one)"""
+
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return len(self._entries)
+            return conn.execute("SELECT COUNT(*) FROM enrichment_fingerprints").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'disk': bool(self.path),
+                'skip_ratio': round(self.counters[UNCHANGED] / self.counters['checks'], 3)
+                if self.counters['checks'] else None,
+            })
+            return stats
+
+
+_store = None
+_store_config = None
+_store_lock = threading.Lock()
+
+
+def configured_fingerprints() -> Optional[FingerprintStore]:
+    """Shared fingerprint store configured from the environment, or None when disabled
+
+    CIIA_FINGERPRINT_SIZE (sys_ids kept in memory, default 10000; 0 disables
+    skipping), CIIA_FINGERPRINT_TTL (seconds after which an incident is
+    re-enriched anyway, default 7 days; 0 = never) and CIIA_FINGERPRINT_PATH
+    (SQLite file, optional).
+    """
+
+    global _store, _store_config
+    config = (
+        int(os.environ.get('CIIA_FINGERPRINT_SIZE', str(DEFAULT_MAX_ENTRIES))),
+        float(os.environ.get('CIIA_FINGERPRINT_TTL', str(DEFAULT_TTL))),
+        os.environ.get('CIIA_FINGERPRINT_PATH') or None,
+    )
+    if config[0] <= 0:
+        return None
+
+    with _store_lock:
+        if _store is None or _store_config != config:
+            _store = FingerprintStore(max_entries=config[0], ttl=config[1], path=config[2])
+            _store_config = config
+        return _store
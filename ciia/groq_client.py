@@ -0,0 +1,378 @@
+"""
+Shared, rate-limit-aware Groq client
+
+One Groq client per (api key, base URL) is kept for the life of the process,
+and every completion goes through a GroqScheduler:
+
+- two token buckets budget requests per minute and tokens per minute (the
+  prompt estimate plus max_tokens is reserved, the unused part refunded
+  from the response's usage);
+- concurrency is adapted AIMD-style: +1/limit per success, halved on a 429
+  or when the x-ratelimit-remaining-* headers run dry;
+- the token bucket follows the x-ratelimit-*-tokens headers (TPM), so the
+  configured limit is only a starting point; an exhausted daily request
+  budget pauses admission until its reset;
+- callers queue for up to CIIA_GROQ_MAX_QUEUE_S seconds (retrying 429s
+  after retry-after) before a RateLimitQueueTimeout is raised;
+- a per-call `timeout` bounds queueing and the request together (the
+  enrichment's deadline budget); a stream that runs past it is cut short and
+  returns the text generated so far, flagged `truncated`.
+
+GROQ_BASE_URL (read by the SDK) points the client at a stand-in such as
+scripts/fake_groq_server.py.
+
+The SDK (and httpx under it) is imported when the first client is built, so
+the scheduler and its stats cost nothing at import time.
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Any, List, Optional, Tuple
+
+from ciia.prompt_budget import estimate_tokens as estimate_text_tokens
+
+
+DEFAULT_RPM = 30
+DEFAULT_TPM = 6000
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_QUEUE_S = 20.0
+
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+
+class RateLimitQueueTimeout(Exception):
+    """The Groq budget did not free up within the allowed queueing time"""
+
+
+def parse_duration(value) -> Optional[float]:
+    """Seconds from a Groq reset header ('2m59.56s', '7.66s', '250ms') or retry-after ('12')"""
+
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {'h': 3600.0, 'm': 60.0, 's': 1.0, 'ms': 0.001}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(estimate_text_tokens(m.get('content') or '') for m in messages) + 4 * len(messages)
+
+
+def _int_header(headers, name) -> Optional[int]:
+    try:
+        value = headers.get(name)
+        return int(float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Continuously refilling budget of `per_minute` units"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount, now) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount, now):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def observe(self, limit, remaining, reset_s, now):
+        """Align with the server's view of this budget"""
+
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+            self.rate = limit / 60.0
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+            if reset_s and remaining < self.capacity:
+                # Server says the deficit is back after reset_s
+                self.rate = max(self.rate, (self.capacity - remaining) / max(reset_s, 0.001))
+        self.level = min(self.level, self.capacity)
+
+
+class GroqScheduler:
+    """Admission control for Groq calls: RPM/TPM buckets plus AIMD concurrency"""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_queue_s=DEFAULT_MAX_QUEUE_S):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.max_queue_s = max_queue_s
+        self.limit = float(max(1, min(2, max_concurrency)))
+        self.in_flight = 0
+        self.waiting = 0
+        self._blocked_until = 0.0
+        self._cond = threading.Condition()
+        self.counters = {'admitted': 0, 'succeeded': 0, 'throttled': 0, 'errors': 0,
+                         'queue_timeouts': 0, 'queued_s_total': 0.0}
+
+    def acquire(self, estimated_tokens, deadline=None) -> float:
+        """Block until a call may start; returns the seconds spent queueing"""
+
+        started = time.monotonic()
+        deadline = deadline or started + self.max_queue_s
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    if self.in_flight < int(self.limit):
+                        wait = max(self.requests.wait_time(1, now),
+                                   self.tokens.wait_time(estimated_tokens, now),
+                                   self._blocked_until - now)
+                        if wait <= 0:
+                            self.requests.take(1, now)
+                            self.tokens.take(estimated_tokens, now)
+                            self.in_flight += 1
+                            self.counters['admitted'] += 1
+                            queued = now - started
+                            self.counters['queued_s_total'] += queued
+                            return queued
+                        if now + wait > deadline:
+                            self.counters['queue_timeouts'] += 1
+                            raise RateLimitQueueTimeout(
+                                f"Groq budget frees up in {wait:.1f}s, beyond the queueing limit")
+                    else:
+                        # Woken by release(); otherwise give up at the deadline
+                        wait = deadline - now
+                        if wait <= 0:
+                            self.counters['queue_timeouts'] += 1
+                            raise RateLimitQueueTimeout("No Groq concurrency slot within the queueing limit")
+                    self._cond.wait(wait)
+            finally:
+                self.waiting -= 1
+
+    def release(self, reserved_tokens, used_tokens=None, headers=None, throttled=False,
+                retry_after=None, failed=False):
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if used_tokens is not None and used_tokens < reserved_tokens:
+                self.tokens.refund(reserved_tokens - used_tokens, now)
+            if headers is not None:
+                self._observe(headers, now)
+
+            if throttled:
+                self.counters['throttled'] += 1
+                self.limit = max(1.0, self.limit / 2)
+                self._blocked_until = max(self._blocked_until, now + (retry_after or 1.0))
+            elif failed:
+                self.counters['errors'] += 1
+            else:
+                self.counters['succeeded'] += 1
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+    def _observe(self, headers, now):
+        # Groq reports requests per *day* and tokens per *minute*: the request
+        # headers can only tell us when the daily budget is gone
+        remaining_requests = _int_header(headers, 'x-ratelimit-remaining-requests')
+        if remaining_requests == 0:
+            reset = parse_duration(headers.get('x-ratelimit-reset-requests')) or 60.0
+            self._blocked_until = max(self._blocked_until, now + reset)
+
+        remaining_tokens = _int_header(headers, 'x-ratelimit-remaining-tokens')
+        self.tokens.observe(_int_header(headers, 'x-ratelimit-limit-tokens'), remaining_tokens,
+                            parse_duration(headers.get('x-ratelimit-reset-tokens')), now)
+        if remaining_requests == 0 or remaining_tokens == 0:
+            # About to be throttled: back off before the server makes us
+            self.limit = max(1.0, self.limit / 2)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            now = time.monotonic()
+            self.requests._refill(now)
+            self.tokens._refill(now)
+            stats = dict(self.counters)
+            stats['queued_s_total'] = round(stats['queued_s_total'], 3)
+            stats.update({
+                'concurrency_limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'requests_available': round(self.requests.level, 1),
+                'rpm': round(self.requests.capacity),
+                'tokens_available': round(self.tokens.level),
+                'tpm': round(self.tokens.capacity),
+            })
+            return stats
+
+
+class RateLimitedGroq:
+    """Groq chat completions admitted by a GroqScheduler"""
+
+    def __init__(self, api_key, scheduler: GroqScheduler, base_url=None):
+        from groq import Groq
+        
+        # The scheduler owns retries, so the SDK's own backoff is disabled
+        self.client = Groq(api_key=api_key, base_url=base_url, max_retries=0)
+        self.scheduler = scheduler
+
+    def complete(self, messages, model, temperature, max_tokens, timeout=None) -> Tuple[str, Dict[str, Any]]:
+        """(content, call stats); raises RateLimitQueueTimeout or the SDK's errors"""
+
+        def consume(raw, started, until):
+            completion = raw.parse()
+            usage = getattr(completion, 'usage', None)
+            return completion.choices[0].message.content, usage, {}
+
+        return self._admitted(messages, consume, timeout,
+                              model=model, temperature=temperature, max_tokens=max_tokens)
+
+    def stream(self, messages, model, temperature, max_tokens,
+               on_delta: Callable[[str], None], timeout=None) -> Tuple[str, Dict[str, Any]]:
+        """Streamed completion: on_delta(text) per chunk; stats add ttft_ms and tokens_per_s"""
+
+        def consume(raw, started, until):
+            parts = []
+            first = None
+            chunks = 0
+            usage = None
+            truncated = False
+            stream = raw.parse()
+            try:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        if first is None:
+                            first = time.monotonic()
+                        chunks += 1
+                        parts.append(delta)
+                        on_delta(delta)
+                    x_groq = getattr(chunk, 'x_groq', None)
+                    if x_groq is not None and getattr(x_groq, 'usage', None) is not None:
+                        usage = x_groq.usage
+                    if until is not None and time.monotonic() >= until:
+                        truncated = True
+                        break
+            except Exception:
+                # A read timeout at the deadline still leaves usable text
+                if not parts or until is None or time.monotonic() < until:
+                    raise
+                truncated = True
+            finally:
+                if truncated:
+                    stream.close()
+            finished = time.monotonic()
+
+            # Usage arrives with the last chunk; otherwise one chunk ~ one token
+            completion_tokens = getattr(usage, 'completion_tokens', None) or chunks
+            generating = finished - first if first is not None else 0.0
+            return ''.join(parts), usage, {
+                'ttft_ms': round((first - started) * 1000, 1) if first is not None else None,
+                'completion_tokens': completion_tokens,
+                'tokens_per_s': round(completion_tokens / generating, 1) if generating > 0 else None,
+                'generation_ms': round((finished - started) * 1000, 1),
+                'truncated': truncated,
+            }
+
+        return self._admitted(messages, consume, timeout, model=model, temperature=temperature,
+                              max_tokens=max_tokens, stream=True)
+
+    def _admitted(self, messages, consume, timeout, **request):
+        """Queue for budget, call, retry 429s until the deadline; consume(raw, started, until)
+
+        `timeout` (seconds, None = only the queueing limit) covers queueing and
+        the request; the SDK call gets whatever is left of it when admitted.
+        """
+
+        from groq import RateLimitError
+
+        reserved = estimate_tokens(messages) + request['max_tokens']
+        now = time.monotonic()
+        until = now + timeout if timeout is not None else None
+        deadline = now + self.scheduler.max_queue_s
+        if until is not None:
+            deadline = min(deadline, until)
+        queued = 0.0
+        attempts = 0
+        while True:
+            attempts += 1
+            queued += self.scheduler.acquire(reserved, deadline)
+            started = time.monotonic()
+            if until is not None:
+                request['timeout'] = max(0.001, until - started)
+            try:
+                raw = self.client.chat.completions.with_raw_response.create(messages=messages, **request)
+                content, usage, extra = consume(raw, started, until)
+            except RateLimitError as e:
+                headers = e.response.headers
+                self.scheduler.release(reserved, headers=headers, throttled=True,
+                                       retry_after=parse_duration(headers.get('retry-after')))
+                continue
+            except Exception:
+                self.scheduler.release(reserved, failed=True)
+                raise
+
+            total_tokens = getattr(usage, 'total_tokens', None)
+            self.scheduler.release(reserved, used_tokens=total_tokens, headers=raw.headers)
+            stats = {
+                'attempts': attempts,
+                'queued_ms': round(queued * 1000, 1),
+                'total_tokens': total_tokens,
+            }
+            stats.update(extra)
+            return content, stats
+
+
+_scheduler = None
+_clients = {}
+_lock = threading.Lock()
+
+
+def groq_scheduler() -> GroqScheduler:
+    """Process-wide scheduler (GROQ_RPM, GROQ_TPM, CIIA_GROQ_MAX_CONCURRENCY, CIIA_GROQ_MAX_QUEUE_S)"""
+
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = GroqScheduler(
+                rpm=int(os.environ.get('GROQ_RPM', str(DEFAULT_RPM))),
+                tpm=int(os.environ.get('GROQ_TPM', str(DEFAULT_TPM))),
+                max_concurrency=int(os.environ.get('CIIA_GROQ_MAX_CONCURRENCY', str(DEFAULT_MAX_CONCURRENCY))),
+                max_queue_s=float(os.environ.get('CIIA_GROQ_MAX_QUEUE_S', str(DEFAULT_MAX_QUEUE_S)))
+            )
+        return _scheduler
+
+
+def shared_groq(api_key) -> RateLimitedGroq:
+    """Shared client per (api key, GROQ_BASE_URL), kept across warm invocations"""
+
+    scheduler = groq_scheduler()
+    key = (api_key, os.environ.get('GROQ_BASE_URL'))
+    with _lock:
+        client = _clients.get(key)
+    if client is not None:
+        return client
+
+    # Built outside the lock: the first build imports the SDK, and
+    # groq_scheduler() (health checks) must not wait for that
+    client = RateLimitedGroq(api_key, scheduler, base_url=key[1])
+    with _lock:
+        return _clients.setdefault(key, client)
@@ -0,0 +1,130 @@
+"""
+Pooled HTTP sessions for the ServiceNow Table API
+
+Sessions are kept at module level, one per (instance, user), so warm serverless
+invocations and long-running scripts reuse keep-alive connections instead of
+paying a new TCP+TLS handshake for every call.
+"""
+
+import os
+import threading
+from typing import Dict, Any
+
+
+DEFAULT_POOL_CONNECTIONS = 4
+# Floor of the derived per-host pool size (see default_pool_maxsize)
+MIN_POOL_MAXSIZE = 10
+
+_sessions = {}
+_session_uses = {}
+_lock = threading.Lock()
+
+
+def instance_url(snow_instance):
+    """Base URL for a ServiceNow instance (bare host names default to https)"""
+    
+    snow_instance = snow_instance or ''
+    if '://' in snow_instance:
+        return snow_instance.rstrip('/')
+    return f"https://{snow_instance}"
+
+
+def table_url(snow_instance, table='incident'):
+    """Table API URL for a ServiceNow table"""
+    return f"{instance_url(snow_instance)}/api/now/table/{table}"
+
+
+def get_session(snow_instance, snow_user, snow_password):
+    """Return the shared keep-alive session for a ServiceNow instance"""
+    
+    key = (instance_url(snow_instance), snow_user)
+    with _lock:
+        session = _sessions.get(key)
+        if session is None or session.auth.password != snow_password:
+            session = _new_session(snow_user, snow_password)
+            _sessions[key] = session
+            _session_uses[key] = 0
+        _session_uses[key] += 1
+        return session
+
+
+def default_pool_maxsize(runs=None) -> int:
+    """Keep-alive connections per host for the concurrency this process is configured for
+
+    Each enrichment run fans its searches out to CIIA_SEARCH_MAX_WORKERS
+    threads (default 3), and a batch runs CIIA_BATCH_CONCURRENCY incidents at
+    once (default 4) on each of the CIIA_JOB_WORKERS job workers (default 2);
+    `runs` overrides that number of concurrent runs (e.g. request threads of a
+    load test). The dashboard loads two page streams of CIIA_DASHBOARD_WORKERS
+    (default 4) each. A pool smaller than the requests in flight closes the
+    extra connections after use, so every burst pays new handshakes.
+    """
+
+    if runs is None:
+        runs = (max(1, int(os.environ.get('CIIA_JOB_WORKERS', '2')))
+                * max(1, int(os.environ.get('CIIA_BATCH_CONCURRENCY', '4'))))
+    searches = runs * max(1, int(os.environ.get('CIIA_SEARCH_MAX_WORKERS', '3')))
+    dashboard = 2 * max(1, int(os.environ.get('CIIA_DASHBOARD_WORKERS', '4')))
+    return max(MIN_POOL_MAXSIZE, searches, dashboard)
+
+
+def _new_session(snow_user, snow_password):
+    """Create a session with a sized connection pool"""
+    
+    # Deferred so pool_stats() (health checks) does not load requests
+    import requests
+    from requests.adapters import HTTPAdapter
+    from requests.auth import HTTPBasicAuth
+    
+    pool_connections = int(os.environ.get('SNOW_POOL_CONNECTIONS', DEFAULT_POOL_CONNECTIONS))
+    pool_maxsize = int(os.environ.get('SNOW_POOL_MAXSIZE') or default_pool_maxsize())
+    
+    session = requests.Session()
+    session.auth = HTTPBasicAuth(snow_user, snow_password)
+    session.headers.update({"Accept": "application/json"})
+    
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def pool_stats() -> Dict[str, Any]:
+    """Pool sizing and reuse counters for every shared session
+    
+    `connections` counts new TCP (+TLS) connections opened and `requests`
+    counts requests sent over them, so requests - connections is the number
+    of handshakes saved by keep-alive.
+    """
+    
+    stats = {}
+    with _lock:
+        for (base_url, user), session in _sessions.items():
+            adapter = session.get_adapter(base_url)
+            connections = 0
+            sent = 0
+            for pool_key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(pool_key)
+                if pool is None:
+                    continue
+                connections += pool.num_connections
+                sent += pool.num_requests
+            stats[f"{user}@{base_url}"] = {
+                'pool_connections': adapter._pool_connections,
+                'pool_maxsize': adapter._pool_maxsize,
+                'session_uses': _session_uses.get((base_url, user), 0),
+                'connections': connections,
+                'requests': sent,
+                'reused': max(sent - connections, 0)
+            }
+    return stats
+
+
+def close_sessions():
+    """Close every shared session (mainly for scripts and benchmarks)"""
+    
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _session_uses.clear()
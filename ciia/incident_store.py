@@ -0,0 +1,336 @@
+"""
+Local store of resolved/closed incidents, kept current by a watermark sync
+
+The store is a superset of the full-text search index: the same SQLite file
+also holds the category / CI attributes used by the other search strategies,
+the resolutions extracted at ingest time (the resolution knowledge base,
+ciia/resolution_kb.py), a token set and MinHash signature
+per incident and the sync watermark. The retrieval code reads from it instead of querying
+ServiceNow live for records that rarely change.
+
+NumPy (ciia.ranking) is imported by the methods that hash or rank, so
+opening a store for its sync metrics (the health check) stays light.
+"""
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional
+
+from ciia.resolution_kb import SCHEMA as RESOLUTION_KB_SCHEMA, store_extracted
+from ciia.search_index import IncidentSearchIndex, RESOLVED_STATES
+
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident_attrs (
+    sys_id TEXT PRIMARY KEY,
+    category TEXT,
+    cmdb_ci TEXT,
+    sys_updated_on TEXT
+);
+CREATE INDEX IF NOT EXISTS incident_attrs_category ON incident_attrs (category, sys_updated_on);
+CREATE INDEX IF NOT EXISTS incident_attrs_cmdb_ci ON incident_attrs (cmdb_ci, sys_updated_on);
+CREATE TABLE IF NOT EXISTS incident_tokens (
+    sys_id TEXT PRIMARY KEY,
+    tokens TEXT,
+    minhash BLOB
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    job TEXT PRIMARY KEY,
+    watermark_ts TEXT,
+    watermark_sys_id TEXT,
+    last_started_at REAL,
+    last_finished_at REAL,
+    last_records INTEGER,
+    last_elapsed REAL,
+    total_records INTEGER,
+    last_caught_up INTEGER
+);
+"""
+
+# Columns added to existing store files
+STORE_MIGRATIONS = {
+    'last_caught_up': "ALTER TABLE sync_state ADD COLUMN last_caught_up INTEGER",
+}
+
+EPOCH_WATERMARK = ('1970-01-01 00:00:00', '')
+
+SNOW_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def text_tokens(record) -> List[str]:
+    """Sorted unique lowercase words of the short description and description"""
+    from ciia.ranking import tokenize
+    return sorted(tokenize(record))
+
+
+class IncidentStore(IncidentSearchIndex):
+    """Resolved incidents, extracted resolutions and tokens in one SQLite file"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._lsh = None
+        self._lsh_lock = threading.Lock()
+
+    def _connect(self, readonly=False):
+        conn = super()._connect(readonly)
+        if not readonly:
+            conn.executescript(STORE_SCHEMA)
+            conn.executescript(RESOLUTION_KB_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(sync_state)")}
+            for column, statement in STORE_MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+        return conn
+
+    def _upsert(self, conn, records):
+        from ciia.ranking import default_hasher, tokenize
+
+        records = list(records)
+        count = super()._upsert(conn, records)
+
+        # MinHash signatures are precomputed in one vectorized batch per page
+        signatures = default_hasher().signatures([tokenize(r) for r in records])
+
+        resolved = []
+        for record, signature in zip(records, signatures):
+            sys_id = record.get('sys_id')
+            if not sys_id:
+                continue
+            if str(record.get('state', '')) not in RESOLVED_STATES:
+                for table in ('incident_attrs', 'resolution_kb', 'incident_tokens'):
+                    conn.execute(f"DELETE FROM {table} WHERE sys_id = ?", (sys_id,))
+                continue
+
+            conn.execute(
+                "INSERT OR REPLACE INTO incident_attrs (sys_id, category, cmdb_ci, sys_updated_on) VALUES (?, ?, ?, ?)",
+                (sys_id, record.get('category', ''), record.get('cmdb_ci', ''), record.get('sys_updated_on', ''))
+            )
+
+            resolved.append(record)
+
+            conn.execute(
+                "INSERT OR REPLACE INTO incident_tokens (sys_id, tokens, minhash) VALUES (?, ?, ?)",
+                (sys_id, ' '.join(text_tokens(record)), signature.tobytes())
+            )
+
+        # Resolutions are extracted once here, in the page's transaction
+        store_extracted(conn, resolved)
+        return count
+
+    # -- retrieval -----------------------------------------------------------
+
+    def find_by(self, field, value, limit=10, exclude_sys_id=None) -> List[Dict[str, Any]]:
+        """Most recently updated incidents with category/cmdb_ci equal to value"""
+
+        if field not in ('category', 'cmdb_ci'):
+            raise ValueError(f"Unsupported lookup field: {field}")
+
+        rows = self._reader().execute(
+            f"""SELECT d.sys_id, d.record
+                FROM incident_attrs a
+                JOIN incident_docs d ON d.sys_id = a.sys_id
+                WHERE a.{field} = ?
+                ORDER BY a.sys_updated_on DESC
+                LIMIT ?""",
+            (value, limit + 1)
+        ).fetchall()
+
+        results = [json.loads(row['record']) for row in rows if row['sys_id'] != exclude_sys_id]
+        return results[:limit]
+
+    def signatures_for(self, sys_ids) -> Dict[str, Any]:
+        """Stored MinHash signatures (uint32 arrays) for the given incidents (missing ones omitted)"""
+
+        import numpy as np
+
+        found = {}
+        sys_ids = list(sys_ids)
+        for start in range(0, len(sys_ids), 500):
+            chunk = sys_ids[start:start + 500]
+            rows = self._reader().execute(
+                f"SELECT sys_id, minhash FROM incident_tokens WHERE sys_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ).fetchall()
+            for row in rows:
+                if row['minhash']:
+                    found[row['sys_id']] = np.frombuffer(row['minhash'], dtype=np.uint32)
+        return found
+
+    def _lsh_state(self):
+        """LSH index over every stored signature, rebuilt when the store changes"""
+
+        import numpy as np
+        from ciia.ranking import default_hasher, LSHIndex
+
+        changed_at = self.meta().get('changed_at')
+        with self._lsh_lock:
+            if self._lsh is None or self._lsh[0] != changed_at:
+                rows = self._reader().execute(
+                    "SELECT sys_id, minhash FROM incident_tokens WHERE minhash IS NOT NULL"
+                ).fetchall()
+                sys_ids = [row['sys_id'] for row in rows]
+                if rows:
+                    matrix = np.frombuffer(b''.join(row['minhash'] for row in rows), dtype=np.uint32)
+                    matrix = matrix.reshape(len(rows), -1)
+                else:
+                    matrix = np.zeros((0, default_hasher().num_perm), dtype=np.uint32)
+                self._lsh = (changed_at, sys_ids, matrix, LSHIndex().build(matrix))
+            return self._lsh
+
+    def find_similar_text(self, record, limit=15, exclude_sys_id=None) -> List[Dict[str, Any]]:
+        """LSH candidates for a record, best estimated Jaccard first"""
+
+        import numpy as np
+        from ciia.ranking import default_hasher, estimated_jaccard, tokenize
+
+        _, sys_ids, matrix, lsh = self._lsh_state()
+        query = default_hasher().signature(tokenize(record))
+        candidates = lsh.candidates(query)
+        if len(candidates) == 0:
+            return []
+
+        scores = estimated_jaccard(query, matrix[candidates])
+        order = candidates[np.argsort(-scores, kind='stable')]
+        wanted = [sys_ids[i] for i in order if sys_ids[i] != exclude_sys_id][:limit]
+        if not wanted:
+            return []
+
+        rows = self._reader().execute(
+            f"SELECT sys_id, record FROM incident_docs WHERE sys_id IN ({','.join('?' * len(wanted))})",
+            wanted
+        ).fetchall()
+        by_id = {row['sys_id']: json.loads(row['record']) for row in rows}
+        return [by_id[sys_id] for sys_id in wanted if sys_id in by_id]
+
+    def resolution_for(self, sys_id) -> Optional[Dict[str, Any]]:
+        """Resolution extracted at ingest time for one incident"""
+
+        row = self._reader().execute(
+            "SELECT resolution, workaround, root_cause FROM resolution_kb WHERE sys_id = ?",
+            (sys_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    # -- sync state ----------------------------------------------------------
+
+    def watermark(self, conn, job='resolved_incidents'):
+        row = conn.execute(
+            "SELECT watermark_ts, watermark_sys_id FROM sync_state WHERE job = ?", (job,)
+        ).fetchone()
+        if row is None:
+            return EPOCH_WATERMARK
+        return row[0], row[1]
+
+    def commit_page(self, conn, records, watermark, job='resolved_incidents'):
+        """Upsert one page and advance the watermark in the same transaction
+
+        A page changes the store but does not make it fresh: only a run that
+        catches up does (record_run).
+        """
+
+        count = self._upsert(conn, records)
+        self._set_meta(conn, changed_at=time.time())
+        conn.execute(
+            """INSERT INTO sync_state (job, watermark_ts, watermark_sys_id, total_records)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(job) DO UPDATE SET
+                   watermark_ts = excluded.watermark_ts,
+                   watermark_sys_id = excluded.watermark_sys_id,
+                   total_records = COALESCE(sync_state.total_records, 0) + ?""",
+            (job, watermark[0], watermark[1], len(records), len(records))
+        )
+        conn.commit()
+        return count
+
+    def record_run(self, conn, started_at, finished_at, records, caught_up, job='resolved_incidents'):
+        """Record a completed run; only one that caught up (ended on a short
+        or empty page) marks the store fresh and counts as the last sync"""
+
+        watermark = self.watermark(conn, job)
+        conn.execute(
+            """INSERT INTO sync_state (job, watermark_ts, watermark_sys_id, last_started_at,
+                                       last_finished_at, last_records, last_elapsed, total_records,
+                                       last_caught_up)
+               VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)
+               ON CONFLICT(job) DO UPDATE SET
+                   last_started_at = excluded.last_started_at,
+                   last_finished_at = COALESCE(excluded.last_finished_at, sync_state.last_finished_at),
+                   last_records = excluded.last_records,
+                   last_elapsed = excluded.last_elapsed,
+                   last_caught_up = excluded.last_caught_up""",
+            (job, watermark[0], watermark[1], started_at, finished_at if caught_up else None, records,
+             finished_at - started_at, int(caught_up))
+        )
+        if caught_up:
+            self._set_meta(conn, updated_at=finished_at)
+        conn.commit()
+
+    def sync_metrics(self, job='resolved_incidents') -> Dict[str, Any]:
+        """Throughput of the last sync run and time since the last successful one"""
+
+        row = self._reader().execute("SELECT * FROM sync_state WHERE job = ?", (job,)).fetchone()
+        if row is None:
+            return {'job': job, 'synced': False}
+
+        metrics = {
+            'job': job,
+            'synced': True,
+            'watermark': row['watermark_ts'],
+            'total_records': row['total_records'] or 0,
+            'last_records': row['last_records'] or 0,
+            'last_elapsed_s': round(row['last_elapsed'] or 0, 3),
+            'records_per_s': round((row['last_records'] or 0) / row['last_elapsed'], 1) if row['last_elapsed'] else 0.0,
+            'seconds_since_sync': round(time.time() - row['last_finished_at'], 1) if row['last_finished_at'] else None,
+            # False while a run stopped at max_pages with more changes pending
+            'caught_up': bool(row['last_caught_up']) if 'last_caught_up' in row.keys() else False,
+        }
+
+        # Age of the newest change seen; grows on a quiet instance without the store
+        # falling behind, so staleness is seconds_since_sync
+        try:
+            newest = datetime.strptime(row['watermark_ts'], SNOW_TIME_FORMAT).replace(tzinfo=timezone.utc)
+            metrics['newest_change_age_s'] = round(time.time() - newest.timestamp(), 1)
+        except (TypeError, ValueError):
+            metrics['newest_change_age_s'] = None
+        return metrics
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path) -> IncidentStore:
+    """Shared store instance per file, kept across warm invocations"""
+
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = IncidentStore(path)
+            _stores[path] = store
+        return store
+
+
+def store_settings():
+    """(path, max age in hours) from CIIA_INCIDENT_STORE and CIIA_INCIDENT_STORE_MAX_AGE
+
+    The max age (hours since the last sync run that caught up, default 24) bounds
+    staleness; 0 disables the check.
+    """
+
+    return os.environ.get('CIIA_INCIDENT_STORE'), float(os.environ.get('CIIA_INCIDENT_STORE_MAX_AGE', '24'))
+
+
+def configured_store(settings=None) -> Optional[IncidentStore]:
+    """The store of `settings` (default: store_settings()) if it has synced recently, else None"""
+
+    path, max_age = settings or store_settings()
+    if not path:
+        return None
+
+    store = get_store(path)
+    if not store.usable(max_age if max_age > 0 else None):
+        return None
+    return store
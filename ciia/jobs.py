@@ -0,0 +1,424 @@
+"""
+Background enrichment jobs
+
+In async mode the enrichment endpoint only enqueues the incident and answers
+202 Accepted with a job id; a worker pool drains the queue, runs the pipeline
+(including the work-notes PATCH) and records the outcome, which callers poll
+through GET /api/enrich?job_id=...
+
+Two queue backends with the same interface:
+- MemoryJobQueue: in-process, for a single long-lived server (scripts/serve_local.py)
+- SQLiteJobQueue: a file shared by every process that can see it; claiming a
+  job is a single IMMEDIATE transaction, so several workers can drain it.
+  A claim is a lease (CIIA_JOB_LEASE_S) that the worker pool renews while the
+  job runs; a job whose worker died is claimed again once its lease expires,
+  up to CIIA_JOB_MAX_ATTEMPTS claims, and then fails.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Callable
+
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+FINISHED = (SUCCEEDED, FAILED)
+
+# Finished jobs kept for status polling
+DEFAULT_RETENTION = 1000
+
+# Seconds a claim holds a job without being renewed, and claims before it fails
+DEFAULT_LEASE_S = 120.0
+DEFAULT_MAX_ATTEMPTS = 3
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    incident_sys_id TEXT NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    claimed_at REAL,
+    lease_until REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs(status, created_at);
+"""
+
+# Columns added to existing queue files
+SQLITE_MIGRATIONS = {
+    'attempts': "ALTER TABLE jobs ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0",
+    'claimed_at': "ALTER TABLE jobs ADD COLUMN claimed_at REAL",
+    'lease_until': "ALTER TABLE jobs ADD COLUMN lease_until REAL",
+}
+
+
+def new_job(incident_sys_id, payload=None) -> Dict[str, Any]:
+    return {
+        'job_id': uuid.uuid4().hex,
+        'incident_sys_id': incident_sys_id,
+        'payload': payload or {},
+        'status': QUEUED,
+        'result': None,
+        'error': None,
+        'worker': None,
+        'created_at': time.time(),
+        'started_at': None,
+        'finished_at': None,
+        'attempts': 0,
+        'claimed_at': None,
+        'lease_until': None,
+    }
+
+
+def job_view(job) -> Dict[str, Any]:
+    """Public status of a job, with queue/run durations"""
+
+    view = {k: job[k] for k in ('job_id', 'incident_sys_id', 'status', 'result', 'error', 'attempts')}
+    now = time.time()
+    started, finished = job['started_at'], job['finished_at']
+    view['queued_ms'] = round(((started or now) - job['created_at']) * 1000, 1)
+    if started:
+        view['run_ms'] = round(((finished or now) - started) * 1000, 1)
+    return view
+
+
+class MemoryJobQueue:
+    """In-process FIFO; job status lives as long as the process"""
+
+    backend = 'memory'
+
+    def __init__(self, retention=DEFAULT_RETENTION):
+        self.retention = retention
+        self._jobs = OrderedDict()
+        self._pending = deque()
+        self._cond = threading.Condition()
+
+    def enqueue(self, incident_sys_id, payload=None) -> Dict[str, Any]:
+        job = new_job(incident_sys_id, payload)
+        with self._cond:
+            self._jobs[job['job_id']] = job
+            self._pending.append(job['job_id'])
+            self._cond.notify()
+        return dict(job)
+
+    def claim(self, worker, timeout=1.0) -> Optional[Dict[str, Any]]:
+        """Next queued job marked running, or None after timeout"""
+
+        with self._cond:
+            if not self._pending:
+                self._cond.wait(timeout)
+            if not self._pending:
+                return None
+            job = self._jobs[self._pending.popleft()]
+            now = time.time()
+            job.update(status=RUNNING, worker=worker, started_at=now, claimed_at=now, attempts=job['attempts'] + 1)
+            return dict(job)
+
+    def renew(self, job_id, worker) -> bool:
+        """Workers live and die with this process, so claims never expire"""
+        return True
+
+    def finish(self, job_id, result=None, error=None, worker=None):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            job.update(status=FAILED if error else SUCCEEDED, result=result, error=error,
+                       finished_at=time.time())
+            self._prune()
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.retention)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+            oldest = None
+            for job in self._jobs.values():
+                counts[job['status']] += 1
+                if job['status'] == QUEUED and (oldest is None or job['created_at'] < oldest):
+                    oldest = job['created_at']
+        return _stats(self.backend, counts, oldest)
+
+
+class SQLiteJobQueue:
+    """Durable queue in a SQLite file; safe for several worker processes"""
+
+    backend = 'sqlite'
+
+    def __init__(self, path, retention=DEFAULT_RETENTION, poll_interval=0.25, lease_s=DEFAULT_LEASE_S,
+                 max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.lease_s = lease_s
+        self.max_attempts = max(1, max_attempts)
+        self._local = threading.local()
+        self._wakeup = threading.Event()
+        with self._conn() as conn:
+            conn.executescript(SQLITE_SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in SQLITE_MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            if 'lease_until' not in columns:
+                # Jobs claimed before leases existed get one from their start
+                conn.execute("UPDATE jobs SET lease_until = COALESCE(started_at, created_at) + ? WHERE status = ?",
+                             (self.lease_s, RUNNING))
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row_job(row) -> Dict[str, Any]:
+        job = dict(row)
+        job['payload'] = json.loads(job['payload']) if job['payload'] else {}
+        job['result'] = json.loads(job['result']) if job['result'] else None
+        return job
+
+    def enqueue(self, incident_sys_id, payload=None) -> Dict[str, Any]:
+        job = new_job(incident_sys_id, payload)
+        self._conn().execute(
+            "INSERT INTO jobs (job_id, incident_sys_id, payload, status, created_at) VALUES (?, ?, ?, ?, ?)",
+            (job['job_id'], incident_sys_id, json.dumps(job['payload']), QUEUED, job['created_at']))
+        self._wakeup.set()
+        return job
+
+    def claim(self, worker, timeout=1.0) -> Optional[Dict[str, Any]]:
+        deadline = time.time() + timeout
+        while True:
+            job = self._claim_one(worker)
+            if job is not None or time.time() >= deadline:
+                return job
+            # Local enqueues wake us at once; other processes are seen on the next poll
+            self._wakeup.wait(min(self.poll_interval, max(0.0, deadline - time.time())))
+            self._wakeup.clear()
+
+    def _claim_one(self, worker):
+        """Oldest queued job, or a running one whose lease expired (its worker died)"""
+
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = 'Lease expired after ' || attempts || ' attempts', "
+                "finished_at = ? WHERE status = ? AND lease_until < ? AND attempts >= ?",
+                (FAILED, now, RUNNING, now, self.max_attempts))
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) "
+                "ORDER BY created_at LIMIT 1", (QUEUED, RUNNING, now)).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            if row['status'] == RUNNING:
+                print(f"Job {row['job_id']} lease of worker {row['worker']} expired; claimed again by {worker}")
+            lease_until = now + self.lease_s
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, started_at = COALESCE(started_at, ?), claimed_at = ?, "
+                "lease_until = ?, attempts = attempts + 1 WHERE job_id = ?",
+                (RUNNING, worker, now, now, lease_until, row['job_id']))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        job = self._row_job(row)
+        job.update(status=RUNNING, worker=worker, started_at=job['started_at'] or now, claimed_at=now,
+                   lease_until=lease_until, attempts=job['attempts'] + 1)
+        return job
+
+    def renew(self, job_id, worker) -> bool:
+        """Extend the lease of a job this worker still holds; False once another worker took it over"""
+
+        cursor = self._conn().execute(
+            "UPDATE jobs SET lease_until = ? WHERE job_id = ? AND worker = ? AND status = ?",
+            (time.time() + self.lease_s, job_id, worker, RUNNING))
+        return cursor.rowcount > 0
+
+    def finish(self, job_id, result=None, error=None, worker=None):
+        """Record the outcome; with `worker`, only if that worker still holds the job"""
+
+        conn = self._conn()
+        held = " AND worker = ? AND status = ?" if worker else ""
+        conn.execute(
+            f"UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?{held}",
+            (FAILED if error else SUCCEEDED, json.dumps(result) if result is not None else None,
+             error, time.time(), job_id) + ((worker, RUNNING) if worker else ()))
+        conn.execute(
+            "DELETE FROM jobs WHERE job_id IN (SELECT job_id FROM jobs WHERE status IN (?, ?) "
+            "ORDER BY finished_at DESC LIMIT -1 OFFSET ?)", FINISHED + (self.retention,))
+
+    def get(self, job_id) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_job(row) if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        counts = {QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}
+        for status, count in conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+            counts[status] = count
+        oldest = conn.execute("SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+        return _stats(self.backend, counts, oldest)
+
+
+def _stats(backend, counts, oldest_queued) -> Dict[str, Any]:
+    return {
+        'backend': backend,
+        'queue_depth': counts[QUEUED],
+        'running': counts[RUNNING],
+        'succeeded': counts[SUCCEEDED],
+        'failed': counts[FAILED],
+        'oldest_queued_s': round(time.time() - oldest_queued, 1) if oldest_queued else None,
+    }
+
+
+class WorkerPool:
+    """Daemon threads that claim jobs and run `process(job)` -> JSON-able result"""
+
+    def __init__(self, queue, process: Callable[[Dict[str, Any]], Any], workers=2):
+        self.queue = queue
+        self.process = process
+        self.workers = workers
+        self._threads = []
+        self._stop = threading.Event()
+        # job_id -> worker, for the lease heartbeat
+        self._running = {}
+        self._running_lock = threading.Lock()
+        self.processed = 0
+
+    def start(self):
+        prefix = f"{os.getpid()}-"
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, args=(f"{prefix}{i}",),
+                                      name=f"ciia-job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        lease_s = getattr(self.queue, 'lease_s', None)
+        if lease_s:
+            threading.Thread(target=self._heartbeat, args=(lease_s / 3,), name='ciia-job-heartbeat',
+                             daemon=True).start()
+        return self
+
+    def alive(self):
+        return sum(1 for t in self._threads if t.is_alive())
+
+    def _heartbeat(self, interval):
+        """Renew the leases of the jobs this pool is running"""
+        while not self._stop.wait(interval):
+            with self._running_lock:
+                running = list(self._running.items())
+            for job_id, worker in running:
+                try:
+                    if not self.queue.renew(job_id, worker):
+                        print(f"Job {job_id} was taken over by another worker")
+                except Exception as e:
+                    print(f"Job lease renewal error: {e}")
+
+    def _run(self, worker):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker)
+            except Exception as e:
+                print(f"Job claim error: {e}")
+                time.sleep(1.0)
+                continue
+            if job is None:
+                continue
+            with self._running_lock:
+                self._running[job['job_id']] = worker
+            try:
+                result = self.process(job)
+                self.queue.finish(job['job_id'], result=result, worker=worker)
+            except Exception as e:
+                print(f"Job {job['job_id']} failed: {e}")
+                self.queue.finish(job['job_id'], error=str(e), worker=worker)
+            finally:
+                with self._running_lock:
+                    self._running.pop(job['job_id'], None)
+            self.processed += 1
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+
+_queue = None
+_queue_config = None
+_pool = None
+_lock = threading.Lock()
+
+
+def queue_settings():
+    """(path, retention, lease_s, max_attempts, workers) from the environment
+
+    CIIA_JOB_QUEUE_PATH (SQLite file; in-process queue when unset),
+    CIIA_JOB_RETENTION, CIIA_JOB_LEASE_S and CIIA_JOB_MAX_ATTEMPTS (the SQLite
+    queue's claim lease and how often a job whose worker died is claimed
+    again) and CIIA_JOB_WORKERS (worker threads, default 2).
+    """
+
+    return (os.environ.get('CIIA_JOB_QUEUE_PATH') or None,
+            int(os.environ.get('CIIA_JOB_RETENTION', str(DEFAULT_RETENTION))),
+            float(os.environ.get('CIIA_JOB_LEASE_S', str(DEFAULT_LEASE_S))),
+            int(os.environ.get('CIIA_JOB_MAX_ATTEMPTS', str(DEFAULT_MAX_ATTEMPTS))),
+            max(1, int(os.environ.get('CIIA_JOB_WORKERS', '2'))))
+
+
+def configured_queue(settings=None):
+    """Shared queue for `settings` (default: queue_settings()): SQLite when a path is set, else in-process"""
+
+    global _queue, _queue_config
+    config = (settings or queue_settings())[:4]
+    with _lock:
+        if _queue is None or _queue_config != config:
+            path, retention, lease_s, max_attempts = config
+            _queue = (SQLiteJobQueue(path, retention, lease_s=lease_s, max_attempts=max_attempts) if path
+                      else MemoryJobQueue(retention))
+            _queue_config = config
+        return _queue
+
+
+def ensure_workers(process: Callable[[Dict[str, Any]], Any], settings=None) -> WorkerPool:
+    """Start the process-wide worker pool once (default: queue_settings())"""
+
+    global _pool
+    settings = settings or queue_settings()
+    queue = configured_queue(settings)
+    with _lock:
+        if _pool is None or _pool.queue is not queue or not _pool.alive():
+            if _pool is not None:
+                _pool.stop(timeout=0)
+            _pool = WorkerPool(queue, process, settings[4]).start()
+        return _pool
+
+
+def worker_pool() -> Optional[WorkerPool]:
+    return _pool
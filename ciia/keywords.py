@@ -0,0 +1,111 @@
+"""
+Single-pass technical keyword extraction
+
+One precompiled pattern classifies every interesting token in a single scan:
+error codes (ERW1234, 0x8007045D, ERROR: 42, 500 ERROR, HTTP 503), technical terms
+(TIMEOUT, AUTH..., matched at the start of a word) and all-caps application
+names. Keywords are scored by kind, frequency and whether they appear in the
+short description, and the top-k is chosen deterministically. Very long
+descriptions (pasted log dumps) are only scanned at the head and tail, so the
+cost is bounded by MAX_SCAN_CHARS.
+"""
+
+import re
+from typing import List, Dict, Tuple
+
+
+TECHNICAL_TERMS = ['TIMEOUT', 'CONNECTION', 'DATABASE', 'LOGIN', 'AUTH',
+                   'PERMISSION', 'DENIED', 'FAILED', 'ERROR', 'EXCEPTION',
+                   'CRASH', 'FREEZE', 'SLOW', 'LATENCY', 'UNAVAILABLE']
+
+# All-caps words that are not application names
+STOPWORDS = {'THE', 'AND', 'FOR', 'NOT', 'ARE', 'WITH', 'FROM', 'THIS', 'THAT', 'WAS', 'BUT',
+             'ALL', 'ANY', 'CAN', 'HAS', 'HAVE', 'NOW', 'OUT', 'USER', 'USERS', 'WHEN', 'AFTER',
+             'INFO', 'WARN', 'DEBUG', 'TRACE', 'URGENT', 'PLEASE', 'HELP', 'ISSUE'}
+
+# Score per occurrence of each kind of match
+KIND_WEIGHTS = {
+    'error_code': 5.0,
+    'error_num': 5.0,
+    'num_error': 5.0,
+    'status': 4.0,
+    'app': 3.0,
+    'term': 2.0,
+}
+
+# Occurrences in the short description count this many times
+SHORT_DESCRIPTION_WEIGHT = 2.0
+
+MAX_SCAN_CHARS = 16000
+HEAD_FRACTION = 0.75
+
+
+def _term_alternation(terms):
+    # Longest first so overlapping terms (e.g. AUTH / AUTHENTICATION) prefer the longer one
+    return '|'.join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True))
+
+
+def compile_pattern():
+    """Combined single-pass pattern; the matching group name is the token kind"""
+
+    # The leading \b is factored out so positions inside words fail after one check
+    return re.compile(
+        r"(?i)\b(?:"
+        r"(?P<error_num>error\s*[:\-]?\s*\d+\b)"
+        r"|(?P<num_error>\d{3}\s*error\b)"
+        r"|(?P<error_code>[a-z]{2,4}\d{2,4}\b|0x[0-9a-f]{4,16}\b)"
+        r"|(?P<status>(?-i:[A-Z]{2,})\s*\d{3,4}\b)"
+        r"|(?P<term>(?:" + _term_alternation(TECHNICAL_TERMS) + r")[a-z]*\b)"
+        r"|(?P<app>(?-i:[A-Z]{3,})\b)"
+        r")"
+    )
+
+
+_PATTERN = compile_pattern()
+_SPACES = re.compile(r'\s+')
+_TERMS_LONGEST_FIRST = sorted(set(TECHNICAL_TERMS), key=len, reverse=True)
+
+
+def bounded_text(text, max_chars=MAX_SCAN_CHARS):
+    """Head and tail of text when it is longer than max_chars"""
+
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * HEAD_FRACTION)
+    return text[:head] + '\n' + text[-(max_chars - head):]
+
+
+def _normalize(kind, token):
+    if kind == 'term':
+        token = token.upper()
+        for term in _TERMS_LONGEST_FIRST:
+            if token.startswith(term):
+                return term
+    return _SPACES.sub(' ', token.upper())
+
+
+def score_keywords(short_description, description, max_chars=MAX_SCAN_CHARS) -> Dict[str, Tuple[float, int]]:
+    """Keyword -> (score, first position) for one incident"""
+
+    scores = {}
+    offset = 0
+    for text, weight in ((short_description or '', SHORT_DESCRIPTION_WEIGHT),
+                         (bounded_text(description or '', max_chars), 1.0)):
+        for match in _PATTERN.finditer(text):
+            kind = match.lastgroup
+            token = match.group(kind)
+            if kind == 'app' and token in STOPWORDS:
+                continue
+            keyword = _normalize(kind, token)
+            score, first = scores.get(keyword, (0.0, offset + match.start()))
+            scores[keyword] = (score + KIND_WEIGHTS[kind] * weight, first)
+        offset += len(text) + 1
+    return scores
+
+
+def extract_keywords(short_description, description, k=5, max_chars=MAX_SCAN_CHARS) -> List[str]:
+    """Top-k technical keywords: highest score first, earliest occurrence breaks ties"""
+
+    scores = score_keywords(short_description, description, max_chars)
+    ranked = sorted(scores.items(), key=lambda item: (-item[1][0], item[1][1], item[0]))
+    return [keyword for keyword, _ in ranked[:k]]
@@ -0,0 +1,203 @@
+"""
+Content-addressed cache of LLM analyses
+
+The ServiceNow business rule fires again on reassignment, so the same incident
+is often re-enriched with an unchanged prompt. Completions are cached under a
+hash of the model, sampling parameters and rendered messages, so a repeat
+trigger skips the Groq round trip entirely.
+
+Two tiers: an in-memory LRU (survives warm invocations) and an optional SQLite
+file shared by every instance that can see it. Both honour the same TTL.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_cache (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache(last_used);
+"""
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_DISK_MAX_ENTRIES = 10000
+DEFAULT_TTL = 24 * 3600
+
+
+def cache_key(model, messages: List[Dict[str, str]], temperature, max_tokens=None) -> str:
+    """SHA-256 over everything that determines the completion"""
+
+    payload = json.dumps({
+        'model': model,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'messages': messages,
+    }, sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU with an optional SQLite tier behind it"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, path=None,
+                 disk_max_entries=DEFAULT_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                         'evictions': 0, 'expirations': 0, 'disk_errors': 0}
+
+    def _disk(self):
+        if self.path and self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def _expired(self, created_at, now):
+        return bool(self.ttl) and now - created_at > self.ttl
+
+    def get(self, key) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return entry[0]
+                del self._entries[key]
+                self.counters['expirations'] += 1
+
+            response = self._disk_get(key, now)
+            if response is not None:
+                self.counters['hits'] += 1
+                self.counters['disk_hits'] += 1
+                return response
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, response, model=None):
+        now = time.time()
+        with self._lock:
+            self._entries[key] = (response, now)
+            self._entries.move_to_end(key)
+            self.counters['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters['evictions'] += 1
+            self._disk_put(key, response, model, now)
+
+    def _disk_get(self, key, now):
+        try:
+            conn = self._disk()
+            if conn is None:
+                return None
+            row = conn.execute("SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response, created_at = row
+            if self._expired(created_at, now):
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                conn.commit()
+                self.counters['expirations'] += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"LLM cache read error: {e}")
+            self.counters['disk_errors'] += 1
+            return None
+
+        # Promote to the memory tier, keeping the original creation time for the TTL
+        self._entries[key] = (response, created_at)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+        return response
+
+    def _disk_put(self, key, response, model, now):
+        try:
+            conn = self._disk()
+            if conn is None:
+                return
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, model, response, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now))
+            if self.ttl:
+                expired = conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,)).rowcount
+                self.counters['expirations'] += expired
+            overflow = conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,)).rowcount
+            self.counters['evictions'] += overflow
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"LLM cache write error: {e}")
+            self.counters['disk_errors'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            conn = self._disk()
+            if conn is not None:
+                conn.execute("DELETE FROM llm_cache")
+                conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            stats = dict(self.counters)
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_s': self.ttl,
+                'disk': bool(self.path),
+                'hit_ratio': round(self.counters['hits'] / lookups, 3) if lookups else None,
+            })
+            return stats
+
+
+_cache = None
+_cache_config = None
+_cache_lock = threading.Lock()
+
+
+def configured_cache() -> Optional[LLMCache]:
+    """Shared cache configured from the environment, or None when disabled
+
+    CIIA_LLM_CACHE_SIZE (entries, default 256; 0 disables the cache),
+    CIIA_LLM_CACHE_TTL (seconds, default 86400; 0 = no expiry) and
+    CIIA_LLM_CACHE_PATH (SQLite file for the on-disk tier, optional).
+    """
+
+    global _cache, _cache_config
+    config = (
+        int(os.environ.get('CIIA_LLM_CACHE_SIZE', str(DEFAULT_MAX_ENTRIES))),
+        float(os.environ.get('CIIA_LLM_CACHE_TTL', str(DEFAULT_TTL))),
+        os.environ.get('CIIA_LLM_CACHE_PATH') or None,
+    )
+    if config[0] <= 0:
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache_config != config:
+            _cache = LLMCache(max_entries=config[0], ttl=config[1], path=config[2])
+            _cache_config = config
+        return _cache
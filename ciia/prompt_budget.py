@@ -0,0 +1,194 @@
+"""
+Token-budgeted prompt compaction
+
+The analysis prompt embeds the incident description (often a pasted stack
+trace or log dump), resolution snippets and a similar-incident summary. fit_prompt
+re-renders the prompt while compacting, in priority order, until the
+estimated input fits the budget:
+
+1. dedupe resolution snippets (identical text cited once, with every incident number)
+2. reduce the description to its signature lines (errors, exception headers,
+   the first frames of each trace) and collapse repeated lines
+3. drop the lowest-ranked similar incidents, then the lowest-ranked resolutions
+4. truncate the description
+
+and reports the tokens each section used.
+"""
+
+import os
+import re
+from typing import Callable, Dict, Any, List, Tuple
+
+
+# Rough tokens per character (English prose and logs average ~4 chars/token)
+CHARS_PER_TOKEN = 4
+
+DEFAULT_BUDGET = 2000
+
+# Never truncate the description below this
+MIN_DESCRIPTION_TOKENS = 120
+
+# Stack frames kept per trace when reducing to signature lines
+FRAMES_PER_TRACE = 2
+
+_SIGNATURE = re.compile(
+    r"(?i)\b(?:error|exception|fatal|fail(?:ed|ure)?|caused by|traceback|denied|refused|"
+    r"timed? ?out|panic|unavailable|critical|0x[0-9a-f]{4,}|[a-z]{2,4}\d{2,4})\b")
+_FRAME = re.compile(r'^\s*(?:at\s+\S|File\s+"|\.\.\.\s*\d+\s+more|#\d+\s)')
+_TIMESTAMP = re.compile(r'^\s*[\[(]?\d{2,4}[-/:.]\d{2}[-/:.]\d{2,4}[T\s]?[\d:.,]*\]?\)?\s*')
+_SPACES = re.compile(r'\s+')
+
+Renderer = Callable[[str, List[Dict[str, Any]], List[Dict[str, Any]]], Tuple[str, Dict[str, str]]]
+
+
+def estimate_tokens(text) -> int:
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN if text else 0
+
+
+def configured_budget() -> int:
+    """CIIA_PROMPT_TOKEN_BUDGET: estimated input tokens per analysis prompt (0 = unlimited)"""
+    return int(os.environ.get('CIIA_PROMPT_TOKEN_BUDGET', str(DEFAULT_BUDGET)))
+
+
+def _normalize(text):
+    return _SPACES.sub(' ', (text or '').strip().lower())
+
+
+def dedupe_resolutions(resolutions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep the first of each identical (root cause, resolution, workaround), citing all numbers"""
+
+    kept = {}
+    merged = []
+    for res in resolutions:
+        key = (_normalize(res.get('root_cause')), _normalize(res.get('resolution')), _normalize(res.get('workaround')))
+        if key in kept:
+            kept[key].setdefault('also_seen_in', []).append(res.get('incident_number'))
+            continue
+        entry = dict(res)
+        kept[key] = entry
+        merged.append(entry)
+
+    for entry in merged:
+        if entry.get('also_seen_in'):
+            entry['incident_number'] = f"{entry['incident_number']} (also {', '.join(entry['also_seen_in'])})"
+    return merged
+
+
+def signature_lines(text, frames_per_trace=FRAMES_PER_TRACE) -> str:
+    """Log/trace reduced to the lines that identify the failure
+
+    Keeps prose lines before the first log-looking line, error and exception
+    lines, and the first frames of each trace; repeated lines (ignoring
+    leading timestamps) are collapsed with a count.
+    """
+
+    lines = text.splitlines()
+    kept = []
+    seen = {}
+    frames = 0
+    in_log = False
+    omitted = 0
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            continue
+        is_frame = bool(_FRAME.match(line))
+        is_signature = bool(_SIGNATURE.search(line))
+        in_log = in_log or is_frame or is_signature or bool(_TIMESTAMP.match(line))
+
+        if is_frame:
+            frames += 1
+            keep = frames <= frames_per_trace
+        else:
+            frames = 0
+            keep = is_signature or not in_log
+
+        if not keep:
+            omitted += 1
+            continue
+
+        key = _TIMESTAMP.sub('', stripped)
+        if key in seen:
+            kept[seen[key]][1] += 1
+            continue
+        seen[key] = len(kept)
+        kept.append([stripped, 1])
+
+    out = [line if count == 1 else f"{line}  (x{count})" for line, count in kept]
+    if omitted:
+        out.append(f"[... {omitted} log lines omitted]")
+    return '\n'.join(out)
+
+
+def truncate_tokens(text, max_tokens) -> str:
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    marker = "\n[... truncated]"
+    return text[:max(0, max_chars - len(marker))].rstrip() + marker
+
+
+def fit_prompt(render: Renderer, description, resolutions, similar, budget) -> Tuple[str, Dict[str, Any]]:
+    """Render within `budget` estimated tokens; returns (prompt, report)
+
+    `render(description, resolutions, similar)` returns the prompt and its
+    variable sections by name; whatever is not in a section counts as
+    'instructions'. Lists are in rank order (best first).
+    """
+
+    actions = []
+    original = {'description': estimate_tokens(description), 'resolutions': len(resolutions),
+                'similar': len(similar)}
+
+    def measure():
+        prompt, sections = render(description, resolutions, similar)
+        return prompt, sections, estimate_tokens(prompt)
+
+    prompt, sections, total = measure()
+    over = lambda: budget and total > budget
+
+    deduped = dedupe_resolutions(resolutions)
+    if len(deduped) < len(resolutions):
+        resolutions = deduped
+        actions.append(f"deduped resolutions {original['resolutions']}->{len(resolutions)}")
+        prompt, sections, total = measure()
+
+    if over():
+        compacted = signature_lines(description)
+        if len(compacted) < len(description):
+            description = compacted
+            actions.append('description reduced to signature lines')
+            prompt, sections, total = measure()
+
+    while over() and similar:
+        similar = similar[:-1]
+        prompt, sections, total = measure()
+    if len(similar) < original['similar']:
+        actions.append(f"similar incidents {original['similar']}->{len(similar)}")
+
+    kept_resolutions = len(resolutions)
+    while over() and resolutions:
+        resolutions = resolutions[:-1]
+        prompt, sections, total = measure()
+    if len(resolutions) < kept_resolutions:
+        actions.append(f"resolutions {kept_resolutions}->{len(resolutions)}")
+
+    if over():
+        # Whatever is left over the budget comes out of the description
+        allowed = max(MIN_DESCRIPTION_TOKENS, estimate_tokens(description) - (total - budget))
+        truncated = truncate_tokens(description, allowed)
+        if truncated != description:
+            description = truncated
+            actions.append(f"description truncated to ~{allowed} tokens")
+            prompt, sections, total = measure()
+
+    section_tokens = {name: estimate_tokens(text) for name, text in sections.items()}
+    section_tokens['instructions'] = max(0, total - sum(section_tokens.values()))
+    return prompt, {
+        'budget': budget,
+        'estimated_tokens': total,
+        'within_budget': not over(),
+        'sections': section_tokens,
+        'description_tokens_before': original['description'],
+        'compactions': actions,
+    }
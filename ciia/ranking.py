@@ -0,0 +1,173 @@
+"""
+MinHash / LSH relevance ranking
+
+Each incident is reduced to a fixed-size MinHash signature of its word set, so
+Jaccard similarity against thousands of cached incidents becomes one vectorized
+comparison instead of a Python loop over set intersections. LSH banding over
+the same signatures generates candidates from the local corpus without scoring
+every record.
+
+Token hashing uses crc32 (stable across processes), so signatures can be
+precomputed at sync time and stored.
+"""
+
+import zlib
+from typing import List, Dict, Any, Iterable, Optional
+
+import numpy as np
+
+
+NUM_PERM = 128
+LSH_BANDS = 32
+
+# Mersenne prime 2^31 - 1: a * crc32 + b stays below 2^64
+_PRIME = np.uint64((1 << 31) - 1)
+_EMPTY = np.uint32((1 << 31) - 1)
+
+CATEGORY_BOOST = 0.2
+NOTES_BOOST = 0.1
+
+
+def tokenize(record) -> List[str]:
+    """Word set of the short description and description, as the ranker sees it"""
+    text = (record.get('short_description', '') or '') + ' ' + (record.get('description', '') or '')
+    return list(set(text.lower().split()))
+
+
+class MinHasher:
+    """Computes MinHash signatures with NUM_PERM universal hash permutations"""
+
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        rng = np.random.RandomState(seed)
+        self.num_perm = num_perm
+        self.a = rng.randint(1, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, (1 << 31) - 1, size=num_perm).astype(np.uint64)
+
+    def signature(self, tokens: Iterable[str]) -> np.ndarray:
+        return self.signatures([tokens])[0]
+
+    def signatures(self, token_lists: List[Iterable[str]], batch_tokens=200000) -> np.ndarray:
+        """(n, num_perm) uint32 signature matrix for a list of token sets"""
+
+        out = np.full((len(token_lists), self.num_perm), _EMPTY, dtype=np.uint32)
+        start = 0
+        while start < len(token_lists):
+            # Batch documents so the (num_perm, tokens) intermediate stays bounded
+            hashes = []
+            lengths = []
+            end = start
+            while end < len(token_lists) and (not hashes or len(hashes) < batch_tokens):
+                doc = [zlib.crc32(t.encode('utf-8')) for t in token_lists[end]]
+                hashes.extend(doc)
+                lengths.append(len(doc))
+                end += 1
+
+            lengths = np.asarray(lengths)
+            nonempty = lengths > 0
+            if nonempty.any():
+                hv = np.asarray(hashes, dtype=np.uint64)
+                permuted = ((self.a[:, None] * hv[None, :] + self.b[:, None]) % _PRIME).astype(np.uint32)
+                offsets = np.concatenate(([0], np.cumsum(lengths[nonempty])[:-1]))
+                mins = np.minimum.reduceat(permuted, offsets, axis=1).T
+                out[start:end][nonempty] = mins
+            start = end
+        return out
+
+
+def estimated_jaccard(query: np.ndarray, signatures: np.ndarray) -> np.ndarray:
+    """Jaccard estimate of one signature against every row of a signature matrix"""
+    if signatures.shape[0] == 0:
+        return np.zeros(0, dtype=np.float32)
+    scores = (signatures == query[None, :]).mean(axis=1, dtype=np.float32)
+    # Two empty documents share every "minimum"; the exact Jaccard is 0
+    if (query == _EMPTY).all():
+        scores[:] = 0.0
+    else:
+        scores[(signatures == _EMPTY).all(axis=1)] = 0.0
+    return scores
+
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures, stored as sorted arrays per band"""
+
+    def __init__(self, num_perm=NUM_PERM, bands=LSH_BANDS, seed=7):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.RandomState(seed)
+        self._mix = rng.randint(1, (1 << 62), size=self.rows, dtype=np.int64).astype(np.uint64) | np.uint64(1)
+        self._keys = []
+        self._ids = []
+
+    def _band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(n, bands) uint64 bucket key per band (wrapping multiply-add hash)"""
+        banded = signatures.astype(np.uint64).reshape(signatures.shape[0], self.bands, self.rows)
+        with np.errstate(over='ignore'):
+            return (banded * self._mix[None, None, :]).sum(axis=2, dtype=np.uint64)
+
+    def build(self, signatures: np.ndarray):
+        keys = self._band_keys(signatures)
+        self._keys = []
+        self._ids = []
+        for band in range(self.bands):
+            order = np.argsort(keys[:, band], kind='stable')
+            self._keys.append(keys[order, band])
+            self._ids.append(order.astype(np.int64))
+        return self
+
+    def candidates(self, signature: np.ndarray, max_candidates: Optional[int] = None) -> np.ndarray:
+        """Row indices sharing at least one band bucket, most shared bands first"""
+
+        if not self._keys:
+            return np.zeros(0, dtype=np.int64)
+        keys = self._band_keys(signature[None, :])[0]
+        hits = []
+        for band in range(self.bands):
+            lo = np.searchsorted(self._keys[band], keys[band], side='left')
+            hi = np.searchsorted(self._keys[band], keys[band], side='right')
+            if hi > lo:
+                hits.append(self._ids[band][lo:hi])
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        ids, counts = np.unique(np.concatenate(hits), return_counts=True)
+        ids = ids[np.argsort(-counts, kind='stable')]
+        return ids[:max_candidates] if max_candidates else ids
+
+
+_default_hasher = None
+
+
+def default_hasher() -> MinHasher:
+    global _default_hasher
+    if _default_hasher is None:
+        _default_hasher = MinHasher()
+    return _default_hasher
+
+
+def rank_records(current_incident, records: List[Dict[str, Any]],
+                 signatures: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+    """Rank records by estimated Jaccard similarity plus category/notes boosts
+
+    `signatures` may hold precomputed rows for `records` (e.g. from the local
+    store); otherwise they are computed here in one batch.
+    """
+
+    if not records:
+        return []
+
+    hasher = default_hasher()
+    query = hasher.signature(tokenize(current_incident))
+    if signatures is None:
+        signatures = hasher.signatures([tokenize(r) for r in records])
+
+    scores = estimated_jaccard(query, signatures)
+
+    category = current_incident.get('category')
+    scores = scores + CATEGORY_BOOST * np.fromiter(
+        (r.get('category') == category for r in records), dtype=np.float32, count=len(records))
+    scores = scores + NOTES_BOOST * np.fromiter(
+        (bool(r.get('close_notes') or r.get('work_notes')) for r in records), dtype=np.float32, count=len(records))
+
+    order = np.argsort(-scores, kind='stable')
+    return [records[i] for i in order]
@@ -0,0 +1,331 @@
+"""
+Resolution knowledge base: extract once per historical incident, look up after
+
+Resolution, workaround and root cause are extracted from an incident's
+close_notes and work_notes when it is synced into the local store (or the
+first time it shows up as a similar incident) and stored per sys_id with the
+incident's sys_updated_on and the extraction_version() of the rules used.
+At request time extraction is a keyed lookup; only incidents that are new,
+updated since, or extracted under other rules are parsed again.
+
+Two tiers like the LLM cache: an in-memory LRU (warm invocations) and an
+optional SQLite table, by default in the incident store file so the sync
+job fills it in the same transaction as the records. The table keeps the
+notes zlib-compressed, so when the extraction rules change (a new
+EXTRACTION_RULES_VERSION or CIIA_RESOLUTION_MARKERS) a background thread
+re-extracts every row without going back to ServiceNow.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, List, Optional
+
+from ciia.resolutions import extract_resolution, extraction_version
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS resolution_kb (
+    sys_id TEXT PRIMARY KEY,
+    updated_on TEXT,
+    version TEXT NOT NULL,
+    number TEXT,
+    short_description TEXT,
+    resolution TEXT,
+    workaround TEXT,
+    root_cause TEXT,
+    notes BLOB
+);
+CREATE INDEX IF NOT EXISTS resolution_kb_version ON resolution_kb (version);
+"""
+
+UPSERT = ("INSERT OR REPLACE INTO resolution_kb (sys_id, updated_on, version, number, short_description, "
+          "resolution, workaround, root_cause, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+
+DEFAULT_MAX_ENTRIES = 5000
+
+# Rows re-extracted per transaction by the background job
+REEXTRACT_BATCH = 500
+
+
+def pack_notes(record) -> bytes:
+    """The notes extraction reads, compressed, so a rules change can re-extract offline"""
+    notes = {'close_notes': record.get('close_notes') or '', 'work_notes': record.get('work_notes') or ''}
+    return zlib.compress(json.dumps(notes, separators=(',', ':')).encode('utf-8'))
+
+
+def unpack_notes(blob) -> Dict[str, str]:
+    return json.loads(zlib.decompress(blob)) if blob else {}
+
+
+def extract_rows(records: Iterable[Dict[str, Any]], version=None):
+    """(sys_id -> extracted, resolution_kb rows to upsert); touches no database"""
+
+    version = version or extraction_version()
+    extracted = {}
+    rows = []
+    for record in records:
+        sys_id = record.get('sys_id')
+        if not sys_id:
+            continue
+        data = extract_resolution(record)
+        extracted[sys_id] = data
+        rows.append((sys_id, record.get('sys_updated_on', ''), version, data['incident_number'],
+                     data['short_description'], data['resolution'], data['workaround'], data['root_cause'],
+                     pack_notes(record)))
+    return extracted, rows
+
+
+def store_extracted(conn, records: Iterable[Dict[str, Any]], version=None) -> Dict[str, Dict[str, Any]]:
+    """Extract and upsert records on `conn` (caller commits); sys_id -> extracted"""
+
+    extracted, rows = extract_rows(records, version)
+    conn.executemany(UPSERT, rows)
+    return extracted
+
+
+def _row_data(number, short_description, resolution, workaround, root_cause) -> Dict[str, Any]:
+    return {'incident_number': number, 'short_description': short_description,
+            'resolution': resolution, 'workaround': workaround, 'root_cause': root_cause}
+
+
+class ResolutionKB:
+    """sys_id -> extracted resolution, validated by sys_updated_on and extraction version"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writable = True
+        self._reextracting = None
+        self.counters = {'lookups': 0, 'hits': 0, 'disk_hits': 0, 'extractions': 0, 'stale': 0,
+                         'reextracted': 0, 'disk_errors': 0}
+
+    def _disk(self):
+        if self.path and self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            try:
+                self._conn.executescript(SCHEMA)
+            except sqlite3.OperationalError as e:
+                # Read-only deployment of a prebuilt file: lookups only
+                print(f"Resolution KB is read-only: {e}")
+                self._writable = False
+        return self._conn
+
+    def resolutions(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Extracted resolution per record, in order: looked up, extracting only what is missing or stale"""
+
+        version = extraction_version()
+        found = {}
+        with self._lock:
+            self.counters['lookups'] += len(records)
+            missing = []
+            for record in records:
+                entry = self._entries.get(record.get('sys_id'))
+                if entry is not None and self._current(entry, record, version):
+                    self._entries.move_to_end(record['sys_id'])
+                    found[record['sys_id']] = entry[2]
+                else:
+                    missing.append(record)
+            if missing:
+                from_disk = self._disk_get(missing, version)
+                self.counters['disk_hits'] += len(from_disk)
+                found.update(from_disk)
+            self.counters['hits'] += len(found)
+
+        todo = [record for record in records if record.get('sys_id') not in found]
+        if todo:
+            found.update(self._extract(todo, version))
+
+        return [found[r['sys_id']] if r.get('sys_id') in found else extract_resolution(r) for r in records]
+
+    def _current(self, entry, record, version):
+        updated_on, entry_version, _ = entry
+        if entry_version != version:
+            self.counters['stale'] += 1
+            return False
+        return updated_on == record.get('sys_updated_on', '')
+
+    def _remember(self, sys_id, entry):
+        self._entries[sys_id] = entry
+        self._entries.move_to_end(sys_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _disk_get(self, records, version) -> Dict[str, Dict[str, Any]]:
+        try:
+            conn = self._disk()
+            if conn is None:
+                return {}
+            wanted = {r['sys_id']: r for r in records if r.get('sys_id')}
+            if not wanted:
+                return {}
+            rows = conn.execute(
+                "SELECT sys_id, updated_on, version, number, short_description, resolution, workaround, root_cause "
+                f"FROM resolution_kb WHERE sys_id IN ({','.join('?' * len(wanted))})", list(wanted)).fetchall()
+        except sqlite3.Error as e:
+            print(f"Resolution KB read error: {e}")
+            self.counters['disk_errors'] += 1
+            return {}
+
+        found = {}
+        for sys_id, updated_on, row_version, *fields in rows:
+            entry = (updated_on, row_version, _row_data(*fields))
+            if self._current(entry, wanted[sys_id], version):
+                self._remember(sys_id, entry)
+                found[sys_id] = entry[2]
+        return found
+
+    def _extract(self, records, version) -> Dict[str, Dict[str, Any]]:
+        """Extract and remember records that were not found (write-through to SQLite)
+
+        Extraction runs without the lock; it is held only for the upsert.
+        """
+
+        extracted, rows = extract_rows(records, version)
+        by_id = {r.get('sys_id'): r for r in records}
+
+        with self._lock:
+            try:
+                conn = self._disk()
+                if conn is not None and self._writable:
+                    conn.executemany(UPSERT, rows)
+                    conn.commit()
+            except sqlite3.Error as e:
+                print(f"Resolution KB write error: {e}")
+                self.counters['disk_errors'] += 1
+                if isinstance(e, sqlite3.OperationalError) and 'readonly' in str(e):
+                    self._writable = False
+
+            for sys_id, data in extracted.items():
+                self._remember(sys_id, (by_id[sys_id].get('sys_updated_on', ''), version, data))
+            self.counters['extractions'] += len(extracted)
+        return extracted
+
+    def put(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Extract and store records now (ingest time); returns how many were stored"""
+
+        return len(self._extract(list(records), extraction_version()))
+
+    # -- re-extraction after a rules change ----------------------------------
+
+    def stale_rows(self, version=None) -> int:
+        """SQLite rows extracted under other rules"""
+
+        with self._lock:
+            conn = self._disk()
+            if conn is None:
+                return 0
+            return conn.execute("SELECT COUNT(*) FROM resolution_kb WHERE version != ?",
+                                (version or extraction_version(),)).fetchone()[0]
+
+    def reextract(self, batch=REEXTRACT_BATCH) -> int:
+        """Re-extract every stale row from its stored notes; returns rows updated
+
+        Runs on its own connection in short transactions, so lookups and the
+        sync job keep going meanwhile.
+        """
+
+        if not self.path or not self._writable:
+            return 0
+        version = extraction_version()
+        conn = sqlite3.connect(self.path, timeout=30)
+        updated = 0
+        try:
+            while True:
+                rows = conn.execute(
+                    "SELECT sys_id, updated_on, number, short_description, notes FROM resolution_kb "
+                    "WHERE version != ? LIMIT ?", (version, batch)).fetchall()
+                if not rows:
+                    break
+                records = []
+                for sys_id, updated_on, number, short_description, notes in rows:
+                    record = dict(unpack_notes(notes), sys_id=sys_id, sys_updated_on=updated_on,
+                                  number=number, short_description=short_description)
+                    records.append(record)
+                store_extracted(conn, records, version)
+                conn.commit()
+                updated += len(records)
+                with self._lock:
+                    self.counters['reextracted'] += len(records)
+        finally:
+            conn.close()
+        return updated
+
+    def start_reextraction(self) -> bool:
+        """Re-extract stale rows on a background thread (at most one); True if one was started"""
+
+        with self._lock:
+            if self._reextracting is not None and self._reextracting.is_alive():
+                return False
+        try:
+            if not self.stale_rows():
+                return False
+        except sqlite3.Error as e:
+            print(f"Resolution KB read error: {e}")
+            return False
+
+        def run():
+            started = time.monotonic()
+            try:
+                count = self.reextract()
+                print(f"Resolution KB: re-extracted {count} incidents in {time.monotonic() - started:.1f}s")
+            except Exception as e:
+                print(f"Resolution KB re-extraction failed: {e}")
+
+        thread = threading.Thread(target=run, name='resolution-kb-reextract', daemon=True)
+        with self._lock:
+            self._reextracting = thread
+        thread.start()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk': bool(self.path),
+                'version': extraction_version(),
+                'reextracting': bool(self._reextracting and self._reextracting.is_alive()),
+                'hit_ratio': round(self.counters['hits'] / self.counters['lookups'], 3)
+                if self.counters['lookups'] else None,
+            })
+            return stats
+
+
+_kb = None
+_kb_config = None
+_kb_lock = threading.Lock()
+
+
+def configured_kb() -> Optional[ResolutionKB]:
+    """Shared knowledge base configured from the environment, or None when disabled
+
+    CIIA_RESOLUTION_KB_SIZE (incidents kept in memory, default 5000; 0
+    disables the knowledge base) and CIIA_RESOLUTION_KB (SQLite file,
+    default the CIIA_INCIDENT_STORE file if one is configured). Opening a
+    file with rows from older extraction rules starts their re-extraction.
+    """
+
+    global _kb, _kb_config
+    config = (
+        int(os.environ.get('CIIA_RESOLUTION_KB_SIZE', str(DEFAULT_MAX_ENTRIES))),
+        os.environ.get('CIIA_RESOLUTION_KB') or os.environ.get('CIIA_INCIDENT_STORE') or None,
+    )
+    if config[0] <= 0:
+        return None
+
+    with _kb_lock:
+        if _kb is None or _kb_config != config:
+            _kb = ResolutionKB(max_entries=config[0], path=config[1])
+            _kb_config = config
+            if _kb.path:
+                _kb.start_reextraction()
+        return _kb
@@ -0,0 +1,213 @@
+"""
+Resolution, workaround and root cause extraction from incident notes
+
+Shared by the enrichment function (at request time) and the incident sync job
+(at ingest time, so the local store keeps the extracted text next to the record).
+
+All markers of all three kinds are found in one scan per note by MarkerScanner:
+a single compiled multi-pattern matcher run over case-folded windows of the
+note, so multi-MB work-note journals are never lowercased as a whole.
+
+extraction_version() tags extracted text with the rules that produced it
+(EXTRACTION_RULES_VERSION plus the effective markers), so the resolution
+knowledge base (ciia/resolution_kb.py) knows what to re-extract.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import namedtuple
+from typing import Dict, Any, List, Iterator, Optional
+
+
+RESOLUTION_KEYWORDS = ['resolution:', 'resolved by', 'fix:', 'fixed by', 'solution:']
+WORKAROUND_KEYWORDS = ['workaround:', 'temporary fix', 'interim solution']
+ROOT_CAUSE_KEYWORDS = ['root cause:', 'caused by', 'issue was']
+
+DEFAULT_MARKERS = {
+    'resolution': RESOLUTION_KEYWORDS,
+    'workaround': WORKAROUND_KEYWORDS,
+    'root_cause': ROOT_CAUSE_KEYWORDS,
+}
+
+SNIPPET_LENGTH = 200
+
+# Bump when extract_resolution's logic changes; marker changes are picked up automatically
+EXTRACTION_RULES_VERSION = 1
+
+# Case-folded window scanned at a time
+SCAN_WINDOW = 1 << 20
+
+
+Marker = namedtuple('Marker', 'start end category keyword priority')
+
+
+def _trie_pattern(keywords) -> str:
+    """Regex for a keyword trie: shared prefixes are matched once per position
+
+    The longest keyword at a position matches; MarkerScanner expands it to the
+    keywords that are its prefixes.
+    """
+
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def branch(node):
+        alternatives = [re.escape(char) + branch(child) for char, child in sorted(node.items()) if char]
+        if not alternatives:
+            return ''
+        body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return branch(trie)
+
+
+class MarkerScanner:
+    """Finds every configured marker, of every category, in a single pass
+
+    `markers` maps a category to its keywords in priority order (earlier
+    keywords win over later ones, as in the original per-keyword loops).
+    Matching is case-insensitive; spans refer to the original text.
+    """
+
+    def __init__(self, markers: Dict[str, List[str]], window=SCAN_WINDOW):
+        self.markers = {category: list(keywords) for category, keywords in markers.items()}
+        self.categories = list(markers)
+        self._lookup = {}
+        for category, keywords in markers.items():
+            for priority, keyword in enumerate(keywords):
+                if not keyword:
+                    continue
+                self._lookup.setdefault(keyword.lower(), []).append((category, priority))
+
+        if not self._lookup:
+            raise ValueError("MarkerScanner needs at least one keyword")
+
+        # A match also covers every shorter keyword that is its prefix
+        self._prefixes = {k: [p for p in sorted(self._lookup, key=len) if k.startswith(p)] for k in self._lookup}
+
+        alternation = _trie_pattern(self._lookup)
+        self._pattern = re.compile(alternation)
+        self._pattern_ci = re.compile(alternation, re.IGNORECASE)
+        self._overlap = max(len(k) for k in self._lookup) - 1
+        self.window = max(window, self._overlap + 1)
+
+    def finditer(self, text) -> Iterator[Marker]:
+        """All markers in text, in order of position (overlapping and nested ones included)"""
+
+        length = len(text)
+        start = 0
+        while start < length:
+            end = min(start + self.window, length)
+            # Matches must start in [start, end); the overlap lets them finish past it
+            chunk = text[start:min(end + self._overlap, length)]
+            folded = chunk.lower()
+            if len(folded) == len(chunk):
+                search, haystack = self._pattern.search, folded
+            else:
+                # Case folding changed lengths (rare Unicode); keep spans exact
+                search, haystack = self._pattern_ci.search, chunk
+
+            pos = 0
+            limit = end - start
+            while pos < limit:
+                match = search(haystack, pos)
+                if match is None or match.start() >= limit:
+                    break
+                for keyword in self._prefixes.get(match.group(0).lower(), ()):
+                    for category, priority in self._lookup[keyword]:
+                        yield Marker(start + match.start(), start + match.start() + len(keyword),
+                                     category, keyword, priority)
+                pos = match.start() + 1
+            start = end
+
+    def best_markers(self, text) -> Dict[str, Marker]:
+        """Per category, the highest-priority keyword at its first occurrence"""
+
+        best = {}
+        for marker in self.finditer(text):
+            current = best.get(marker.category)
+            if current is None or marker.priority < current.priority:
+                best[marker.category] = marker
+        return best
+
+
+_default_scanner = None
+
+
+def configure_markers(markers: Optional[Dict[str, List[str]]] = None) -> MarkerScanner:
+    """Replace the default marker lists (e.g. {'workaround': [...]}) and recompile
+
+    Categories left out keep their defaults. With no argument the lists come
+    from CIIA_RESOLUTION_MARKERS (a JSON object of the same shape), if set.
+    """
+
+    global _default_scanner
+    if markers is None:
+        configured = os.environ.get('CIIA_RESOLUTION_MARKERS')
+        markers = json.loads(configured) if configured else {}
+
+    merged = dict(DEFAULT_MARKERS)
+    merged.update(markers)
+    _default_scanner = MarkerScanner(merged)
+    return _default_scanner
+
+
+def default_scanner() -> MarkerScanner:
+    if _default_scanner is None:
+        return configure_markers()
+    return _default_scanner
+
+
+def extraction_version(scanner=None) -> str:
+    """Tag for text extracted with `scanner` (default: the configured markers)"""
+
+    scanner = scanner or default_scanner()
+    rules = json.dumps({'markers': scanner.markers, 'snippet': SNIPPET_LENGTH}, sort_keys=True)
+    return f"{EXTRACTION_RULES_VERSION}:{hashlib.sha256(rules.encode('utf-8')).hexdigest()[:12]}"
+
+
+def extract_resolution(inc, scanner=None) -> Dict[str, Any]:
+    """Extract resolution, workaround and root cause from one incident's notes"""
+
+    scanner = scanner or default_scanner()
+    resolution_data = {
+        'incident_number': inc.get('number', 'Unknown'),
+        'short_description': inc.get('short_description', '')[:100],
+        'resolution': None,
+        'workaround': None,
+        'root_cause': None
+    }
+
+    # Combine all resolution sources
+    all_notes = []
+    if inc.get('close_notes'):
+        all_notes.append(('close_notes', inc['close_notes']))
+    if inc.get('work_notes'):
+        all_notes.append(('work_notes', inc['work_notes']))
+
+    for source, notes in all_notes:
+        if not notes:
+            continue
+
+        # Later sources override earlier ones, as before
+        for category, marker in scanner.best_markers(notes).items():
+            text = notes[marker.start:marker.start + SNIPPET_LENGTH].strip()
+            if text:
+                resolution_data[category] = text
+
+    # If no structured resolution found, extract last work note
+    if not resolution_data['resolution'] and inc.get('work_notes'):
+        resolution_data['resolution'] = inc['work_notes'][-300:].strip()
+
+    return resolution_data
+
+
+def has_resolution(resolution_data) -> bool:
+    """True if the extraction found something worth citing"""
+    return bool(resolution_data['resolution'] or resolution_data['workaround'])
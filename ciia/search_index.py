@@ -0,0 +1,265 @@
+"""
+Local full-text index of resolved/closed incidents (SQLite FTS5)
+
+Replaces the `short_descriptionLIKE...` keyword search, which ServiceNow runs
+as a table scan, with a BM25-ranked lookup on a local file built from a bulk
+export. Callers are expected to fall back to the live query when the index is
+missing or older than the allowed age (see `usable`).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Optional
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident_docs (
+    rowid INTEGER PRIMARY KEY,
+    sys_id TEXT NOT NULL UNIQUE,
+    number TEXT,
+    state TEXT,
+    short_description TEXT,
+    description TEXT,
+    close_notes TEXT,
+    record TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS incident_fts USING fts5(
+    short_description, description, close_notes,
+    content='incident_docs', content_rowid='rowid', tokenize='unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS incident_docs_ai AFTER INSERT ON incident_docs BEGIN
+    INSERT INTO incident_fts(rowid, short_description, description, close_notes)
+    VALUES (new.rowid, new.short_description, new.description, new.close_notes);
+END;
+CREATE TRIGGER IF NOT EXISTS incident_docs_ad AFTER DELETE ON incident_docs BEGIN
+    INSERT INTO incident_fts(incident_fts, rowid, short_description, description, close_notes)
+    VALUES ('delete', old.rowid, old.short_description, old.description, old.close_notes);
+END;
+CREATE TRIGGER IF NOT EXISTS incident_docs_au AFTER UPDATE ON incident_docs BEGIN
+    INSERT INTO incident_fts(incident_fts, rowid, short_description, description, close_notes)
+    VALUES ('delete', old.rowid, old.short_description, old.description, old.close_notes);
+    INSERT INTO incident_fts(rowid, short_description, description, close_notes)
+    VALUES (new.rowid, new.short_description, new.description, new.close_notes);
+END;
+CREATE TABLE IF NOT EXISTS index_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# BM25 column weights: short_description, description, close_notes
+BM25_WEIGHTS = (10.0, 2.0, 1.0)
+
+RESOLVED_STATES = ('6', '7')
+
+
+class IncidentSearchIndex:
+    """BM25-ranked keyword search over a local SQLite FTS5 file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    # -- connections ---------------------------------------------------------
+
+    def _connect(self, readonly=False):
+        if readonly:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.executescript(SCHEMA)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _reader(self):
+        """Per-thread read-only connection (searches run on the fan-out pool)
+
+        Reopened when the file changed since it was opened, so a rebuild
+        swapped in by another instance or process is picked up too.
+        """
+        stat = os.stat(self.path)
+        version = (stat.st_ino, stat.st_mtime_ns)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.version != version:
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._connect(readonly=True)
+            self._local.conn = conn
+            self._local.version = version
+        return conn
+
+    # -- building ------------------------------------------------------------
+
+    def build(self, records: Iterable[Dict[str, Any]], source='export') -> int:
+        """Rebuild the index from scratch and swap it in atomically"""
+
+        tmp_path = f"{self.path}.building"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        builder = IncidentSearchIndex(tmp_path)
+        conn = builder._connect()
+        try:
+            count = builder._upsert(conn, records)
+            conn.execute("INSERT INTO incident_fts(incident_fts) VALUES ('optimize')")
+            builder._set_meta(conn, built_at=time.time(), updated_at=time.time(), source=source)
+            conn.commit()
+        finally:
+            conn.close()
+
+        os.replace(tmp_path, self.path)
+        return count
+
+    def upsert(self, records: Iterable[Dict[str, Any]], conn=None) -> int:
+        """Insert or replace records in place (used by incremental syncs)"""
+
+        own = conn is None
+        conn = conn or self._connect()
+        try:
+            count = self._upsert(conn, records)
+            self._set_meta(conn, updated_at=time.time())
+            conn.commit()
+        finally:
+            if own:
+                conn.close()
+        return count
+
+    def _upsert(self, conn, records):
+        count = 0
+        for record in records:
+            sys_id = record.get('sys_id')
+            if not sys_id:
+                continue
+            if str(record.get('state', '')) not in RESOLVED_STATES:
+                # Re-opened incidents leave the index
+                conn.execute("DELETE FROM incident_docs WHERE sys_id = ?", (sys_id,))
+                continue
+            conn.execute(
+                """INSERT INTO incident_docs (sys_id, number, state, short_description, description, close_notes, record)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(sys_id) DO UPDATE SET
+                       number = excluded.number, state = excluded.state,
+                       short_description = excluded.short_description,
+                       description = excluded.description,
+                       close_notes = excluded.close_notes, record = excluded.record""",
+                (
+                    sys_id,
+                    record.get('number', ''),
+                    str(record.get('state', '')),
+                    record.get('short_description', '') or '',
+                    record.get('description', '') or '',
+                    record.get('close_notes', '') or '',
+                    json.dumps(record)
+                )
+            )
+            count += 1
+        return count
+
+    def _set_meta(self, conn, **values):
+        for key, value in values.items():
+            conn.execute(
+                "INSERT INTO index_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, str(value))
+            )
+
+    # -- querying ------------------------------------------------------------
+
+    def meta(self) -> Dict[str, str]:
+        """Index metadata (built_at, updated_at, source)"""
+        rows = self._reader().execute("SELECT key, value FROM index_meta").fetchall()
+        return {row['key']: row['value'] for row in rows}
+
+    def usable(self, max_age_hours: Optional[float] = None) -> bool:
+        """True if the index file exists and was refreshed recently enough"""
+
+        if not os.path.exists(self.path):
+            return False
+        try:
+            updated_at = float(self.meta().get('updated_at', 0))
+        except (sqlite3.Error, ValueError):
+            return False
+        if max_age_hours is None:
+            return updated_at > 0
+        return time.time() - updated_at <= max_age_hours * 3600
+
+    def search(self, keywords: List[str], limit=15, exclude_sys_id=None) -> List[Dict[str, Any]]:
+        """Top records matching any keyword, best BM25 score first"""
+
+        match = match_expression(keywords)
+        if not match:
+            return []
+
+        rows = self._reader().execute(
+            f"""SELECT d.sys_id, d.record
+                FROM incident_fts
+                JOIN incident_docs d ON d.rowid = incident_fts.rowid
+                WHERE incident_fts MATCH ?
+                ORDER BY bm25(incident_fts, {', '.join(str(w) for w in BM25_WEIGHTS)})
+                LIMIT ?""",
+            (match, limit + 1)
+        ).fetchall()
+
+        results = [json.loads(row['record']) for row in rows if row['sys_id'] != exclude_sys_id]
+        return results[:limit]
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM incident_docs").fetchone()[0]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def match_expression(keywords: List[str]) -> str:
+    """FTS5 MATCH expression: any of the keywords, each as a quoted phrase"""
+
+    phrases = []
+    for keyword in keywords:
+        keyword = ' '.join(str(keyword).split())
+        if keyword:
+            phrases.append('"' + keyword.replace('"', '""') + '"')
+    return ' OR '.join(phrases)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(path) -> IncidentSearchIndex:
+    """Shared index instance per file, kept across warm invocations"""
+
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = IncidentSearchIndex(path)
+            _indexes[path] = index
+        return index
+
+
+def index_settings():
+    """(path, max age in hours) from CIIA_SEARCH_INDEX and CIIA_SEARCH_INDEX_MAX_AGE
+
+    The max age (default 24) bounds staleness; 0 disables the age check.
+    """
+
+    return os.environ.get('CIIA_SEARCH_INDEX'), float(os.environ.get('CIIA_SEARCH_INDEX_MAX_AGE', '24'))
+
+
+def configured_index(settings=None) -> Optional[IncidentSearchIndex]:
+    """The index of `settings` (default: index_settings()) if it exists and is fresh, else None"""
+
+    path, max_age = settings or index_settings()
+    if not path:
+        return None
+
+    index = get_index(path)
+    if not index.usable(max_age if max_age > 0 else None):
+        return None
+    return index
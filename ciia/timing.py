@@ -0,0 +1,157 @@
+"""
+Per-stage latency instrumentation
+
+A StageTimer is attached to each enrichment run. It records a monotonic
+duration for every pipeline stage (fetch, search, extract, analyze, format,
+update) and for every ServiceNow round trip, and renders them as:
+
+- a `timings` block in the response JSON,
+- a `Server-Timing` header (one metric per stage plus the ServiceNow total),
+- structured log lines, one JSON object per stage and per query with a
+  stable "event" name, for an aggregator to turn into p50/p95/p99 histograms
+  (CIIA_TIMING_LOG=0 silences them).
+
+StageStats keeps a rolling window of recent runs in-process so the health
+check can report percentiles per stage without an aggregator.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+
+STAGES = ('fetch', 'search', 'extract', 'analyze', 'format', 'update')
+
+LOG_EVENT_STAGE = 'ciia.stage'
+LOG_EVENT_QUERY = 'ciia.snow_query'
+LOG_EVENT_RUN = 'ciia.enrichment'
+
+DEFAULT_WINDOW = 500
+
+_log_lock = threading.Lock()
+
+
+class StageTimer:
+    """Monotonic stage and ServiceNow query durations for one enrichment run"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages = OrderedDict()
+        self.queries = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_stage(name, (time.monotonic() - started) * 1000)
+
+    def add_stage(self, name, elapsed_ms):
+        with self._lock:
+            # A stage entered twice (e.g. retried) accumulates
+            self.stages[name] = round(self.stages.get(name, 0.0) + elapsed_ms, 1)
+
+    def add_query(self, kind, elapsed_ms, status=None, **attrs):
+        entry = {'kind': kind, 'ms': round(elapsed_ms, 1), 'status': status}
+        entry.update(attrs)
+        with self._lock:
+            self.queries.append(entry)
+
+    def total_ms(self):
+        return round((time.monotonic() - self.started) * 1000, 1)
+
+    def snow_ms(self):
+        with self._lock:
+            return round(sum(q['ms'] for q in self.queries), 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'total_ms': self.total_ms(),
+                'stages': dict(self.stages),
+                'snow_queries': list(self.queries),
+                'snow_ms': round(sum(q['ms'] for q in self.queries), 1),
+            }
+
+
+def server_timing(timings: Optional[Dict[str, Any]]) -> str:
+    """Server-Timing header value for a timings dict (see StageTimer.as_dict)"""
+
+    if not timings:
+        return ''
+    metrics = [f"{name};dur={ms}" for name, ms in timings.get('stages', {}).items()]
+    queries = timings.get('snow_queries', [])
+    if queries:
+        metrics.append(f'snow;dur={timings.get("snow_ms", 0)};desc="{len(queries)} ServiceNow requests"')
+    metrics.append(f"total;dur={timings.get('total_ms', 0)}")
+    return ', '.join(metrics)
+
+
+def _logging_enabled():
+    return os.environ.get('CIIA_TIMING_LOG', '1') not in ('0', 'false', 'no')
+
+
+def log_timings(timings: Dict[str, Any], **context):
+    """One JSON log line per stage and per ServiceNow query, plus a run summary"""
+
+    if not _logging_enabled() or not timings:
+        return
+    lines = []
+    for name, ms in timings.get('stages', {}).items():
+        lines.append(dict(context, event=LOG_EVENT_STAGE, stage=name, ms=ms))
+    for query in timings.get('snow_queries', []):
+        lines.append(dict(context, event=LOG_EVENT_QUERY, **query))
+    lines.append(dict(context, event=LOG_EVENT_RUN, ms=timings.get('total_ms'), snow_ms=timings.get('snow_ms')))
+    text = '\n'.join(json.dumps(line, separators=(',', ':')) for line in lines)
+    # Concurrent runs (batches, worker threads) must not interleave lines
+    with _log_lock:
+        print(text, flush=True)
+
+
+def percentile(values: List[float], pct) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+class StageStats:
+    """Rolling per-stage samples of the last `window` runs in this process"""
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self._samples = {}
+        self._window = window
+        self._lock = threading.Lock()
+        self.runs = 0
+
+    def observe(self, timings: Dict[str, Any]):
+        with self._lock:
+            self.runs += 1
+            samples = dict(timings.get('stages', {}))
+            samples['total'] = timings.get('total_ms')
+            samples['snow'] = timings.get('snow_ms')
+            for name, ms in samples.items():
+                if ms is not None:
+                    self._samples.setdefault(name, deque(maxlen=self._window)).append(ms)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            summary = {'runs': self.runs}
+            for name, values in self._samples.items():
+                values = list(values)
+                summary[name] = {
+                    'n': len(values),
+                    'p50_ms': percentile(values, 50),
+                    'p95_ms': percentile(values, 95),
+                    'p99_ms': percentile(values, 99),
+                }
+            return summary
+
+
+stage_stats = StageStats()
@@ -0,0 +1,52 @@
+"""
+Vector index files without NumPy
+
+The SQLite half of a VectorIndex (ciia/vector_index.py) names the matrix file
+of its build and holds the build metadata. Reading those needs only sqlite3,
+so the health check reports index stats without importing NumPy.
+"""
+
+import os
+import sqlite3
+from typing import Dict, Any
+
+
+DEFAULT_DIM = 256
+
+# Smaller indexes are searched by full scan; builds train lists from this size on
+EXACT_BELOW = 20000
+
+
+def matrix_file(path, conn) -> str:
+    """Path of the matrix file belonging to the index database behind conn"""
+
+    row = conn.execute("SELECT value FROM vector_meta WHERE key = 'matrix'").fetchone()
+    if row is None:
+        # Built before matrix files were versioned
+        return f"{path}.f32"
+    return os.path.join(os.path.dirname(path), row[0])
+
+
+def index_stats(path, dim=DEFAULT_DIM, exact_below=EXACT_BELOW) -> Dict[str, Any]:
+    """Size, search mode and build metadata of the index at `path`"""
+
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM vector_meta").fetchall())
+        incidents = conn.execute("SELECT COUNT(*) FROM vector_rows").fetchone()[0]
+        matrix = matrix_file(path, conn)
+    finally:
+        conn.close()
+
+    rows = os.path.getsize(matrix) // (4 * dim)
+    lists = int(meta.get('lists') or 0)
+    return {
+        'rows': rows,
+        'incidents': incidents,
+        'dim': int(meta.get('dim', dim)),
+        'lists': lists,
+        'search': 'ivf' if rows >= exact_below and lists else 'exact',
+        'built_at': meta.get('built_at'),
+        'updated_at': meta.get('updated_at'),
+        'source': meta.get('source'),
+    }
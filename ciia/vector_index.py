@@ -0,0 +1,496 @@
+"""
+Local CPU-only vector index for similar-incident retrieval
+
+The keyword and category strategies only find incidents that share words
+with the current one. Here every resolved incident is embedded with
+HashedNgramEncoder, a signed feature-hashing of its character 3-5-grams
+(no model download, NumPy only). The result is an L2-normalized float32
+vector where reworded descriptions ("db conn timeout" / "database
+connection timed out") still land close to each other. Vectors are stored
+in a memory-mapped float32 matrix next to a SQLite file that holds the
+records and the row -> sys_id mapping. Every build writes a new matrix file
+whose name is kept in the SQLite metadata, so swapping the SQLite file is the
+only step that publishes a build and a reader never pairs one build's matrix
+with another's rows.
+
+Top-k is approximate with an inverted-file (IVF) index: a full build
+trains about 4 * sqrt(n) spherical k-means centroids and files every row
+under its nearest one; a query scores only the rows of the PROBES lists
+closest to it, exactly by cosine. Below EXACT_BELOW rows a full scan is
+both exact and fast enough, so that is used instead. Incremental adds are
+filed under the existing centroids; rebuild now and then so they keep
+fitting. scripts/bench_vector_index.py measures recall@k and latency of
+both paths.
+
+    index = VectorIndex('vectors.db')
+    index.build(records)           # from scratch, swapped in atomically
+    index.add(new_records)         # incremental: append or overwrite rows
+    index.search(incident, limit=15, exclude_sys_id=...)
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+import numpy as np
+
+from ciia.search_index import RESOLVED_STATES
+from ciia.vector_files import DEFAULT_DIM, EXACT_BELOW, index_stats, matrix_file
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vector_rows (
+    row INTEGER PRIMARY KEY,
+    sys_id TEXT NOT NULL UNIQUE,
+    list INTEGER,
+    record TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vector_centroids (
+    list INTEGER PRIMARY KEY,
+    centroid BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vector_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+NGRAMS = (3, 4, 5)
+
+# Leading characters of the description that are embedded (pasted logs add noise, not meaning)
+MAX_DESCRIPTION_CHARS = 1000
+
+# Inverted lists scanned per query, and the cap on how many a build trains
+PROBES = 16
+MAX_LISTS = 4096
+KMEANS_ITERS = 10
+KMEANS_SAMPLE_PER_LIST = 64
+
+# Builds train lists from this size on (smaller indexes: full scan below EXACT_BELOW)
+MIN_TRAIN_ROWS = 1000
+
+_MASK32 = np.uint64(0xFFFFFFFF)
+_BASE = np.uint64(0x01000193)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def embedding_text(record) -> str:
+    """What is embedded: the short description twice (it carries the most signal) and the description head"""
+
+    short = record.get('short_description', '') or ''
+    description = (record.get('description', '') or '')[:MAX_DESCRIPTION_CHARS]
+    return f"{short} {short} {description}"
+
+
+class HashedNgramEncoder:
+    """Character n-gram feature hashing into `dim` signed buckets
+
+    N-gram hashes are polynomial rolling hashes over code points, computed
+    vectorized per n. They are stable across processes, so vectors can be
+    built offline and queried by the function.
+    """
+
+    def __init__(self, dim=DEFAULT_DIM, ngrams=NGRAMS):
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+
+    def encode(self, text) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        text = ' ' + ' '.join((text or '').lower().split()) + ' '
+        codes = np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+        for n in self.ngrams:
+            if len(codes) < n:
+                continue
+            h = np.zeros(len(codes) - n + 1, dtype=np.uint64)
+            for j in range(n):
+                h = (h * _BASE + codes[j:len(codes) - n + 1 + j]) & _MASK32
+            with np.errstate(over='ignore'):
+                mixed = (h + np.uint64(n)) * _MIX
+            buckets = (mixed >> np.uint64(40)) % np.uint64(self.dim)
+            signs = np.where((mixed >> np.uint64(63)) == 1, -1.0, 1.0)
+            vector += np.bincount(buckets.astype(np.int64), weights=signs, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def encode_records(self, records: List[Dict[str, Any]]) -> np.ndarray:
+        out = np.zeros((len(records), self.dim), dtype=np.float32)
+        for i, record in enumerate(records):
+            out[i] = self.encode(embedding_text(record))
+        return out
+
+
+def train_centroids(matrix, lists, iters=KMEANS_ITERS, seed=11) -> np.ndarray:
+    """Spherical k-means centroids over a sample of the (unit-length) rows"""
+
+    rng = np.random.RandomState(seed)
+    sample_size = min(len(matrix), KMEANS_SAMPLE_PER_LIST * lists)
+    sample = np.asarray(matrix[np.sort(rng.choice(len(matrix), sample_size, replace=False))])
+    centroids = sample[rng.choice(len(sample), lists, replace=False)].copy()
+    for _ in range(iters):
+        nearest = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, nearest, sample)
+        filled = np.bincount(nearest, minlength=lists) > 0
+        centroids[filled] = sums[filled] / np.linalg.norm(sums[filled], axis=1, keepdims=True)
+    return centroids
+
+
+def assign_lists(vectors, centroids, chunk=8192) -> np.ndarray:
+    """Nearest centroid per row"""
+    out = np.zeros(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        out[start:start + chunk] = np.argmax(np.asarray(vectors[start:start + chunk]) @ centroids.T, axis=1)
+    return out
+
+
+def lists_for(rows) -> int:
+    """Inverted lists for `rows` vectors: about 4 * sqrt(rows)"""
+    return int(min(MAX_LISTS, max(1, round(4 * np.sqrt(rows)))))
+
+
+class InvertedLists:
+    """Rows grouped by nearest centroid, kept as one sorted array with list boundaries"""
+
+    def __init__(self, centroids, rows, lists):
+        self.centroids = centroids
+        order = np.argsort(lists, kind='stable')
+        self.rows = rows[order]
+        self.bounds = np.searchsorted(lists[order], np.arange(len(centroids) + 1))
+
+    def candidates(self, query, probes=PROBES) -> np.ndarray:
+        """Rows in the `probes` lists whose centroids are closest to the query"""
+
+        probes = min(probes, len(self.centroids))
+        scores = self.centroids @ query
+        nearest = np.argpartition(-scores, probes - 1)[:probes]
+        chunks = [self.rows[self.bounds[i]:self.bounds[i + 1]] for i in nearest]
+        return np.sort(np.concatenate(chunks)) if chunks else np.zeros(0, dtype=np.int64)
+
+
+class VectorIndex:
+    """Memory-mapped float32 vectors + SQLite records, with IVF or exact top-k"""
+
+    def __init__(self, path, dim=DEFAULT_DIM, exact_below=EXACT_BELOW):
+        self.path = path
+        self.dim = dim
+        self.exact_below = exact_below
+        self.encoder = HashedNgramEncoder(dim)
+        self._lock = threading.Lock()
+        self._state = None
+        self._local = threading.local()
+
+    # -- storage -------------------------------------------------------------
+
+    def _connect(self, path=None):
+        conn = sqlite3.connect(path or self.path, check_same_thread=False)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _reader(self):
+        """Per-thread read-only connection, reopened when a build has swapped the file"""
+
+        inode = os.stat(self.path).st_ino
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.inode != inode:
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.inode = inode
+            self._local.matrix = self._matrix_of(conn)
+        return conn
+
+    def _drop_reader(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _matrix_of(self, conn) -> str:
+        return matrix_file(self.path, conn)
+
+    @property
+    def matrix_path(self) -> str:
+        """Matrix file of the build this thread currently reads"""
+        self._reader()
+        return self._local.matrix
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path) and os.path.exists(self.matrix_path)
+
+    def meta(self) -> Dict[str, str]:
+        rows = self._reader().execute("SELECT key, value FROM vector_meta").fetchall()
+        return dict(rows)
+
+    def _set_meta(self, conn, **values):
+        conn.executemany("INSERT OR REPLACE INTO vector_meta (key, value) VALUES (?, ?)",
+                         [(key, str(value)) for key, value in values.items()])
+
+    def _load(self):
+        """(matrix memmap, inverted lists or None, reader) of the build this thread reads
+
+        Rows of the matrix are looked up through the returned reader, which is
+        opened on the same build. Reloaded when the matrix changes.
+        """
+
+        try:
+            return self._load_from(self._reader())
+        except FileNotFoundError:
+            # A build replaced the matrix after this connection opened: move to the new build
+            self._drop_reader()
+            return self._load_from(self._reader())
+
+    def _load_from(self, conn):
+        matrix_path = self._local.matrix
+        stat = os.stat(matrix_path)
+        version = (matrix_path, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            if self._state is not None and self._state[0] == version:
+                return self._state[1], self._state[2], conn
+            rows = stat.st_size // (4 * self.dim)
+            if rows:
+                matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+            else:
+                matrix = np.zeros((0, self.dim), dtype=np.float32)
+            lists = self._inverted_lists(conn) if rows >= self.exact_below else None
+            self._state = (version, matrix, lists)
+            return matrix, lists, conn
+
+    def _inverted_lists(self, conn) -> Optional[InvertedLists]:
+        centroids = self._centroids(conn)
+        if centroids is None:
+            # Grown past EXACT_BELOW by adds alone: full scans until the next build trains lists
+            return None
+        filed = np.array(conn.execute("SELECT row, list FROM vector_rows WHERE list IS NOT NULL").fetchall(),
+                         dtype=np.int64).reshape(-1, 2)
+        return InvertedLists(centroids, filed[:, 0], filed[:, 1])
+
+    def _centroids(self, conn) -> Optional[np.ndarray]:
+        blobs = conn.execute("SELECT centroid FROM vector_centroids ORDER BY list").fetchall()
+        return np.stack([np.frombuffer(blob, dtype=np.float32) for blob, in blobs]) if blobs else None
+
+    # -- building ------------------------------------------------------------
+
+    def build(self, records: Iterable[Dict[str, Any]], source='export', batch=2000) -> int:
+        """Embed resolved records into fresh files and swap them in
+
+        The new matrix gets its own file name; replacing the SQLite file,
+        which names it, switches readers over in one step.
+        """
+
+        tmp = f"{self.path}.building"
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        matrix_name = f"{os.path.basename(self.path)}.{time.time_ns()}.f32"
+        matrix_path = os.path.join(os.path.dirname(self.path), matrix_name)
+        previous = self._current_matrix()
+
+        conn = self._connect(tmp)
+        count = 0
+        try:
+            with open(matrix_path, 'wb') as out:
+                pending = []
+                for record in records:
+                    if record.get('sys_id') and str(record.get('state', '')) in RESOLVED_STATES:
+                        pending.append(record)
+                    if len(pending) >= batch:
+                        count = self._write_rows(conn, out, pending, count)
+                        pending = []
+                if pending:
+                    count = self._write_rows(conn, out, pending, count)
+            lists = self._train(conn, matrix_path, count)
+            now = time.time()
+            self._set_meta(conn, dim=self.dim, rows=count, lists=lists, matrix=matrix_name,
+                           built_at=now, updated_at=now, source=source)
+            conn.commit()
+        except BaseException:
+            if os.path.exists(matrix_path):
+                os.remove(matrix_path)
+            raise
+        finally:
+            conn.close()
+
+        os.replace(tmp, self.path)
+        self._reset()
+        # Readers that already mapped the old matrix keep their mapping
+        if previous and os.path.exists(previous):
+            os.remove(previous)
+        return count
+
+    def _current_matrix(self) -> Optional[str]:
+        """Matrix file named by the database on disk, or None before the first build"""
+
+        if not os.path.exists(self.path):
+            return None
+        conn = self._connect()
+        try:
+            return self._matrix_of(conn)
+        finally:
+            conn.close()
+
+    def _train(self, conn, matrix_path, rows) -> int:
+        """Train the IVF centroids on the written matrix and file every row; returns the list count"""
+
+        if rows < MIN_TRAIN_ROWS:
+            return 0
+        matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(rows, self.dim))
+        centroids = train_centroids(matrix, lists_for(rows))
+        filed = assign_lists(matrix, centroids)
+        conn.executemany("INSERT INTO vector_centroids (list, centroid) VALUES (?, ?)",
+                         [(i, centroid.tobytes()) for i, centroid in enumerate(centroids)])
+        conn.executemany("UPDATE vector_rows SET list = ? WHERE row = ?",
+                         [(int(lst), row) for row, lst in enumerate(filed)])
+        return len(centroids)
+
+    def _write_rows(self, conn, out, records, first_row):
+        # Later duplicates of a sys_id in one build overwrite the earlier record only
+        vectors = self.encoder.encode_records(records)
+        row = first_row
+        for record, vector in zip(records, vectors):
+            cursor = conn.execute("INSERT OR IGNORE INTO vector_rows (row, sys_id, record) VALUES (?, ?, ?)",
+                                  (row, record['sys_id'], json.dumps(record)))
+            if cursor.rowcount:
+                out.write(vector.tobytes())
+                row += 1
+        return row
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> Tuple[int, int]:
+        """Incremental update: (added, updated); existing sys_ids are re-embedded in place
+
+        Re-opened incidents keep their row (the matrix is append-only) but
+        are dropped from the records, so searches skip them.
+        """
+
+        records = [r for r in records if r.get('sys_id')]
+        if not self.exists():
+            return self.build(records, source='add'), 0
+
+        conn = self._connect()
+        added = updated = 0
+        try:
+            matrix_path = self._matrix_of(conn)
+            rows_now = os.path.getsize(matrix_path) // (4 * self.dim)
+            known = {}
+            ids = [r['sys_id'] for r in records]
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                known.update(conn.execute(
+                    f"SELECT sys_id, row FROM vector_rows WHERE sys_id IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall())
+
+            resolved = []
+            for record in records:
+                if str(record.get('state', '')) in RESOLVED_STATES:
+                    resolved.append(record)
+                elif record['sys_id'] in known:
+                    conn.execute("DELETE FROM vector_rows WHERE sys_id = ?", (record['sys_id'],))
+            vectors = self.encoder.encode_records(resolved)
+            centroids = self._centroids(conn)
+            filed = assign_lists(vectors, centroids) if centroids is not None else [None] * len(resolved)
+
+            with open(matrix_path, 'r+b') as out:
+                for record, vector, lst in zip(resolved, vectors, filed):
+                    lst = None if lst is None else int(lst)
+                    row = known.get(record['sys_id'])
+                    if row is None:
+                        row = known[record['sys_id']] = rows_now
+                        rows_now += 1
+                        added += 1
+                        conn.execute("INSERT INTO vector_rows (row, sys_id, list, record) VALUES (?, ?, ?, ?)",
+                                     (row, record['sys_id'], lst, json.dumps(record)))
+                    else:
+                        updated += 1
+                        conn.execute("UPDATE vector_rows SET list = ?, record = ? WHERE row = ?",
+                                     (lst, json.dumps(record), row))
+                    out.seek(row * 4 * self.dim)
+                    out.write(vector.tobytes())
+            self._set_meta(conn, rows=rows_now, updated_at=time.time())
+            conn.commit()
+        finally:
+            conn.close()
+        self._reset()
+        return added, updated
+
+    def _reset(self):
+        with self._lock:
+            self._state = None
+
+    # -- querying ------------------------------------------------------------
+
+    def nearest(self, query: np.ndarray, k, exact=None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine scores) of the k nearest vectors, best first
+
+        exact=None probes the inverted lists when the index has them and is
+        large enough, True forces a full scan.
+        """
+
+        matrix, lists, _ = self._load()
+        return self._top_k(matrix, lists, query, k, exact)
+
+    @staticmethod
+    def _top_k(matrix, lists, query, k, exact=None):
+        if len(matrix) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if exact or lists is None:
+            rows = None
+            scores = matrix @ query
+        else:
+            rows = lists.candidates(query)
+            if len(rows) == 0:
+                return rows, np.zeros(0, dtype=np.float32)
+            scores = matrix[rows] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search(self, record, limit=15, exclude_sys_id=None, min_score=0.0) -> List[Dict[str, Any]]:
+        """Records most similar to `record`, best first"""
+
+        query = self.encoder.encode(embedding_text(record))
+        # Rows are resolved through the reader of the build they were scored on
+        matrix, lists, conn = self._load()
+        # Extra rows cover the excluded incident and rows of re-opened ones
+        rows, scores = self._top_k(matrix, lists, query, limit + 5)
+        wanted = [(int(row), float(score)) for row, score in zip(rows, scores) if score > min_score]
+        if not wanted:
+            return []
+
+        found = dict(conn.execute(
+            f"SELECT row, record FROM vector_rows WHERE row IN ({','.join('?' * len(wanted))})",
+            [row for row, _ in wanted]).fetchall())
+        results = []
+        for row, score in wanted:
+            if row not in found:
+                continue
+            result = json.loads(found[row])
+            if result.get('sys_id') == exclude_sys_id:
+                continue
+            results.append(result)
+        return results[:limit]
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM vector_rows").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return index_stats(self.path, self.dim, self.exact_below)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def configured_vector_index(path=None) -> Optional[VectorIndex]:
+    """The index at `path` (default CIIA_VECTOR_INDEX) if its files exist, else None"""
+
+    path = path or os.environ.get('CIIA_VECTOR_INDEX')
+    if not path:
+        return None
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = VectorIndex(path)
+    return index if index.exists() else None
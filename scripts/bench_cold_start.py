@@ -0,0 +1,180 @@
+"""
+Benchmark: cold-start cost of the enrichment function
+
+Each run is a fresh interpreter, like a cold serverless instance. It imports
+api/enrich.py, serves one GET health check and then two POST enrichments
+(first = cold, second = warm) against the local ServiceNow and Groq
+stand-ins, and reports the time for each step plus which heavy dependencies
+(Groq SDK, httpx, requests, NumPy) were loaded by then. An `-X importtime`
+report of `import api.enrich` lists the slowest modules, excluding what the
+bare interpreter already loads at startup.
+
+    python scripts/bench_cold_start.py
+    python scripts/bench_cold_start.py --runs 10 --json
+    python scripts/bench_cold_start.py --check     # exit 1 if a health check loads a heavy dependency
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ciia.timing import percentile
+from scripts import fake_groq_server, fake_servicenow_server
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('groq', 'httpx', 'requests', 'numpy')
+
+# Runs in the fresh interpreter; stdlib-only client so it loads nothing itself
+CHILD = r'''
+import json, sys, threading, time, urllib.request
+started = time.perf_counter()
+sys.path.insert(0, ROOT)
+from http.server import ThreadingHTTPServer
+from api.enrich import handler
+timings = {'import_ms': (time.perf_counter() - started) * 1000}
+heavy = lambda: [m for m in HEAVY if m in sys.modules]
+loaded = {'after_import': heavy()}
+
+class Quiet(handler):
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(('127.0.0.1', 0), Quiet)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+url = f"http://127.0.0.1:{server.server_port}/api/enrich"
+
+def call(data=None):
+    t = time.perf_counter()
+    request = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=60) as response:
+        status = json.loads(response.read()).get('status')
+    return (time.perf_counter() - t) * 1000, status
+
+timings['first_get_ms'], _ = call()
+loaded['after_get'] = heavy()
+statuses = []
+for name, sys_id in (('first_post_ms', TARGETS[0]), ('warm_post_ms', TARGETS[1])):
+    timings[name], status = call(json.dumps({'incident_sys_id': sys_id}).encode())
+    statuses.append(status)
+loaded['after_post'] = heavy()
+print(json.dumps({'timings': timings, 'loaded': loaded, 'statuses': statuses}))
+'''
+
+
+def child_env(snow_port, groq_port):
+    env = dict(os.environ)
+    env.update({
+        'SNOW_INSTANCE': f"http://127.0.0.1:{snow_port}",
+        'SNOW_USER': 'bench',
+        'SNOW_PASSWORD': 'bench',
+        'GROQ_API_KEY': 'bench',
+        'GROQ_BASE_URL': f"http://127.0.0.1:{groq_port}",
+        'GROQ_RPM': '100000',
+        'GROQ_TPM': '100000000',
+        'CIIA_TIMING_LOG': '0',
+        'CIIA_LLM_CACHE_SIZE': '0',
+        'CIIA_COALESCE_WINDOW': '0',
+        'CIIA_FINGERPRINT_SIZE': '0',
+        'CIIA_CANDIDATE_CACHE_MB': '0',
+        'CIIA_ENRICH_MODE': 'sync',
+    })
+    for name in ('CIIA_INCIDENT_STORE', 'CIIA_SEARCH_INDEX', 'CIIA_LLM_CACHE_PATH', 'CIIA_JOB_QUEUE_PATH',
+                 'CIIA_FINGERPRINT_PATH'):
+        env.pop(name, None)
+    return env
+
+
+def cold_run(env, targets):
+    code = (f"ROOT = {ROOT!r}\nHEAVY = {HEAVY_MODULES!r}\nTARGETS = {targets!r}\n") + CHILD
+    result = subprocess.run([sys.executable, '-c', code], env=env, capture_output=True, text=True, timeout=300)
+    if result.returncode != 0:
+        raise RuntimeError(f"cold run failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_times(statement, env):
+    """{module: (self_us, cumulative_us, depth)} from -X importtime"""
+
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], env=env, cwd=ROOT,
+                            capture_output=True, text=True, timeout=120)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def import_report(env, top):
+    baseline = import_times('pass', env)
+    modules = import_times(f"import sys; sys.path.insert(0, {ROOT!r}); import api.enrich", env)
+    added = {name: times for name, times in modules.items() if name not in baseline}
+    # Direct imports of api.enrich (depth 0 is api.enrich itself)
+    top_level = sorted(((name, times) for name, times in added.items() if times[2] == 1),
+                       key=lambda item: -item[1][1])
+    return {
+        'modules_loaded': len(added),
+        'total_ms': round(sum(times[0] for times in added.values()) / 1000, 1),
+        'slowest': [{'module': name, 'cumulative_ms': round(times[1] / 1000, 1)} for name, times in top_level[:top]],
+        'heavy_loaded': [name for name in HEAVY_MODULES if name in added],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    parser.add_argument('--snow-latency', type=float, default=0.05, help='ServiceNow stand-in latency (seconds)')
+    parser.add_argument('--groq-latency', type=float, default=0.3, help='Groq stand-in time to first token')
+    parser.add_argument('--check', action='store_true', help='fail if a health check loads a heavy dependency')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    snow, snow_state = fake_servicenow_server.serve(port=0, incidents=2000, latency=args.snow_latency)
+    groq, _ = fake_groq_server.serve(port=0, rpm=100000, tpm=100000000, latency=args.groq_latency,
+                                     completion_tokens=200)
+    env = child_env(snow.server_port, groq.server_port)
+    open_ids = [r['sys_id'] for r in snow_state.records.values() if r['state'] not in ('6', '7')]
+
+    runs = [cold_run(env, open_ids[2 * i:2 * i + 2]) for i in range(args.runs)]
+    steps = {}
+    for name in ('import_ms', 'first_get_ms', 'first_post_ms', 'warm_post_ms'):
+        values = [run['timings'][name] for run in runs]
+        steps[name] = {'p50': round(percentile(values, 50), 1), 'max': round(max(values), 1)}
+
+    result = {
+        'runs': args.runs,
+        'steps_ms': steps,
+        'loaded': runs[-1]['loaded'],
+        'post_statuses': sorted({status for run in runs for status in run['statuses']}),
+        'import': import_report(env, args.top),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"🧊 {args.runs} cold starts")
+        for name, values in steps.items():
+            print(f"   {name:<16} p50 {values['p50']:>8.1f}ms   max {values['max']:>8.1f}ms")
+        for stage, modules in result['loaded'].items():
+            print(f"   heavy {stage:<11} {', '.join(modules) or '-'}")
+        report = result['import']
+        print(f"   import api.enrich: {report['modules_loaded']} modules, {report['total_ms']}ms")
+        for entry in report['slowest']:
+            print(f"     {entry['cumulative_ms']:>8.1f}ms  {entry['module']}")
+
+    if args.check and result['loaded']['after_get']:
+        print(f"❌ health check loaded {', '.join(result['loaded']['after_get'])}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+Benchmark: bytes transferred and JSON parse time with and without field projection
+
+Live mode runs each Table API call site against SNOW_INSTANCE (from .env) twice,
+once unprojected and once with its registered projection. Synthetic mode
+serializes generated incidents with long work-note/comment journals instead,
+so the numbers can be reproduced without an instance.
+
+    python scripts/bench_field_projection.py              # live instance
+    python scripts/bench_field_projection.py --synthetic  # no network
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ciia.fields import fields_for, table_params
+
+
+# (call site, projection, query, limit)
+CALL_SITES = [
+    ('fetch_incident_detailed', 'incident_detail', 'ORDERBYDESCsys_created_on', 1),
+    ('_execute_search', 'similar_candidate', 'state=6^ORstate=7', 15),
+    ('get_all_incidents', 'incident_list', 'ORDERBYDESCsys_created_on', 100),
+]
+
+
+def _journal(entries, words_per_entry):
+    """Generate a work-notes style journal"""
+    vocab = ['restarted', 'service', 'database', 'connection', 'pool', 'timeout', 'checked',
+             'logs', 'users', 'error', 'ERW1234', 'HTTP', '500', 'cleared', 'cache', 'escalated']
+    lines = []
+    for i in range(entries):
+        lines.append(f"2024-01-{(i % 28) + 1:02d} 10:{i % 60:02d}:00 - Support Engineer (Work notes)")
+        lines.append(' '.join(random.choice(vocab) for _ in range(words_per_entry)))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def synthetic_incident(i):
+    """A full incident record roughly shaped like a Table API result"""
+    ref = lambda table: {'link': f"https://example.service-now.com/api/now/table/{table}/{i:032x}", 'value': f"{i:032x}"}
+    record = {
+        'sys_id': f"{i:032x}",
+        'number': f"INC{i:07d}",
+        'short_description': f"ERW login timeout on node {i % 7}",
+        'description': 'Users report timeouts when logging into ERW.\n' + _journal(3, 30),
+        'category': random.choice(['software', 'network', 'database', 'hardware']),
+        'subcategory': 'application',
+        'priority': str(random.randint(1, 5)),
+        'state': random.choice(['6', '7']),
+        'cmdb_ci': ref('cmdb_ci'),
+        'assigned_to': ref('sys_user'),
+        'assignment_group': ref('sys_user_group'),
+        'opened_by': ref('sys_user'),
+        'caller_id': ref('sys_user'),
+        'company': ref('core_company'),
+        'location': ref('cmn_location'),
+        'close_notes': 'Resolution: restarted the ERW auth service and cleared the session cache.',
+        'work_notes': _journal(40, 60),
+        'comments': _journal(60, 60),
+        'comments_and_work_notes': _journal(100, 60),
+        'sys_created_on': '2024-01-01 10:00:00',
+        'sys_updated_on': '2024-01-02 10:00:00',
+    }
+    # Remaining columns of the incident table (mostly empty strings)
+    for n in range(80):
+        record[f"u_field_{n}"] = ''
+    return record
+
+
+def project(record, projection):
+    """Apply a projection locally the way the Table API would"""
+    projected = {}
+    for field in fields_for(projection):
+        value = record.get(field, '')
+        if isinstance(value, dict):
+            value = value.get('value', '')
+        projected[field] = value
+    return projected
+
+
+def measure_payload(payload, repeat=20):
+    """Bytes of a serialized payload and the median JSON parse time"""
+    body = json.dumps(payload).encode()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        json.loads(body)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return len(body), timings[len(timings) // 2] * 1000
+
+
+def run_synthetic(args):
+    random.seed(42)
+    rows = []
+    for site, projection, _, limit in CALL_SITES:
+        records = [synthetic_incident(i) for i in range(limit)]
+        before = measure_payload({'result': records}, args.repeat)
+        after = measure_payload({'result': [project(r, projection) for r in records]}, args.repeat)
+        rows.append((site, projection, limit, before, after))
+    return rows
+
+
+def run_live(args):
+    from snow_incident_operations import ServiceNowAPI, BASE_URL
+
+    snow = ServiceNowAPI()
+    rows = []
+    for site, projection, query, limit in CALL_SITES:
+        measured = []
+        for proj in (None, projection):
+            params = table_params(proj, sysparm_query=query, sysparm_limit=limit)
+            response = snow.session.get(BASE_URL, headers=snow.headers, params=params, timeout=60)
+            if response.status_code != 200:
+                raise Exception(f"{site}: HTTP {response.status_code} - {response.text[:200]}")
+            body = response.content
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                json.loads(body)
+                timings.append(time.perf_counter() - started)
+            timings.sort()
+            measured.append((len(body), timings[len(timings) // 2] * 1000))
+        rows.append((site, projection, limit, measured[0], measured[1]))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--synthetic', action='store_true', help='use generated records instead of a live instance')
+    parser.add_argument('--repeat', type=int, default=20, help='parse repetitions per payload')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    rows = run_synthetic(args) if args.synthetic else run_live(args)
+
+    if args.json:
+        print(json.dumps([
+            {
+                'call_site': site, 'projection': projection, 'records': limit,
+                'bytes_before': before[0], 'bytes_after': after[0],
+                'parse_ms_before': round(before[1], 3), 'parse_ms_after': round(after[1], 3)
+            }
+            for site, projection, limit, before, after in rows
+        ], indent=2))
+        return
+
+    print(f"{'call site':<26}{'records':>8}{'bytes before':>14}{'bytes after':>13}{'parse before':>14}{'parse after':>13}")
+    for site, projection, limit, before, after in rows:
+        print(f"{site:<26}{limit:>8}{before[0]:>14,}{after[0]:>13,}{before[1]:>12.2f}ms{after[1]:>11.2f}ms")
+        print(f"  -> {projection}: {100 * (1 - after[0] / before[0]):.1f}% fewer bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Microbenchmark: technical keyword extraction on pasted log dumps
+
+Compares the original multi-regex extractor (four findall passes, an all-caps
+regex and 15 substring scans over the uppercased text) with the single-pass
+extractor in ciia/keywords.py on descriptions of increasing size.
+
+    python scripts/bench_keywords.py
+    python scripts/bench_keywords.py --sizes 1000,100000,5000000 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ciia.keywords import extract_keywords
+
+
+def legacy_matches(short_desc, description):
+    """Everything the original extractor matched, before its arbitrary cut to five"""
+    text = (short_desc + ' ' + description).upper()
+    keywords = []
+    error_patterns = [
+        r'\b[A-Z]{2,4}\d{2,4}\b',
+        r'\bERROR\s*[:\-]?\s*\d+\b',
+        r'\b[A-Z]+\s*\d{3,4}\b',
+        r'\b\d{3}\s*ERROR\b',
+    ]
+    for pattern in error_patterns:
+        keywords.extend(re.findall(pattern, text))
+    keywords.extend(re.findall(r'\b[A-Z]{3,}(?:\s+[A-Z]{3,})*\b', text))
+    technical_terms = ['TIMEOUT', 'CONNECTION', 'DATABASE', 'LOGIN', 'AUTH',
+                       'PERMISSION', 'DENIED', 'FAILED', 'ERROR', 'EXCEPTION',
+                       'CRASH', 'FREEZE', 'SLOW', 'LATENCY', 'UNAVAILABLE']
+    for term in technical_terms:
+        if term in text:
+            keywords.append(term)
+    return set(keywords)
+
+
+def legacy_extract(short_desc, description):
+    """The extractor as it was in handler._extract_technical_keywords"""
+    return list(legacy_matches(short_desc, description))[:5]
+
+
+LOG_LINES = [
+    "2024-03-01T10:{m:02d}:{s:02d}.123Z INFO  [http-nio-8080-exec-{t}] c.e.erw.auth.LoginController - login attempt user=u{u}",
+    "2024-03-01T10:{m:02d}:{s:02d}.456Z WARN  [pool-{t}-thread-1] c.e.erw.db.ConnectionPool - connection wait {u}ms",
+    "2024-03-01T10:{m:02d}:{s:02d}.789Z ERROR [http-nio-8080-exec-{t}] c.e.erw.auth.TokenService - ERW1234 token validation failed: HTTP 503",
+    "java.net.SocketTimeoutException: Read timed out",
+    "    at java.base/java.net.SocketInputStream.read(SocketInputStream.java:{u})",
+    "    at com.example.erw.db.ConnectionPool.acquire(ConnectionPool.java:{t})",
+    "Caused by: org.postgresql.util.PSQLException: FATAL: too many connections for role \"erw\" (ERROR 53300)",
+]
+
+
+def log_dump(size, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = rng.choice(LOG_LINES).format(m=rng.randrange(60), s=rng.randrange(60),
+                                            t=rng.randrange(200), u=rng.randrange(10000))
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines)[:size]
+
+
+def timed(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2], result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000,5000000', help='description sizes in characters')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per measurement (median reported)')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    short_desc = "ERW login timeout - users unable to access"
+    results = []
+    for size in [int(s) for s in args.sizes.split(',')]:
+        description = log_dump(size)
+        legacy_ms, legacy_kw = timed(lambda: legacy_extract(short_desc, description), args.repeat)
+        new_ms, new_kw = timed(lambda: extract_keywords(short_desc, description), args.repeat)
+        results.append({
+            'chars': size,
+            'legacy_ms': round(legacy_ms, 3),
+            'single_pass_ms': round(new_ms, 3),
+            'speedup': round(legacy_ms / new_ms, 1) if new_ms else None,
+            'legacy_keywords': legacy_kw,
+            'single_pass_keywords': new_kw,
+        })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'chars':>10}{'legacy':>12}{'single-pass':>14}{'speedup':>9}  keywords")
+    for r in results:
+        print(f"{r['chars']:>10,}{r['legacy_ms']:>10.2f}ms{r['single_pass_ms']:>12.2f}ms{r['speedup']:>8}x  {r['single_pass_keywords']}")
+
+
+if __name__ == "__main__":
+    main()
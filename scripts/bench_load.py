@@ -0,0 +1,301 @@
+"""
+End-to-end load benchmark against local ServiceNow and Groq stand-ins
+
+Starts scripts/fake_servicenow_server.py (seeded synthetic corpus, configurable
+latency) and scripts/fake_groq_server.py, serves api/enrich.handler on a local
+multi-threaded HTTP server pointed at both, and POSTs enrichments of the
+corpus's open incidents either closed-loop (--concurrency clients back to back)
+or open-loop (--rate Poisson arrivals per second, at most --concurrency in
+flight). Reports throughput, end-to-end latency, per-stage p50/p95/p99 from
+the responses' `timings` blocks, ServiceNow requests per enrichment, error
+rates and analysis outcomes. A response whose Groq analysis failed counts as
+an error and is left out of throughput and latency.
+
+    python scripts/bench_load.py --concurrency 8 --requests 200
+    python scripts/bench_load.py --rate 5 --duration 60 --snow-latency 0.2 --groq-latency 1.0 --json
+
+Open-loop latencies are measured from the scheduled arrival time, so queueing
+behind a saturated server is part of the result instead of slowing the
+arrivals down. The LLM cache, request coalescing, unchanged-incident
+skipping and the candidate cache are disabled unless --cache is given, so
+every request runs the full pipeline.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from ciia.http_pool import default_pool_maxsize
+from ciia.timing import percentile, STAGES
+from scripts import fake_groq_server, fake_servicenow_server
+
+
+def start_stand_ins(args):
+    snow, snow_state = fake_servicenow_server.serve(
+        port=0, incidents=args.incidents, latency=args.snow_latency, jitter=args.snow_jitter,
+        open_ratio=args.open_ratio, seed=args.seed)
+    groq, groq_state = fake_groq_server.serve(
+        port=0, rpm=args.groq_rpm, tpm=args.groq_tpm, latency=args.groq_latency,
+        completion_tokens=args.completion_tokens, tokens_per_s=args.groq_tokens_per_s)
+    return (snow, snow_state), (groq, groq_state)
+
+
+def configure_environment(args, snow_port, groq_port):
+    """Point the function at the stand-ins (before api.enrich is imported)"""
+
+    os.environ.update({
+        'SNOW_INSTANCE': f"http://127.0.0.1:{snow_port}",
+        'SNOW_USER': 'bench',
+        'SNOW_PASSWORD': 'bench',
+        'GROQ_API_KEY': 'bench',
+        'GROQ_BASE_URL': f"http://127.0.0.1:{groq_port}",
+        'GROQ_RPM': str(args.groq_rpm),
+        'GROQ_TPM': str(args.groq_tpm),
+        'CIIA_ENRICH_MODE': 'sync',
+        'CIIA_TIMING_LOG': '0',
+        # Sync requests are the concurrent runs here, not the job workers' batches
+        'SNOW_POOL_MAXSIZE': os.environ.get('SNOW_POOL_MAXSIZE', str(default_pool_maxsize(args.concurrency))),
+    })
+    # Local stores would bypass the ServiceNow stand-in
+    for name in ('CIIA_INCIDENT_STORE', 'CIIA_SEARCH_INDEX', 'CIIA_LLM_CACHE_PATH', 'CIIA_JOB_QUEUE_PATH',
+                 'CIIA_FINGERPRINT_PATH'):
+        os.environ.pop(name, None)
+    if not args.cache:
+        os.environ['CIIA_LLM_CACHE_SIZE'] = '0'
+        os.environ['CIIA_COALESCE_WINDOW'] = '0'
+        os.environ['CIIA_FINGERPRINT_SIZE'] = '0'
+        os.environ['CIIA_CANDIDATE_CACHE_MB'] = '0'
+
+
+def start_function():
+    from api.enrich import handler
+
+    class QuietHandler(handler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), QuietHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def analysis_outcome(body):
+    """'generated', 'cached', 'skipped' (deadline), 'error' or 'unchanged' (fingerprint skip), else None"""
+
+    if body.get('status') == 'skipped':
+        return 'unchanged'
+    analysis = body.get('analysis')
+    if not analysis:
+        return None
+    if analysis.get('error'):
+        return 'error'
+    if analysis.get('skipped'):
+        return 'skipped'
+    return 'cached' if analysis.get('cached') else 'generated'
+
+
+class LoadRun:
+    """Issues enrichments and collects per-request outcomes"""
+
+    def __init__(self, url, targets, timeout):
+        self.url = url
+        self.targets = targets
+        self.timeout = timeout
+        self.samples = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.next_target = 0
+
+    def _session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        return session
+
+    def _target(self):
+        with self.lock:
+            target = self.targets[self.next_target % len(self.targets)]
+            self.next_target += 1
+            return target
+
+    def one(self, scheduled=None):
+        started = scheduled if scheduled is not None else time.monotonic()
+        sample = {'error': None, 'timings': None}
+        try:
+            response = self._session().post(self.url, json={'incident_sys_id': self._target()}, timeout=self.timeout)
+            body = response.json()
+            sample['timings'] = body.get('timings')
+            sample['analysis_status'] = analysis_outcome(body)
+            if response.status_code != 200 or body.get('status') not in ('success', 'skipped'):
+                sample['error'] = f"http_{response.status_code}"
+            elif sample['analysis_status'] == 'error':
+                # The work note went out without an analysis: not a successful enrichment
+                sample['error'] = 'analysis_error'
+        except requests.Timeout:
+            sample['error'] = 'timeout'
+        except (requests.RequestException, ValueError) as e:
+            sample['error'] = type(e).__name__
+        sample['latency_ms'] = (time.monotonic() - started) * 1000
+        with self.lock:
+            self.samples.append(sample)
+
+    def closed_loop(self, concurrency, requests_total, duration):
+        deadline = time.monotonic() + duration if duration else None
+        issued = Counter()
+
+        def client():
+            while True:
+                with self.lock:
+                    if requests_total and issued['n'] >= requests_total:
+                        return
+                    issued['n'] += 1
+                if deadline and time.monotonic() >= deadline:
+                    return
+                self.one()
+
+        threads = [threading.Thread(target=client) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def open_loop(self, rate, concurrency, requests_total, duration, seed):
+        rng = random.Random(seed)
+        start = time.monotonic()
+        scheduled = start
+        sent = 0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            while (not requests_total or sent < requests_total) and (not duration or scheduled - start < duration):
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.one, scheduled)
+                sent += 1
+                scheduled += rng.expovariate(rate)
+
+
+def summarize(samples, elapsed_s):
+    """Throughput, latency percentiles, per-stage percentiles and error rates"""
+
+    def dist(values):
+        if not values:
+            return None
+        return {'p50': round(percentile(values, 50), 1), 'p95': round(percentile(values, 95), 1),
+                'p99': round(percentile(values, 99), 1), 'max': round(max(values), 1)}
+
+    ok = [s for s in samples if s['error'] is None]
+    errors = Counter(s['error'] for s in samples if s['error'] is not None)
+    timed = [s['timings'] for s in ok if s.get('timings')]
+
+    stages = {}
+    for name in STAGES:
+        values = [t['stages'][name] for t in timed if name in t.get('stages', {})]
+        if values:
+            stages[name] = dist(values)
+    stages['snow'] = dist([t['snow_ms'] for t in timed])
+    stages['total'] = dist([t['total_ms'] for t in timed])
+
+    return {
+        'requests': len(samples),
+        'succeeded': len(ok),
+        'error_rate': round(1 - len(ok) / len(samples), 4) if samples else None,
+        'errors': dict(errors),
+        'analysis_status': dict(Counter(s['analysis_status'] for s in samples if s.get('analysis_status'))),
+        'elapsed_s': round(elapsed_s, 2),
+        'throughput_rps': round(len(ok) / elapsed_s, 2) if elapsed_s else None,
+        'latency_ms': dist([s['latency_ms'] for s in ok]),
+        'stages_ms': stages,
+        'snow_requests_per_enrichment': round(sum(len(t['snow_queries']) for t in timed) / len(timed), 2) if timed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    load = parser.add_argument_group('load')
+    load.add_argument('--concurrency', type=int, default=8, help='closed-loop clients / open-loop in-flight cap')
+    load.add_argument('--rate', type=float, help='open-loop arrivals per second (default: closed loop)')
+    load.add_argument('--requests', type=int, default=200, help='enrichments to issue (0 = until --duration)')
+    load.add_argument('--duration', type=float, help='stop issuing after this many seconds')
+    load.add_argument('--timeout', type=float, default=120, help='client timeout per request (seconds)')
+    load.add_argument('--cache', action='store_true', help='keep the LLM, fingerprint and candidate caches and request coalescing enabled')
+    snow = parser.add_argument_group('ServiceNow stand-in')
+    snow.add_argument('--incidents', type=int, default=5000, help='synthetic incidents to seed')
+    snow.add_argument('--open-ratio', type=float, default=0.1, help='share of seeded incidents to enrich')
+    snow.add_argument('--snow-latency', type=float, default=0.1, help='seconds per Table API request')
+    snow.add_argument('--snow-jitter', type=float, default=0.05, help='extra uniform latency (seconds)')
+    groq = parser.add_argument_group('Groq stand-in')
+    groq.add_argument('--groq-latency', type=float, default=0.5, help='seconds to the first token')
+    groq.add_argument('--groq-tokens-per-s', type=float, default=0.0, help='generation speed (0 = instant)')
+    groq.add_argument('--completion-tokens', type=int, default=300)
+    groq.add_argument('--groq-rpm', type=int, default=100000, help='stand-in and client request budget')
+    groq.add_argument('--groq-tpm', type=int, default=100000000, help='stand-in and client token budget')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    if not args.requests and not args.duration:
+        parser.error('--requests 0 needs --duration')
+
+    (snow_server, snow_state), (groq_server, groq_state) = start_stand_ins(args)
+    configure_environment(args, snow_server.server_port, groq_server.server_port)
+    function = start_function()
+    url = f"http://127.0.0.1:{function.server_port}/api/enrich"
+
+    targets = [r['sys_id'] for r in snow_state.records.values() if r['state'] not in ('6', '7')]
+    if not targets:
+        parser.error('the seeded corpus has no open incidents; raise --open-ratio')
+
+    if not args.json:
+        mode = f"open loop at {args.rate}/s" if args.rate else f"closed loop x{args.concurrency}"
+        print(f"🏋️  {mode}: {args.requests or 'unbounded'} requests, {len(snow_state.records):,} incidents, "
+              f"ServiceNow {args.snow_latency}s, Groq {args.groq_latency}s")
+
+    run = LoadRun(url, targets, args.timeout)
+    started = time.monotonic()
+    if args.rate:
+        run.open_loop(args.rate, args.concurrency, args.requests, args.duration, args.seed)
+    else:
+        run.closed_loop(args.concurrency, args.requests, args.duration)
+    elapsed = time.monotonic() - started
+
+    result = summarize(run.samples, elapsed)
+    result['config'] = {k: v for k, v in vars(args).items() if k != 'json'}
+    with snow_state.lock:
+        result['servicenow'] = dict(snow_state.counters)
+    with groq_state.lock:
+        result['groq'] = {'served': groq_state.served, 'throttled': groq_state.throttled}
+    health = requests.get(url, timeout=10).json()
+    result['groq']['client'] = health.get('groq')
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    latency = result['latency_ms'] or {}
+    print(f"   throughput        {result['throughput_rps']} enrichments/s over {result['elapsed_s']}s")
+    print(f"   succeeded         {result['succeeded']}/{result['requests']} (error rate {result['error_rate']})")
+    if result['errors']:
+        print(f"   errors            {result['errors']}")
+    print(f"   latency           p50 {latency.get('p50')}ms  p95 {latency.get('p95')}ms  p99 {latency.get('p99')}ms")
+    print(f"   {'stage':<10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, values in result['stages_ms'].items():
+        if values:
+            print(f"   {name:<10}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}")
+    print(f"   ServiceNow        {result['snow_requests_per_enrichment']} requests per enrichment")
+    print(f"   Groq              {result['groq']['served']} served, {result['groq']['throttled']} throttled")
+
+
+if __name__ == "__main__":
+    main()
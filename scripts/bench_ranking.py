@@ -0,0 +1,136 @@
+"""
+Benchmark: MinHash/LSH ranking vs. per-pair Python Jaccard
+
+For each corpus size, generates synthetic incident descriptions and measures
+signature precomputation, LSH build, query latency (LSH candidates + vectorized
+scoring) and a full vectorized scan, next to the legacy per-pair Jaccard loop
+used by handler._rank_by_relevance before (skipped above --legacy-max).
+
+    python scripts/bench_ranking.py
+    python scripts/bench_ranking.py --sizes 1000,100000 --queries 50 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from ciia.ranking import MinHasher, LSHIndex, estimated_jaccard
+
+
+VOCAB_SIZE = 20000
+WORDS_PER_DOC = (8, 40)
+
+
+def synthetic_corpus(n, seed=42):
+    """Token lists drawn from a Zipf-like vocabulary, with near-duplicate clusters"""
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(VOCAB_SIZE)]
+    weights = [1.0 / (i + 1) for i in range(VOCAB_SIZE)]
+    templates = [rng.choices(vocab, weights, k=rng.randint(*WORDS_PER_DOC)) for _ in range(max(1, n // 50))]
+    docs = []
+    for _ in range(n):
+        doc = list(rng.choice(templates))
+        # Mutate ~20% of the words so clusters are similar, not identical
+        for _ in range(max(1, len(doc) // 5)):
+            doc[rng.randrange(len(doc))] = rng.choice(vocab)
+        docs.append(list(set(doc)))
+    return docs
+
+
+def legacy_rank(query, docs):
+    """Per-pair Python Jaccard, as the handler did it"""
+    q = set(query)
+    scored = []
+    for doc in docs:
+        words = set(doc)
+        union = len(q | words)
+        scored.append((len(q & words) / union if union else 0, doc))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return scored
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+
+def bench_size(n, queries, legacy_max, top_k=10):
+    docs = synthetic_corpus(n)
+    hasher = MinHasher()
+    result = {'corpus': n}
+
+    started = time.perf_counter()
+    signatures = hasher.signatures(docs)
+    result['signature_build_s'] = round(time.perf_counter() - started, 3)
+    result['signatures_per_s'] = round(n / result['signature_build_s'], 1)
+
+    started = time.perf_counter()
+    lsh = LSHIndex().build(signatures)
+    result['lsh_build_s'] = round(time.perf_counter() - started, 3)
+
+    rng = random.Random(7)
+    query_docs = [docs[rng.randrange(n)] for _ in range(queries)]
+    query_sigs = hasher.signatures(query_docs)
+
+    lsh_ms, scan_ms, legacy_ms, candidates, recall = [], [], [], [], []
+    for i, query in enumerate(query_sigs):
+        started = time.perf_counter()
+        cand = lsh.candidates(query)
+        scores = estimated_jaccard(query, signatures[cand])
+        top_lsh = cand[np.argsort(-scores, kind='stable')[:top_k]]
+        lsh_ms.append((time.perf_counter() - started) * 1000)
+        candidates.append(len(cand))
+
+        started = time.perf_counter()
+        scores = estimated_jaccard(query, signatures)
+        top_scan = np.argsort(-scores, kind='stable')[:top_k]
+        scan_ms.append((time.perf_counter() - started) * 1000)
+        recall.append(len(set(top_lsh.tolist()) & set(top_scan.tolist())) / top_k)
+
+        if n <= legacy_max:
+            started = time.perf_counter()
+            legacy_rank(query_docs[i], docs)
+            legacy_ms.append((time.perf_counter() - started) * 1000)
+
+    result.update({
+        'lsh_query_ms_p50': round(percentile(lsh_ms, 50), 3),
+        'lsh_query_ms_p95': round(percentile(lsh_ms, 95), 3),
+        'lsh_candidates_avg': round(sum(candidates) / len(candidates), 1),
+        'lsh_recall_at_10_vs_scan': round(sum(recall) / len(recall), 3),
+        'vectorized_scan_ms_p50': round(percentile(scan_ms, 50), 3),
+        'legacy_python_ms_p50': round(percentile(legacy_ms, 50), 3) if legacy_ms else None,
+        'signature_matrix_mb': round(signatures.nbytes / 1e6, 1),
+    })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,100000,1000000', help='comma-separated corpus sizes')
+    parser.add_argument('--queries', type=int, default=20, help='queries per corpus size')
+    parser.add_argument('--legacy-max', type=int, default=100000, help='largest corpus for the legacy loop')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for n in [int(s) for s in args.sizes.split(',')]:
+        if not args.json:
+            print(f"⏱️  corpus {n:,} ...")
+        results.append(bench_size(n, args.queries, args.legacy_max))
+        if not args.json:
+            for key, value in results[-1].items():
+                print(f"   {key:<28} {value}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmark: vector index IVF top-k vs. exact cosine scan
+
+For each corpus size, generates synthetic incident texts (clusters of
+reworded variants of the same failure), builds a VectorIndex in a temporary
+directory and measures build time (embedding plus k-means training), query
+latency of the inverted-list (IVF) path and of the exact scan over the
+memory-mapped matrix, and recall@k of IVF against the exact scan. Queries
+are fresh rewordings of indexed incidents, as a new ticket would be. A hit
+counts towards recall when it scores at least as high as the exact k-th
+neighbour, so ties do not count as misses.
+
+    python scripts/bench_vector_index.py
+    python scripts/bench_vector_index.py --sizes 10000,100000 --queries 200 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ciia.timing import percentile
+from ciia.vector_index import VectorIndex, embedding_text
+
+
+VOCAB_SIZE = 5000
+WORDS_PER_TEXT = (6, 30)
+
+
+def _word(rng):
+    return ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(3, 10)))
+
+
+def reword(words, rng, vocab):
+    """Swap ~20% of the words and misspell a few, like two people describing the same failure"""
+    words = list(words)
+    for _ in range(max(1, len(words) // 5)):
+        words[rng.randrange(len(words))] = rng.choice(vocab)
+    for _ in range(rng.randint(0, 2)):
+        i = rng.randrange(len(words))
+        word = words[i]
+        if len(word) > 3:
+            j = rng.randrange(len(word) - 1)
+            words[i] = word[:j] + word[j + 1] + word[j] + word[j + 2:]
+    return words
+
+
+def synthetic_incidents(n, queries, seed=42):
+    """(n resolved records, `queries` query records reworded from random ones)"""
+    rng = random.Random(seed)
+    vocab = [_word(rng) for _ in range(VOCAB_SIZE)]
+    templates = [[rng.choice(vocab) for _ in range(rng.randint(*WORDS_PER_TEXT))] for _ in range(max(1, n // 20))]
+
+    def record(i, words):
+        split = min(len(words), 8)
+        return {'sys_id': f"{i:032x}", 'state': '7', 'number': f"INC{i:07d}",
+                'short_description': ' '.join(words[:split]), 'description': ' '.join(words[split:])}
+
+    template_of = [rng.randrange(len(templates)) for _ in range(n)]
+    records = [record(i, reword(templates[t], rng, vocab)) for i, t in enumerate(template_of)]
+    asked = [record(n + q, reword(templates[template_of[rng.randrange(n)]], rng, vocab)) for q in range(queries)]
+    return records, asked
+
+
+def bench_size(n, queries, top_k=10):
+    records, asked = synthetic_incidents(n, queries)
+    result = {'corpus': n}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # exact_below=0 so every size goes through the lists; exact=True forces the scan
+        index = VectorIndex(os.path.join(tmp, 'vectors.db'), exact_below=0)
+
+        started = time.perf_counter()
+        index.build(records, source='bench')
+        result['build_s'] = round(time.perf_counter() - started, 3)
+        result['build_records_per_s'] = round(n / result['build_s'], 1)
+
+        started = time.perf_counter()
+        index.nearest(index.encoder.encode('warm up'), top_k)
+        result['lists_load_s'] = round(time.perf_counter() - started, 3)
+
+        ivf_ms, exact_ms, recall = [], [], []
+        for record in asked:
+            query = index.encoder.encode(embedding_text(record))
+
+            started = time.perf_counter()
+            rows, _ = index.nearest(query, top_k)
+            ivf_ms.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            exact_rows, exact_scores = index.nearest(query, top_k, exact=True)
+            exact_ms.append((time.perf_counter() - started) * 1000)
+
+            matrix = index._load()[0]
+            kth = exact_scores[-1] - 1e-6
+            found = sum(1 for row in rows if float(matrix[row] @ query) >= kth)
+            recall.append(found / len(exact_rows))
+
+        started = time.perf_counter()
+        added, _ = index.add(asked)
+        result['add_per_record_ms'] = round((time.perf_counter() - started) * 1000 / max(1, added), 3)
+
+        result.update({
+            'lists': len(index._load()[1].centroids),
+            'ivf_query_ms_p50': round(percentile(ivf_ms, 50), 3),
+            'ivf_query_ms_p95': round(percentile(ivf_ms, 95), 3),
+            'exact_query_ms_p50': round(percentile(exact_ms, 50), 3),
+            'exact_query_ms_p95': round(percentile(exact_ms, 95), 3),
+            f'ivf_recall_at_{top_k}': round(sum(recall) / len(recall), 3),
+            'matrix_mb': round(os.path.getsize(index.matrix_path) / 1e6, 1),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000', help='comma-separated corpus sizes')
+    parser.add_argument('--queries', type=int, default=100, help='queries per corpus size')
+    parser.add_argument('--top-k', type=int, default=10, help='neighbours per query')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    results = []
+    for n in [int(s) for s in args.sizes.split(',')]:
+        if not args.json:
+            print(f"⏱️  corpus {n:,} ...")
+        results.append(bench_size(n, args.queries, args.top_k))
+        if not args.json:
+            for key, value in results[-1].items():
+                print(f"   {key:<28} {value}")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
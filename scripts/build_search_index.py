@@ -0,0 +1,61 @@
+"""
+Build the local full-text index of resolved/closed incidents
+
+    python scripts/build_search_index.py incidents.db                     # export from SNOW_INSTANCE
+    python scripts/build_search_index.py incidents.db --from-json export.json
+
+--from-json accepts a ServiceNow JSON export ({"records": [...]}) or a Table API
+response ({"result": [...]}). Point CIIA_SEARCH_INDEX at the resulting file to
+make the enrichment function use it for keyword search.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ciia.fields import fields_for
+from ciia.search_index import IncidentSearchIndex
+
+
+def load_export(path):
+    """Records from a JSON export file, trimmed to the indexed fields"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = data.get('records', data.get('result', []))
+
+    fields = fields_for('index_record')
+    for record in data:
+        yield {field: record.get(field, '') for field in fields}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('index_path', help='SQLite file to (re)build')
+    parser.add_argument('--from-json', help='build from a JSON export instead of the live instance')
+    parser.add_argument('--page-size', type=int, default=500, help='records per Table API page')
+    args = parser.parse_args()
+
+    if args.from_json:
+        records = load_export(args.from_json)
+        source = f"json:{os.path.basename(args.from_json)}"
+    else:
+        from snow_incident_operations import ServiceNowAPI
+        records = ServiceNowAPI().export_incidents(page_size=args.page_size)
+        source = 'servicenow'
+
+    started = time.monotonic()
+    print(f"📚 Building search index at {args.index_path} ...")
+    count = IncidentSearchIndex(args.index_path).build(records, source=source)
+    elapsed = time.monotonic() - started
+
+    print(f"✅ Indexed {count} resolved incidents in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Build or extend the local vector index of resolved/closed incidents
+
+    python scripts/build_vector_index.py vectors.db                          # export from SNOW_INSTANCE
+    python scripts/build_vector_index.py vectors.db --from-json export.json
+    python scripts/build_vector_index.py vectors.db --from-store incidents.db
+    python scripts/build_vector_index.py vectors.db --add --from-json new.json
+
+Embeds every incident with the hashed character n-gram encoder in
+ciia/vector_index.py (CPU only, nothing to download) and writes
+vectors.db (records) plus one vectors.db.<build>.f32 per build (the
+memory-mapped matrix named in vectors.db). A full build is swapped in
+atomically; --add appends new incidents and re-embeds
+updated ones in place. Point CIIA_VECTOR_INDEX at the file to add the
+`vector` strategy to the similar-incident search.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ciia.fields import fields_for
+from ciia.vector_index import VectorIndex
+
+
+def load_export(path):
+    """Records from a JSON export file, trimmed to the indexed fields"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        data = data.get('records', data.get('result', []))
+
+    fields = fields_for('index_record')
+    for record in data:
+        yield {field: record.get(field, '') for field in fields}
+
+
+def load_store(path):
+    """Records kept by the synced incident store (scripts/sync_incidents.py)"""
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for (record,) in conn.execute("SELECT record FROM incident_docs ORDER BY rowid"):
+            yield json.loads(record)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('index_path', help='SQLite file of the index (the matrix goes next to it as .<build>.f32)')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--from-json', help='read a JSON export instead of the live instance')
+    source.add_argument('--from-store', help='read an incident store file instead of the live instance')
+    parser.add_argument('--add', action='store_true', help='add/update incidents instead of rebuilding')
+    parser.add_argument('--query', default='state=6^ORstate=7', help='encoded query for the live export')
+    parser.add_argument('--page-size', type=int, default=500, help='records per Table API page')
+    args = parser.parse_args()
+
+    if args.from_json:
+        records = load_export(args.from_json)
+        source = f"json:{os.path.basename(args.from_json)}"
+    elif args.from_store:
+        records = load_store(args.from_store)
+        source = f"store:{os.path.basename(args.from_store)}"
+    else:
+        from snow_incident_operations import ServiceNowAPI
+        records = ServiceNowAPI().export_incidents(query=args.query, page_size=args.page_size)
+        source = 'servicenow'
+
+    index = VectorIndex(args.index_path)
+    started = time.monotonic()
+    if args.add:
+        print(f"🧮 Adding to vector index at {args.index_path} ...")
+        added, updated = index.add(records)
+        print(f"✅ {added} incidents added, {updated} re-embedded in {time.monotonic() - started:.1f}s "
+              f"({index.count()} searchable)")
+    else:
+        print(f"🧮 Building vector index at {args.index_path} ...")
+        count = index.build(records, source=source)
+        print(f"✅ Embedded {count} resolved incidents in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
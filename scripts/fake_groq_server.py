@@ -0,0 +1,208 @@
+"""
+Local stand-in for the Groq chat completions API
+
+Serves POST /openai/v1/chat/completions with an OpenAI-compatible body (or a
+server-sent event stream for "stream": true), a configurable time to first
+token and generation speed, and Groq-style rate limiting: requests per minute and
+tokens per minute are enforced over a sliding 60 s window, every response
+carries x-ratelimit-* headers, and over-budget calls get 429 + retry-after.
+
+    python scripts/fake_groq_server.py --port 8081 --rpm 30 --tpm 6000 --latency 1.5
+    python scripts/fake_groq_server.py --latency 0.4 --tokens-per-s 250   # realistic streaming
+    GROQ_BASE_URL=http://127.0.0.1:8081 python scripts/serve_local.py
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGroqState:
+    """Sliding-window request/token accounting shared by all handler threads"""
+
+    def __init__(self, rpm, tpm, latency, completion_tokens, tokens_per_s=0.0):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.latency = latency
+        self.completion_tokens = completion_tokens
+        self.tokens_per_s = tokens_per_s
+        self.window = deque()   # (timestamp, tokens)
+        self.lock = threading.Lock()
+        self.served = 0
+        self.throttled = 0
+
+    def _trim(self, now):
+        while self.window and now - self.window[0][0] >= 60:
+            self.window.popleft()
+
+    def admit(self, tokens):
+        """(admitted, headers)"""
+
+        with self.lock:
+            now = time.time()
+            self._trim(now)
+            used_requests = len(self.window)
+            used_tokens = sum(t for _, t in self.window)
+            admitted = used_requests < self.rpm and used_tokens + tokens <= self.tpm
+            if admitted:
+                self.window.append((now, tokens))
+                used_requests += 1
+                used_tokens += tokens
+                self.served += 1
+            else:
+                self.throttled += 1
+            # Time until the oldest entry leaves the window
+            reset = 60 - (now - self.window[0][0]) if self.window else 0.0
+            headers = {
+                'x-ratelimit-limit-requests': str(self.rpm),
+                'x-ratelimit-remaining-requests': str(max(0, self.rpm - used_requests)),
+                'x-ratelimit-reset-requests': f"{reset:.2f}s",
+                'x-ratelimit-limit-tokens': str(self.tpm),
+                'x-ratelimit-remaining-tokens': str(max(0, self.tpm - used_tokens)),
+                'x-ratelimit-reset-tokens': f"{reset:.2f}s",
+            }
+            if not admitted:
+                headers['retry-after'] = str(max(1, int(reset + 0.999)))
+            return admitted, headers
+
+
+ANALYSIS_WORDS = ("**1. Severity Validation** Priority looks appropriate for the reported impact. "
+                  "**2. Root Cause Hypotheses** - Connection pool exhaustion on the database tier. "
+                  "- Recent configuration change. **3. Recommended Actions** Restart the pool, "
+                  "review the change log, monitor error rates. ").split(' ')
+
+
+def fake_tokens(count):
+    """`count` word tokens of a plausible analysis"""
+    return [ANALYSIS_WORDS[i % len(ANALYSIS_WORDS)] + ' ' for i in range(count)]
+
+
+def make_handler(state):
+    class FakeGroqHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, code, payload, headers):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            request = json.loads(self.rfile.read(length) or b'{}')
+            if not self.path.endswith('/chat/completions'):
+                self._send(404, {'error': {'message': 'not found'}}, {})
+                return
+
+            prompt = ''.join(m.get('content') or '' for m in request.get('messages', []))
+            prompt_tokens = len(prompt) // 4 + 1
+            completion_tokens = min(request.get('max_tokens') or state.completion_tokens, state.completion_tokens)
+            admitted, headers = state.admit(prompt_tokens + completion_tokens)
+            if not admitted:
+                self._send(429, {'error': {'message': 'Rate limit reached', 'type': 'tokens',
+                                           'code': 'rate_limit_exceeded'}}, headers)
+                return
+
+            usage = {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+                     'total_tokens': prompt_tokens + completion_tokens}
+            tokens = fake_tokens(completion_tokens)
+            delay = 1.0 / state.tokens_per_s if state.tokens_per_s > 0 else 0.0
+            time.sleep(state.latency)
+
+            if request.get('stream'):
+                self._stream(request, tokens, delay, usage, headers)
+                return
+
+            time.sleep(delay * len(tokens))
+            self._send(200, {
+                'id': f"chatcmpl-{uuid.uuid4().hex}",
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': request.get('model', 'fake'),
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ''.join(tokens)}}],
+                'usage': usage,
+            }, headers)
+
+        def _stream(self, request, tokens, delay, usage, headers):
+            """Server-sent events, one chunk per token, usage in x_groq on the last one"""
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+
+            base = {'id': f"chatcmpl-{uuid.uuid4().hex}", 'object': 'chat.completion.chunk',
+                    'created': int(time.time()), 'model': request.get('model', 'fake')}
+
+            def event(payload):
+                data = f"data: {payload}\n\n".encode()
+                self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+            for i, token in enumerate(tokens):
+                delta = {'content': token} if i else {'role': 'assistant', 'content': token}
+                event(json.dumps(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}])))
+                if delay:
+                    time.sleep(delay)
+            event(json.dumps(dict(base, choices=[{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+                                  x_groq={'id': base['id'], 'usage': usage})))
+            event('[DONE]')
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def do_GET(self):
+            with state.lock:
+                self._send(200, {'served': state.served, 'throttled': state.throttled}, {})
+
+    return FakeGroqHandler
+
+
+def serve(host='127.0.0.1', port=8081, rpm=30, tpm=6000, latency=1.0, completion_tokens=400, tokens_per_s=0.0):
+    """Start the server on a daemon thread; returns (server, state)"""
+
+    state = FakeGroqState(rpm, tpm, latency, completion_tokens, tokens_per_s)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--rpm', type=int, default=30, help='requests per minute before 429')
+    parser.add_argument('--tpm', type=int, default=6000, help='tokens per minute before 429')
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds to the first token')
+    parser.add_argument('--completion-tokens', type=int, default=400, help='tokens per completion')
+    parser.add_argument('--tokens-per-s', type=float, default=0.0,
+                        help='generation speed after the first token (0 = instant)')
+    args = parser.parse_args()
+
+    server, state = serve(args.host, args.port, args.rpm, args.tpm, args.latency, args.completion_tokens,
+                          args.tokens_per_s)
+    print(f"🤖 Fake Groq on http://{args.host}:{server.server_port} "
+          f"({args.rpm} RPM, {args.tpm} TPM, {args.latency}s latency)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n👋 Served {state.served}, throttled {state.throttled}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Local stand-in for the ServiceNow Table API
+
+Serves /api/now/table/incident from an in-memory table seeded with a
+synthetic corpus (scripts/synthetic_incidents.py): list queries with the
+encoded-query subset the function and scripts use (=, !=, LIKE, NOTLIKE,
+STARTSWITH, IN, NOTIN, <, <=, >, >=, ^OR, ^NQ, ORDERBY / ORDERBYDESC),
+sysparm_fields / sysparm_limit / sysparm_offset and X-Total-Count, single
+record GET / PATCH / PUT, POST to create, and the Batch API
+(/api/now/v1/batch). Every request waits a configurable latency (plus
+jitter) before answering; --record-cost adds server time per written record.
+
+    python scripts/fake_servicenow_server.py --port 8082 --incidents 5000 --latency 0.15
+    SNOW_INSTANCE=http://127.0.0.1:8082 python scripts/serve_local.py
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.synthetic_incidents import incident_corpus, sys_id as make_sys_id
+
+
+BATCH_PATH = re.compile(r'^/api/now(?:/v\d+)?/batch/?$')
+TABLE_PATH = re.compile(r'^/api/now(?:/v\d+)?/table/(?P<table>\w+)(?:/(?P<sys_id>\w+))?/?$')
+
+# Longest operators first so '!=' is not read as '='
+_OPERATORS = ('NOTLIKE', 'STARTSWITH', 'ENDSWITH', 'NOTIN', 'LIKE', 'IN', '!=', '>=', '<=', '=', '>', '<')
+_TERM = re.compile(r'^(?P<field>[\w.]+?)(?P<op>' + '|'.join(re.escape(op) for op in _OPERATORS) + r')(?P<value>.*)$')
+
+
+def _term(text):
+    """Predicate for one encoded-query condition"""
+
+    match = _TERM.match(text)
+    if not match:
+        raise ValueError(f"Unsupported query term: {text}")
+    field, op, value = match.group('field'), match.group('op'), match.group('value')
+    lowered = value.lower()
+    values = set(value.split(','))
+
+    def get(record):
+        return str(record.get(field, '') or '')
+
+    return {
+        '=': lambda r: get(r) == value,
+        '!=': lambda r: get(r) != value,
+        'LIKE': lambda r: lowered in get(r).lower(),
+        'NOTLIKE': lambda r: lowered not in get(r).lower(),
+        'STARTSWITH': lambda r: get(r).lower().startswith(lowered),
+        'ENDSWITH': lambda r: get(r).lower().endswith(lowered),
+        'IN': lambda r: get(r) in values,
+        'NOTIN': lambda r: get(r) not in values,
+        '>': lambda r: get(r) > value,
+        '>=': lambda r: get(r) >= value,
+        '<': lambda r: get(r) < value,
+        '<=': lambda r: get(r) <= value,
+    }[op]
+
+
+def parse_query(query):
+    """(predicate, [(field, descending)]) for an encoded query
+
+    `^` is AND, a term prefixed with `OR` is OR-ed with the term before it,
+    and `^NQ` separates whole OR-ed queries.
+    """
+
+    order = []
+    alternatives = []
+    for part in (query or '').split('^NQ'):
+        groups = []     # AND of OR-groups
+        for text in part.split('^'):
+            if not text:
+                continue
+            if text.startswith('ORDERBYDESC'):
+                order.append((text[len('ORDERBYDESC'):], True))
+            elif text.startswith('ORDERBY'):
+                order.append((text[len('ORDERBY'):], False))
+            elif text.startswith('OR') and groups:
+                # Field names are lower case, so an upper-case OR prefix is unambiguous
+                groups[-1].append(_term(text[2:]))
+            else:
+                groups.append([_term(text)])
+        alternatives.append(groups)
+
+    def predicate(record):
+        return any(all(any(term(record) for term in group) for group in groups) for groups in alternatives)
+
+    return predicate, order
+
+
+class FakeTableState:
+    """In-memory incident table shared by all handler threads"""
+
+    def __init__(self, records, latency=0.1, jitter=0.0, seed=1, record_cost=0.0):
+        self.records = {r['sys_id']: r for r in records}
+        self.latency = latency
+        self.jitter = jitter
+        self.record_cost = record_cost
+        self.lock = threading.Lock()
+        self.rng = random.Random(seed)
+        self.counters = {'requests': 0, 'batch': 0, 'list': 0, 'get': 0, 'create': 0, 'update': 0, 'errors': 0}
+        self.next_number = len(records)
+
+    def wait(self):
+        with self.lock:
+            delay = self.latency + (self.rng.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def work(self):
+        """Server-side cost of writing one record (also paid inside batches)"""
+        if self.record_cost > 0:
+            time.sleep(self.record_cost)
+
+    def error(self, code, message):
+        with self.lock:
+            self.counters['errors'] += 1
+        return code, {'error': {'message': message, 'detail': ''}, 'status': 'failure'}, {}
+
+    def count(self, kind):
+        with self.lock:
+            self.counters['requests'] += 1
+            self.counters[kind] += 1
+
+    def query(self, query, limit, offset, fields):
+        """(page, total matching)"""
+
+        predicate, order = parse_query(query)
+        with self.lock:
+            matched = [r for r in self.records.values() if predicate(r)]
+        for field, descending in reversed(order):
+            matched.sort(key=lambda r: str(r.get(field, '')), reverse=descending)
+        page = matched[offset:offset + limit] if limit else matched[offset:]
+        return [project(r, fields) for r in page], len(matched)
+
+    def create(self, values):
+        with self.lock:
+            i = self.next_number
+            self.next_number += 1
+            now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            record = {'sys_id': make_sys_id(i, prefix=1), 'number': f"INC{i + 1:07d}", 'state': '1',
+                      'close_notes': '', 'work_notes': '', 'sys_created_on': now, 'sys_updated_on': now}
+            record.update({k: '' if v is None else str(v) for k, v in values.items()})
+            self.records[record['sys_id']] = record
+            return dict(record)
+
+    def update(self, sys_id, values):
+        with self.lock:
+            record = self.records.get(sys_id)
+            if record is None:
+                return None
+            for key, value in values.items():
+                value = '' if value is None else str(value)
+                if key in ('work_notes', 'comments') and value:
+                    # Journal fields append, newest entry first
+                    stamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+                    entry = f"{stamp} - CIIA (Work notes)\n{value}\n"
+                    record[key] = entry + ('\n' + record[key] if record.get(key) else '')
+                else:
+                    record[key] = value
+            record['sys_updated_on'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            return dict(record)
+
+
+def project(record, fields):
+    if not fields:
+        return dict(record)
+    return {field: record.get(field, '') for field in fields}
+
+
+def dispatch(state, method, path, body=None):
+    """(status, payload, headers) for one Table API request; shared by the
+    HTTP handler and the Batch API"""
+
+    url = urlparse(path)
+    match = TABLE_PATH.match(url.path)
+    if not match or match.group('table') != 'incident':
+        return state.error(400, 'Invalid table')
+    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+    fields = [f for f in params.get('sysparm_fields', '').split(',') if f]
+    record_id = match.group('sys_id')
+
+    if method == 'GET' and record_id:
+        state.count('get')
+        with state.lock:
+            record = state.records.get(record_id)
+        if record is None:
+            return state.error(404, 'No Record found')
+        return 200, {'result': project(record, fields)}, {}
+
+    if method == 'GET':
+        state.count('list')
+        try:
+            limit = int(params.get('sysparm_limit', 10000))
+            offset = int(params.get('sysparm_offset', 0))
+            page, total = state.query(params.get('sysparm_query'), limit, offset, fields)
+        except ValueError as e:
+            return state.error(400, str(e))
+        return 200, {'result': page}, {'X-Total-Count': str(total)}
+
+    if method == 'POST' and not record_id:
+        state.count('create')
+        state.work()
+        return 201, {'result': project(state.create(body or {}), fields)}, {}
+
+    if method in ('PATCH', 'PUT') and record_id:
+        state.count('update')
+        state.work()
+        record = state.update(record_id, body or {})
+        if record is None:
+            return state.error(404, 'No Record found')
+        return 200, {'result': project(record, fields)}, {}
+
+    return state.error(405, f"{method} not supported on {url.path}")
+
+
+def run_batch(state, request):
+    """Batch API (/api/now/v1/batch): run each base64-encoded sub-request in order"""
+
+    serviced = []
+    for sub in request.get('rest_requests', []):
+        started = time.monotonic()
+        body = json.loads(base64.b64decode(sub['body'])) if sub.get('body') else None
+        code, payload, headers = dispatch(state, sub.get('method', 'GET').upper(), sub['url'], body)
+        serviced.append({
+            'id': sub.get('id'),
+            'status_code': code,
+            'status_text': 'OK' if code < 400 else 'Error',
+            'headers': [{'name': 'Content-Type', 'value': 'application/json'}] +
+                       [{'name': k, 'value': v} for k, v in headers.items()],
+            'body': base64.b64encode(json.dumps(payload).encode()).decode(),
+            'execution_time': round((time.monotonic() - started) * 1000),
+        })
+    return {'batch_request_id': request.get('batch_request_id'), 'serviced_requests': serviced,
+            'unserviced_requests': []}
+
+
+def make_handler(state):
+    class FakeServiceNowHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, code, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def _handle(self, method):
+            body = self._body() if method != 'GET' else None
+            if method == 'GET' and urlparse(self.path).path == '/stats':
+                with state.lock:
+                    self._send(200, dict(state.counters, records=len(state.records)))
+                return
+            state.wait()
+            if method == 'POST' and BATCH_PATH.match(urlparse(self.path).path):
+                state.count('batch')
+                self._send(200, run_batch(state, body))
+                return
+            self._send(*dispatch(state, method, self.path, body))
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def do_PATCH(self):
+            self._handle('PATCH')
+
+        def do_PUT(self):
+            self._handle('PUT')
+
+    return FakeServiceNowHandler
+
+
+def serve(host='127.0.0.1', port=8082, incidents=5000, latency=0.1, jitter=0.0, open_ratio=0.1, seed=42,
+          records=None, record_cost=0.0):
+    """Start the server on a daemon thread; returns (server, state)"""
+
+    if records is None:
+        records = incident_corpus(incidents, open_ratio=open_ratio, seed=seed)
+    state = FakeTableState(records, latency, jitter, record_cost=record_cost)
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8082)
+    parser.add_argument('--incidents', type=int, default=5000, help='synthetic incidents to seed')
+    parser.add_argument('--open-ratio', type=float, default=0.1, help='share of seeded incidents still open')
+    parser.add_argument('--latency', type=float, default=0.1, help='seconds added to every request')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra uniform random latency (seconds)')
+    parser.add_argument('--record-cost', type=float, default=0.0,
+                        help='seconds per created/updated record, also inside batches')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    server, state = serve(args.host, args.port, args.incidents, args.latency, args.jitter, args.open_ratio, args.seed,
+                          record_cost=args.record_cost)
+    print(f"🗄️  Fake ServiceNow on http://{args.host}:{server.server_port} "
+          f"({len(state.records):,} incidents, {args.latency}s latency)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"\n👋 Served {state.counters['requests']} requests")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Skip-ratio report for the enrichment fingerprint store
+
+Reads the daily counters the function keeps in the SQLite fingerprint store
+(CIIA_FINGERPRINT_PATH): how many triggers were checked, how many were
+skipped because the incident had not changed since its last enrichment, and
+how many were forced. The live instance's in-process counters are in the
+health check's `fingerprints` block.
+
+    python scripts/fingerprint_report.py fingerprints.db
+    python scripts/fingerprint_report.py --days 7 --json     # path from CIIA_FINGERPRINT_PATH
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ciia.fingerprints import FingerprintStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', nargs='?', default=os.getenv('CIIA_FINGERPRINT_PATH'),
+                        help='SQLite fingerprint store (default CIIA_FINGERPRINT_PATH)')
+    parser.add_argument('--days', type=int, default=30, help='days to report')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    if not args.path:
+        parser.error('pass the store path or set CIIA_FINGERPRINT_PATH')
+    if not os.path.exists(args.path):
+        parser.error(f'{args.path} does not exist')
+
+    store = FingerprintStore(path=args.path)
+    days = store.daily(args.days)
+    checks = sum(d['checks'] for d in days)
+    skipped = sum(d['skipped'] for d in days)
+    forced = sum(d['forced'] for d in days)
+    tracked = store.tracked()
+    result = {
+        'path': args.path,
+        'incidents_tracked': tracked,
+        'checks': checks,
+        'skipped': skipped,
+        'forced': forced,
+        'skip_ratio': round(skipped / checks, 3) if checks else None,
+        'days': days,
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"🔁 {args.path}: {tracked:,} incidents tracked")
+    print(f"   last {len(days)} days: {checks:,} triggers, {skipped:,} skipped as unchanged, {forced:,} forced "
+          f"(skip ratio {result['skip_ratio']})")
+    print(f"   {'day':<12}{'checks':>8}{'skipped':>9}{'forced':>8}{'ratio':>8}")
+    for d in days:
+        print(f"   {d['day']:<12}{d['checks']:>8}{d['skipped']:>9}{d['forced']:>8}{d['skip_ratio']:>8}")
+
+
+if __name__ == "__main__":
+    main()
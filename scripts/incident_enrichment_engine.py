@@ -4,6 +4,7 @@ import json
 from dotenv import load_dotenv
 from snow_incident_operations import ServiceNowAPI
 from datetime import datetime
+from ciia.incident_store import configured_store
 
 load_dotenv()
 
@@ -23,14 +24,21 @@ class IncidentEnrichmentEngine:
         keywords = self.extract_keywords(incident['short_description'] + ' ' + incident.get('description', ''))
         similar = self.snow.search_similar_incidents(keywords, limit=3)
         
+        # Resolutions extracted at sync time, when the local store is in use
+        store = configured_store()
+        
         context = []
         for inc in similar:
             if inc['sys_id'] != incident['sys_id']:
+                resolution = inc.get('close_notes', 'Not resolved yet')
+                stored = store.resolution_for(inc['sys_id']) if store else None
+                if stored and stored['resolution']:
+                    resolution = stored['resolution']
                 context.append({
                     'number': inc['number'],
                     'description': inc['short_description'],
                     'state': inc['state'],
-                    'resolution': inc.get('close_notes', 'Not resolved yet')
+                    'resolution': resolution
                 })
         
         return context
@@ -0,0 +1,281 @@
+"""
+Synthetic incident load generator (replaces bulk_test.py)
+
+Creates thousands of realistic incidents from the templates in
+scripts/synthetic_incidents.py: outage storms on shared CIs, descriptions
+with pasted logs and stack traces, and resolved history with close notes.
+Incidents are created at a target rate either with bounded concurrency
+against the Table API or through the ServiceNow Batch API
+(/api/now/v1/batch, --batch-size incidents per call), and the achieved
+rate and request latency are reported.
+
+    python scripts/load_incidents.py --count 2000 --concurrency 8 --rate 20
+    python scripts/load_incidents.py --count 5000 --batch-size 50 --rate 200
+    python scripts/load_incidents.py --instance http://127.0.0.1:8082 --count 1000   # fake_servicenow_server.py
+    python scripts/load_incidents.py --count 5 --dry-run                             # print the payloads
+
+The instance and credentials come from SNOW_INSTANCE / SNOW_USER /
+SNOW_PASSWORD (.env); --instance overrides the instance.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from ciia.http_pool import get_session, instance_url, table_url
+from ciia.timing import percentile
+from scripts.synthetic_incidents import generate_incidents
+
+
+# Only what the report needs back from each insert
+CREATE_FIELDS = 'sys_id,number'
+
+
+class Pacer:
+    """Spaces work items `1 / rate` seconds apart (rate 0 = unpaced)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self, items=1):
+        if not self.rate:
+            return
+        with self.lock:
+            at = self.next_at
+            self.next_at = max(at, time.monotonic()) + items / self.rate
+        delay = at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class LoadReport:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies_ms = []
+        self.created = 0
+        self.failed = 0
+        self.errors = Counter()
+        self.kinds = Counter()
+        self.created_records = []
+
+    def request(self, elapsed_ms):
+        with self.lock:
+            self.latencies_ms.append(elapsed_ms)
+
+    def outcome(self, kind, status, record=None, error=None):
+        with self.lock:
+            if record is not None:
+                self.created += 1
+                self.kinds[kind] += 1
+                self.created_records.append(dict(record, kind=kind))
+            else:
+                self.failed += 1
+                self.errors[error or f"http_{status}"] += 1
+
+
+class TableLoader:
+    """One POST per incident on `concurrency` workers"""
+
+    def __init__(self, session, instance, report):
+        self.session = session
+        self.url = table_url(instance)
+        self.report = report
+
+    def submit(self, pool, items):
+        kind, payload = items[0]
+        return pool.submit(self.create, kind, payload)
+
+    def create(self, kind, payload):
+        started = time.monotonic()
+        try:
+            response = self.session.post(self.url, params={'sysparm_fields': CREATE_FIELDS},
+                                         headers={'Content-Type': 'application/json'},
+                                         data=json.dumps(payload), timeout=60)
+        except Exception as e:
+            self.report.outcome(kind, None, error=type(e).__name__)
+            return
+        self.report.request((time.monotonic() - started) * 1000)
+        if response.status_code == 201:
+            self.report.outcome(kind, 201, response.json()['result'])
+        else:
+            self.report.outcome(kind, response.status_code)
+
+
+class BatchLoader:
+    """Many inserts per request through the Batch API"""
+
+    def __init__(self, session, instance, report):
+        self.session = session
+        self.url = f"{instance_url(instance)}/api/now/v1/batch"
+        self.report = report
+
+    def submit(self, pool, items):
+        return pool.submit(self.create_batch, items)
+
+    def create_batch(self, items):
+        rest_requests = []
+        for i, (kind, payload) in enumerate(items):
+            rest_requests.append({
+                'id': str(i),
+                'url': f"/api/now/table/incident?sysparm_fields={CREATE_FIELDS}",
+                'method': 'POST',
+                'headers': [{'name': 'Content-Type', 'value': 'application/json'},
+                            {'name': 'Accept', 'value': 'application/json'}],
+                'body': base64.b64encode(json.dumps(payload).encode()).decode(),
+            })
+
+        started = time.monotonic()
+        try:
+            response = self.session.post(self.url, headers={'Content-Type': 'application/json'},
+                                         data=json.dumps({'batch_request_id': uuid.uuid4().hex,
+                                                          'rest_requests': rest_requests}),
+                                         timeout=300)
+        except Exception as e:
+            for kind, _ in items:
+                self.report.outcome(kind, None, error=type(e).__name__)
+            return
+        self.report.request((time.monotonic() - started) * 1000)
+
+        if response.status_code != 200:
+            for kind, _ in items:
+                self.report.outcome(kind, response.status_code)
+            return
+
+        serviced = {r['id']: r for r in response.json().get('serviced_requests', [])}
+        for i, (kind, _) in enumerate(items):
+            sub = serviced.get(str(i))
+            if sub is None:
+                self.report.outcome(kind, None, error='unserviced')
+            elif sub['status_code'] == 201:
+                self.report.outcome(kind, 201, json.loads(base64.b64decode(sub['body']))['result'])
+            else:
+                self.report.outcome(kind, sub['status_code'])
+
+
+def run(loader, incidents, batch_size, concurrency, rate):
+    """Feed the loader at `rate` incidents/s with at most `concurrency` requests in flight"""
+
+    pacer = Pacer(rate)
+    slots = threading.Semaphore(concurrency)
+    batch = []
+
+    def send(pool, items):
+        pacer.wait(len(items))
+        slots.acquire()
+        loader.submit(pool, items).add_done_callback(lambda _: slots.release())
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for item in incidents:
+            batch.append(item)
+            if len(batch) >= batch_size:
+                send(pool, batch)
+                batch = []
+        if batch:
+            send(pool, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000, help='incidents to create')
+    parser.add_argument('--rate', type=float, default=10.0, help='target incidents per second (0 = as fast as possible)')
+    parser.add_argument('--concurrency', type=int, default=8, help='requests in flight')
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help='incidents per Batch API call (1 = one Table API POST each)')
+    mix = parser.add_argument_group('incident mix')
+    mix.add_argument('--storm-share', type=float, default=0.2, help='share of incidents in outage storms')
+    mix.add_argument('--storm-size', default='5,30', help='min,max incidents per storm')
+    mix.add_argument('--log-share', type=float, default=0.3, help='share of descriptions with a pasted log')
+    mix.add_argument('--log-lines', type=int, default=200, help='lines per pasted log')
+    mix.add_argument('--resolved-share', type=float, default=0.5,
+                     help='share of non-storm incidents created as resolved history')
+    mix.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--instance', help='ServiceNow instance or URL (default SNOW_INSTANCE)')
+    parser.add_argument('--output', help='write created incidents (sys_id, number, kind) as JSON lines')
+    parser.add_argument('--dry-run', action='store_true', help='print the generated payloads instead of creating them')
+    parser.add_argument('--json', action='store_true', help='print machine-readable results')
+    args = parser.parse_args()
+
+    storm_size = tuple(int(n) for n in args.storm_size.split(','))
+    incidents = generate_incidents(args.count, args.storm_share, storm_size, args.log_share, args.log_lines,
+                                   args.resolved_share, args.seed)
+
+    if args.dry_run:
+        for kind, payload in incidents:
+            print(json.dumps(dict(payload, _kind=kind)))
+        return
+
+    instance = args.instance or os.getenv('SNOW_INSTANCE')
+    user, password = os.getenv('SNOW_USER'), os.getenv('SNOW_PASSWORD')
+    if not instance:
+        parser.error('set SNOW_INSTANCE or pass --instance')
+    # One pooled connection per in-flight request
+    os.environ.setdefault('SNOW_POOL_MAXSIZE', str(max(10, args.concurrency)))
+    session = get_session(instance, user or '', password or '')
+
+    report = LoadReport()
+    loader = (BatchLoader if args.batch_size > 1 else TableLoader)(session, instance, report)
+    if not args.json:
+        via = f"Batch API x{args.batch_size}" if args.batch_size > 1 else 'Table API'
+        print(f"🚚 Creating {args.count:,} incidents on {instance_url(instance)} via {via} "
+              f"(target {args.rate or 'max'}/s, {args.concurrency} in flight)")
+
+    started = time.monotonic()
+    run(loader, incidents, max(1, args.batch_size), max(1, args.concurrency), args.rate)
+    elapsed = time.monotonic() - started
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            for record in report.created_records:
+                f.write(json.dumps(record) + '\n')
+
+    latencies = report.latencies_ms
+    result = {
+        'created': report.created,
+        'failed': report.failed,
+        'errors': dict(report.errors),
+        'kinds': dict(report.kinds),
+        'elapsed_s': round(elapsed, 2),
+        'target_rate': args.rate or None,
+        'achieved_rate': round(report.created / elapsed, 2) if elapsed else None,
+        'requests': len(latencies),
+        'request_latency_ms': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(max(latencies), 1),
+        } if latencies else None,
+        'batch_size': args.batch_size,
+        'concurrency': args.concurrency,
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    latency = result['request_latency_ms'] or {}
+    print(f"   created          {result['created']:,} ({', '.join(f'{k} {v}' for k, v in result['kinds'].items())})")
+    print(f"   failed           {result['failed']:,}" + (f" {result['errors']}" if result['errors'] else ''))
+    print(f"   achieved rate    {result['achieved_rate']}/s over {result['elapsed_s']}s (target {args.rate or 'max'}/s)")
+    print(f"   request latency  p50 {latency.get('p50')}ms  p95 {latency.get('p95')}ms  p99 {latency.get('p99')}ms "
+          f"over {result['requests']} requests")
+    if args.output:
+        print(f"   wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
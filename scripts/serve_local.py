@@ -0,0 +1,56 @@
+"""
+Serve the enrichment function locally (multi-threaded, long-lived process)
+
+    python scripts/serve_local.py                      # http://127.0.0.1:8000/api/enrich
+    python scripts/serve_local.py --async --workers 4  # POST answers 202, workers do the PATCH
+    python scripts/serve_local.py --queue jobs.db      # durable SQLite job queue
+
+Unlike a serverless invocation, the process stays up, so async-mode workers
+keep draining the queue after the 202 response has been sent.
+"""
+
+import argparse
+import os
+import sys
+from http.server import ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--async', dest='async_mode', action='store_true',
+                        help='enqueue by default (CIIA_ENRICH_MODE=async)')
+    parser.add_argument('--workers', type=int, help='job worker threads (CIIA_JOB_WORKERS)')
+    parser.add_argument('--queue', help='SQLite job queue file (CIIA_JOB_QUEUE_PATH); default in-process')
+    args = parser.parse_args()
+
+    if args.async_mode:
+        os.environ['CIIA_ENRICH_MODE'] = 'async'
+    if args.workers:
+        os.environ['CIIA_JOB_WORKERS'] = str(args.workers)
+    if args.queue:
+        os.environ['CIIA_JOB_QUEUE_PATH'] = args.queue
+
+    # Imported after the environment is set up
+    from api.enrich import handler
+
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    print(f"🚀 CIIA enrichment on http://{args.host}:{args.port}/api/enrich "
+          f"({os.environ.get('CIIA_ENRICH_MODE', 'sync')} mode)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopping")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,89 @@
-import requests
-from requests.auth import HTTPBasicAuth
 import os
+import sys
 import json
 from dotenv import load_dotenv
 from datetime import datetime
 
+# Add parent directory to path for the shared ciia package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from ciia.http_pool import get_session, table_url
+from ciia.fields import table_params
+from ciia.search_index import configured_index
+from ciia.incident_store import configured_store
+
 load_dotenv()
 
 SNOW_INSTANCE = os.getenv('SNOW_INSTANCE')
 SNOW_USER = os.getenv('SNOW_USER')
 SNOW_PASSWORD = os.getenv('SNOW_PASSWORD')
-BASE_URL = f"https://{SNOW_INSTANCE}/api/now/table/incident"
+BASE_URL = table_url(SNOW_INSTANCE)
+
+# Incidents raised by the integration user (what the dashboard reports on)
+OWN_INCIDENTS = f"opened_by.user_name={SNOW_USER}"
 
 class ServiceNowAPI:
     def __init__(self):
-        self.auth = HTTPBasicAuth(SNOW_USER, SNOW_PASSWORD)
+        # Shared keep-alive session, reused by every call on this instance
+        self.session = get_session(SNOW_INSTANCE, SNOW_USER, SNOW_PASSWORD)
         self.headers = {
             "Accept": "application/json",
             "Content-Type": "application/json"
         }
     
-    def get_all_incidents(self, limit=20):
-        response = requests.get(
+    def get_all_incidents(self, limit=20, projection='incident_list'):
+        """Fetch recent incidents (projection=None returns every field)"""
+        response = self.session.get(
             BASE_URL,
-            auth=self.auth,
             headers=self.headers,
-            params={
-                "sysparm_query": f"opened_by.user_name={SNOW_USER}^ORDERBYDESCsys_created_on",
-                "sysparm_limit": limit
-            }
+            params=table_params(
+                projection,
+                sysparm_query=f"{OWN_INCIDENTS}^ORDERBYDESCsys_created_on",
+                sysparm_limit=limit
+            )
         )
 
         if response.status_code == 200:
             return response.json()['result']
         return []
     
-    def get_incident_by_number(self, inc_number):
+    def get_incident_page(self, query, offset, limit, projection='incident_list'):
+        """(records, X-Total-Count) for one sysparm_offset page of query"""
+        response = self.session.get(
+            BASE_URL,
+            headers=self.headers,
+            params=table_params(
+                projection,
+                sysparm_query=query,
+                sysparm_limit=limit,
+                sysparm_offset=offset
+            ),
+            timeout=60
+        )
+        
+        if response.status_code != 200:
+            raise Exception(f"Page at offset {offset} failed: HTTP {response.status_code} - {response.text}")
+        total = response.headers.get('X-Total-Count')
+        return response.json()['result'], int(total) if total is not None else None
+    
+    def get_incident_work_notes(self, sys_id):
+        """Work-notes journal of one incident (kept out of the list projections)"""
+        response = self.session.get(
+            f"{BASE_URL}/{sys_id}",
+            headers=self.headers,
+            params=table_params('incident_notes'),
+            timeout=30
+        )
+        
+        if response.status_code == 200:
+            return response.json()['result'].get('work_notes', '')
+        return ''
+    
+    def get_incident_by_number(self, inc_number, projection='incident_detail'):
         """Fetch specific incident by number (e.g., INC0010001)"""
-        response = requests.get(
+        response = self.session.get(
             BASE_URL,
-            auth=self.auth,
             headers=self.headers,
-            params={"sysparm_query": f"number={inc_number}"}
+            params=table_params(projection, sysparm_query=f"number={inc_number}")
         )
         
         if response.status_code == 200:
@@ -53,33 +95,63 @@ class ServiceNowAPI:
         """Add work notes to an incident"""
         payload = {"work_notes": work_notes}
         
-        response = requests.patch(
+        response = self.session.patch(
             f"{BASE_URL}/{sys_id}",
-            auth=self.auth,
             headers=self.headers,
             data=json.dumps(payload)
         )
         
         return response.status_code == 200
     
-    def search_similar_incidents(self, keywords, limit=5):
+    def search_similar_incidents(self, keywords, limit=5, projection='historical_context'):
         """Search for incidents with similar keywords"""
+        # Prefer the synced store (CIIA_INCIDENT_STORE) or the local full-text
+        # index (CIIA_SEARCH_INDEX) when they are fresh
+        index = configured_store() or configured_index()
+        if index is not None:
+            try:
+                return index.search(keywords.split(), limit=limit)
+            except Exception as e:
+                print(f"Local index search error, falling back to ServiceNow: {e}")
+        
         query = "^".join([f"short_descriptionLIKE{kw}^ORdescriptionLIKE{kw}" for kw in keywords.split()])
         
-        response = requests.get(
+        response = self.session.get(
             BASE_URL,
-            auth=self.auth,
             headers=self.headers,
-            params={
-                "sysparm_query": query,
-                "sysparm_limit": limit
-            }
+            params=table_params(projection, sysparm_query=query, sysparm_limit=limit)
         )
         
         if response.status_code == 200:
             return response.json()['result']
         return []
     
+    def export_incidents(self, query="state=6^ORstate=7", projection='index_record', page_size=500):
+        """Yield every incident matching query, one page at a time"""
+        offset = 0
+        while True:
+            response = self.session.get(
+                BASE_URL,
+                headers=self.headers,
+                params=table_params(
+                    projection,
+                    sysparm_query=f"{query}^ORDERBYsys_id",
+                    sysparm_limit=page_size,
+                    sysparm_offset=offset
+                ),
+                timeout=60
+            )
+            
+            if response.status_code != 200:
+                raise Exception(f"Export failed at offset {offset}: HTTP {response.status_code} - {response.text}")
+            
+            page = response.json()['result']
+            yield from page
+            
+            if len(page) < page_size:
+                return
+            offset += page_size
+    
     def create_incident(self, short_desc, description, priority=3, category="Software"):
         """Create a new test incident"""
         payload = {
@@ -90,9 +162,8 @@ class ServiceNowAPI:
             "assignment_group": ""
         }
         
-        response = requests.post(
+        response = self.session.post(
             BASE_URL,
-            auth=self.auth,
             headers=self.headers,
             data=json.dumps(payload)
         )
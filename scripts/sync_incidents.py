@@ -0,0 +1,57 @@
+"""
+Incrementally sync resolved/closed incidents into the local incident store
+
+    python scripts/sync_incidents.py incidents.db
+    python scripts/sync_incidents.py incidents.db --max-pages 10 --page-size 500
+    python scripts/sync_incidents.py incidents.db --metrics   # print sync metrics only
+
+Safe to interrupt and re-run: each page is committed together with the
+watermark. Point CIIA_INCIDENT_STORE at the file to make retrieval read from it.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from ciia.incident_store import IncidentStore
+from ciia.incident_sync import IncidentSync
+
+load_dotenv()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('store_path', help='SQLite store to create or update')
+    parser.add_argument('--page-size', type=int, default=200, help='records per Table API page')
+    parser.add_argument('--max-pages', type=int, help='stop after this many pages')
+    parser.add_argument('--metrics', action='store_true', help='print the store sync metrics and exit')
+    args = parser.parse_args()
+
+    store = IncidentStore(args.store_path)
+
+    if not args.metrics:
+        sync = IncidentSync(
+            store,
+            os.getenv('SNOW_INSTANCE'),
+            os.getenv('SNOW_USER'),
+            os.getenv('SNOW_PASSWORD'),
+            page_size=args.page_size
+        )
+
+        def progress(pages, records, watermark):
+            print(f"   page {pages}: {records} records, watermark {watermark[0]}")
+
+        print(f"🔄 Syncing resolved incidents into {args.store_path} ...")
+        run = sync.run(max_pages=args.max_pages, progress=progress)
+        print(f"✅ Synced {run['records']} records in {run['elapsed_s']}s ({run['records_per_s']} records/s)")
+
+    print(json.dumps(store.sync_metrics(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
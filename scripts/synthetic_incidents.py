@@ -0,0 +1,241 @@
+"""
+Synthetic incident corpus shaped like Table API records
+
+Incidents are drawn from a handful of failure templates (category, CI,
+short description, description, resolution), so similar-incident search,
+resolution extraction and the analysis prompt all see plausible input.
+Records use `display_value=false` shapes: every value is a string and
+references are bare sys_ids.
+
+incident_corpus() seeds scripts/fake_servicenow_server.py and the load
+benchmark; generate_incidents() produces creation payloads for
+scripts/load_incidents.py, mixing outage storms on shared CIs, descriptions
+with pasted logs and stack traces, and resolved history with close notes.
+"""
+
+import hashlib
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterator, Tuple
+
+
+TEMPLATES = [
+    {
+        'category': 'database', 'subcategory': 'db2', 'ci': 'ERP-DB-01',
+        'short': ['Database connection timeout on {ci}', 'ERP reports ORA-12170 connect timeout',
+                  'Connection pool exhausted on {ci}'],
+        'description': 'Users of the ERP application see "connection timed out" errors. '
+                       'Application servers log ORA-12170 when opening new connections to {ci}.',
+        'close_notes': 'Resolution: increased the connection pool size and restarted the listener on {ci}. '
+                       'Root cause: long-running batch job held all pooled connections.',
+    },
+    {
+        'category': 'network', 'subcategory': 'vpn', 'ci': 'VPN-GW-02',
+        'short': ['VPN users disconnected every 10 minutes', 'VPN tunnel drops on {ci}',
+                  'Remote users cannot establish VPN session'],
+        'description': 'Remote staff report VPN sessions dropping. {ci} shows IKE SA rekey failures '
+                       'and DPD timeouts in the gateway log.',
+        'close_notes': 'Resolution: aligned the IKE lifetime with the client profile and rebooted {ci}. '
+                       'Workaround: reconnect manually until the change window.',
+    },
+    {
+        'category': 'software', 'subcategory': 'email', 'ci': 'EXCH-MBX-03',
+        'short': ['Outlook cannot connect to Exchange', 'Mail delivery delayed on {ci}',
+                  'Mailbox database dismounted on {ci}'],
+        'description': 'Outlook clients show "Trying to connect". Event log on {ci} reports MSExchangeIS '
+                       '9519 and the mailbox database is dismounted.',
+        'close_notes': 'Resolution: cleared transaction logs on the full volume and remounted the database. '
+                       'Root cause: log volume ran out of disk space.',
+    },
+    {
+        'category': 'hardware', 'subcategory': 'storage', 'ci': 'SAN-ARRAY-01',
+        'short': ['Disk latency alerts on {ci}', 'Storage array controller failover',
+                  'Backup job failed with error 0x8007045D'],
+        'description': 'Monitoring raised read latency above 50 ms on {ci}. Hosts log SCSI timeouts and '
+                       'the nightly backup failed with error code 0x8007045D.',
+        'close_notes': 'Resolution: replaced the failed disk and rebalanced the RAID group on {ci}. '
+                       'Workaround: moved the backup window.',
+    },
+    {
+        'category': 'software', 'subcategory': 'web', 'ci': 'WEB-LB-01',
+        'short': ['Website certificate expired', 'HTTP 502 errors from {ci}',
+                  'Checkout page returns 500 Internal Server Error'],
+        'description': 'Customers see SSL warnings and HTTP 502 responses behind {ci}. '
+                       'Health checks on the web pool are failing.',
+        'close_notes': 'Resolution: renewed the certificate and reloaded the pool members on {ci}. '
+                       'Root cause: certificate auto-renewal job was disabled.',
+    },
+    {
+        'category': 'inquiry', 'subcategory': 'access', 'ci': 'AD-DC-01',
+        'short': ['User account locked after password reset', 'Cannot login to SSO portal',
+                  'LDAP bind failures against {ci}'],
+        'description': 'Users report accounts locking immediately after the mandatory password change. '
+                       '{ci} logs event 4740 from a mobile device with cached credentials.',
+        'close_notes': 'Resolution: unlocked the accounts and removed stale credentials from the mobile mail '
+                       'profile. Workaround: reset via self-service portal.',
+    },
+]
+
+OPEN_STATES = ['1', '2', '3']
+RESOLVED_STATES = ['6', '7']
+
+CLOSE_CODES = ['Solved (Permanently)', 'Solved (Work Around)', 'Solved Remotely (Permanently)']
+
+# Several callers reporting one outage in their own words
+STORM_PREFIXES = ['', 'URGENT: ', 'Users report: ', 'Monitoring alert - ', 'Multiple users: ', 'Store {n}: ']
+
+LOG_LEVELS = ['INFO', 'INFO', 'INFO', 'WARN', 'ERROR']
+LOG_MESSAGES = [
+    'GET /api/v2/orders 200 {ms}ms',
+    'health check ok pool=primary active={n}',
+    'Connection to {ci} timed out after 30000ms',
+    'Retrying request attempt={n}',
+    'HikariPool-1 - Connection is not available, request timed out after 30001ms',
+    'Session expired for user u{n}',
+]
+STACK_TRACE = [
+    'java.sql.SQLTransientConnectionException: HikariPool-1 - Connection is not available',
+    '\tat com.zaxxer.hikari.pool.HikariPool.createTimeoutException(HikariPool.java:696)',
+    '\tat com.zaxxer.hikari.pool.HikariPool.getConnection(HikariPool.java:197)',
+    '\tat com.acme.erp.orders.OrderRepository.find(OrderRepository.java:88)',
+    '\tat com.acme.erp.orders.OrderService.load(OrderService.java:142)',
+    '\t... 57 more',
+]
+
+
+def sys_id(i, prefix=0) -> str:
+    return f"{prefix:08x}{i:024x}"
+
+
+def ci_sys_id(ci) -> str:
+    return hashlib.md5(ci.encode()).hexdigest()
+
+
+def ci_variant(template, rng) -> str:
+    """One of the four instances of the template's CI (ERP-DB-01 .. ERP-DB-04)"""
+    return f"{template['ci'][:-2]}{rng.randint(1, 4):02d}"
+
+
+def log_block(rng, ci, lines) -> str:
+    """`lines` of application log around a failure, with a stack trace in the middle"""
+
+    start = datetime(2024, 3, 1, 9, 0, 0) + timedelta(seconds=rng.randrange(86400))
+    out = []
+    trace_at = lines // 2
+    for i in range(lines):
+        stamp = (start + timedelta(milliseconds=250 * i)).strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+        if i == trace_at:
+            out.append(f"{stamp} ERROR [http-nio-8080-exec-{rng.randint(1, 40)}] {STACK_TRACE[0]}")
+            out.extend(STACK_TRACE[1:])
+            continue
+        message = rng.choice(LOG_MESSAGES).format(ci=ci, ms=rng.randint(3, 900), n=rng.randint(1, 50))
+        out.append(f"{stamp} {rng.choice(LOG_LEVELS):<5} [http-nio-8080-exec-{rng.randint(1, 40)}] {message}")
+    return '\n'.join(out)
+
+
+def work_notes(rng, template, entries=3) -> str:
+    """A short work-notes journal in the instance's display format"""
+    lines = []
+    for i in range(entries):
+        lines.append(f"2024-01-{(i % 28) + 1:02d} 10:{rng.randrange(60):02d}:00 - Support Engineer (Work notes)")
+        lines.append(rng.choice([
+            'Checked monitoring and application logs.',
+            'Escalated to the platform team.',
+            f"Investigating {template['ci']}; issue reproduced.",
+            'Engaged vendor support.',
+        ]))
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def incident_record(i, template, state, rng, created=None) -> Dict[str, Any]:
+    """One incident from a template"""
+
+    ci = template['ci']
+    created = created or datetime(2024, 1, 1) + timedelta(minutes=17 * i)
+    resolved = state in RESOLVED_STATES
+    return {
+        'sys_id': sys_id(i),
+        'number': f"INC{i + 1:07d}",
+        'short_description': rng.choice(template['short']).format(ci=ci),
+        'description': template['description'].format(ci=ci),
+        'category': template['category'],
+        'subcategory': template['subcategory'],
+        'cmdb_ci': ci_sys_id(ci),
+        'priority': str(rng.choice([1, 2, 3, 3, 4])),
+        'state': state,
+        'close_notes': template['close_notes'].format(ci=ci) if resolved else '',
+        'work_notes': work_notes(rng, template, rng.randint(1, 4)),
+        'assignment_group': '',
+        'sys_created_on': created.strftime('%Y-%m-%d %H:%M:%S'),
+        'sys_updated_on': (created + timedelta(hours=rng.randint(1, 48) if resolved else 0)).strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+def incident_corpus(n, open_ratio=0.1, seed=42) -> List[Dict[str, Any]]:
+    """`n` incidents, `open_ratio` of them open (the rest resolved/closed history)"""
+
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        template = rng.choice(TEMPLATES)
+        state = rng.choice(OPEN_STATES) if rng.random() < open_ratio else rng.choice(RESOLVED_STATES)
+        records.append(incident_record(i, template, state, rng))
+    return records
+
+
+def creation_payload(template, rng, ci, state, short=None, log_lines=0) -> Dict[str, Any]:
+    """Fields to POST to the incident table for one generated incident"""
+
+    description = template['description'].format(ci=ci)
+    if log_lines:
+        description += f"\n\nLog excerpt from {ci}:\n{log_block(rng, ci, log_lines)}"
+    payload = {
+        'short_description': short or rng.choice(template['short']).format(ci=ci),
+        'description': description,
+        'category': template['category'],
+        'subcategory': template['subcategory'],
+        'cmdb_ci': ci_sys_id(ci),
+        'priority': str(rng.choice([1, 2, 3, 3, 4])),
+        'state': state,
+        'assignment_group': '',
+    }
+    if state in RESOLVED_STATES:
+        # ServiceNow requires both to resolve or close an incident
+        payload['close_code'] = rng.choice(CLOSE_CODES)
+        payload['close_notes'] = template['close_notes'].format(ci=ci)
+        payload['work_notes'] = work_notes(rng, dict(template, ci=ci), rng.randint(1, 4))
+    return payload
+
+
+def generate_incidents(count, storm_share=0.2, storm_size=(5, 30), log_share=0.3, log_lines=200,
+                       resolved_share=0.5, seed=42) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(kind, payload) for `count` incidents; kind is 'storm', 'history' or 'single'
+
+    Storms are runs of open incidents on one CI reporting the same outage in
+    different words, emitted back to back as they would arrive. Of the
+    remaining incidents `resolved_share` are resolved/closed history; any
+    incident's description carries a pasted log with probability `log_share`.
+    """
+
+    rng = random.Random(seed)
+    produced = 0
+    while produced < count:
+        template = rng.choice(TEMPLATES)
+        ci = ci_variant(template, rng)
+        if rng.random() < storm_share / (sum(storm_size) / 2):
+            # Start a storm: expected storm incidents ~ storm_share of the total
+            size = min(rng.randint(*storm_size), count - produced)
+            base = rng.choice(template['short']).format(ci=ci)
+            for n in range(size):
+                short = rng.choice(STORM_PREFIXES).format(n=rng.randint(100, 999)) + base
+                logs = log_lines if rng.random() < log_share else 0
+                yield 'storm', creation_payload(template, rng, ci, rng.choice(OPEN_STATES), short, logs)
+            produced += size
+            continue
+
+        resolved = rng.random() < resolved_share
+        state = rng.choice(RESOLVED_STATES) if resolved else rng.choice(OPEN_STATES)
+        logs = log_lines if rng.random() < log_share else 0
+        yield ('history' if resolved else 'single'), creation_payload(template, rng, ci, state, log_lines=logs)
+        produced += 1
@@ -0,0 +1,60 @@
+"""
+In-process ServiceNow and Groq stand-ins for end-to-end tests
+
+Wraps scripts/fake_servicenow_server.py and scripts/fake_groq_server.py and
+points the enrichment configuration at them, the way scripts/bench_load.py
+does.
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, 'scripts'))
+
+import fake_groq_server  # noqa: E402
+import fake_servicenow_server  # noqa: E402
+
+# Settings that would make a test depend on files outside it
+LOCAL_PATHS = ('CIIA_INCIDENT_STORE', 'CIIA_SEARCH_INDEX', 'CIIA_VECTOR_INDEX', 'CIIA_FINGERPRINT_PATH',
+               'CIIA_LLM_CACHE_PATH', 'CIIA_JOB_QUEUE_PATH')
+
+
+@contextmanager
+def running(incidents=300, groq_latency=0.0, **env):
+    """Yields (api.enrich module, fake ServiceNow state) with `env` set on top of the stand-ins"""
+
+    snow, snow_state = fake_servicenow_server.serve(port=0, incidents=incidents, latency=0.0, open_ratio=0.2)
+    groq, _ = fake_groq_server.serve(port=0, rpm=100000, tpm=100000000, latency=groq_latency)
+    saved = dict(os.environ)
+    for name in LOCAL_PATHS:
+        os.environ.pop(name, None)
+    os.environ.update({
+        'SNOW_INSTANCE': f"http://127.0.0.1:{snow.server_port}",
+        'SNOW_USER': 'test',
+        'SNOW_PASSWORD': 'test',
+        'GROQ_API_KEY': 'test',
+        'GROQ_BASE_URL': f"http://127.0.0.1:{groq.server_port}",
+        'CIIA_TIMING_LOG': '0',
+        'CIIA_LLM_CACHE_SIZE': '0',
+        'CIIA_CANDIDATE_CACHE_MB': '0',
+    })
+    os.environ.update(env)
+
+    from api import enrich
+    enrich._config = None
+    try:
+        yield enrich, snow_state
+    finally:
+        enrich._config = None
+        os.environ.clear()
+        os.environ.update(saved)
+        snow.shutdown()
+        groq.shutdown()
+
+
+def open_incidents(snow_state):
+    """sys_ids of the stand-in's open incidents"""
+    return [r['sys_id'] for r in snow_state.records.values() if r['state'] in ('1', '2', '3')]
@@ -0,0 +1,70 @@
+"""
+Single-flight waits in the candidate cache
+"""
+
+import threading
+import time
+
+import pytest
+
+from ciia.candidate_cache import MISS, SHARED, CandidateCache
+from ciia.deadline import DeadlineExceeded
+
+
+def owned_by_slow_fetch(cache, key, outcome):
+    """Start a fetch of `key` that holds the single flight until released"""
+    release = threading.Event()
+
+    def slow():
+        release.wait(5)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def own():
+        try:
+            cache.get(key, slow)
+        except Exception:
+            pass
+
+    owner = threading.Thread(target=own)
+    owner.start()
+    while key not in cache._pending:
+        time.sleep(0.01)
+    return release, owner
+
+
+def test_waiter_shares_owner_result():
+    cache = CandidateCache()
+    release, owner = owned_by_slow_fetch(cache, 'k', [{'n': 'owner'}])
+    threading.Timer(0.05, release.set).start()
+    assert cache.get('k', lambda: [{'n': 'own'}], timeout=lambda: 5) == ([{'n': 'owner'}], SHARED)
+    owner.join()
+
+
+def test_waiter_fetches_itself_when_its_budget_runs_out():
+    cache = CandidateCache()
+    release, owner = owned_by_slow_fetch(cache, 'k', [{'n': 'owner'}])
+    started = time.monotonic()
+    assert cache.get('k', lambda: [{'n': 'own'}], timeout=lambda: 0.05) == ([{'n': 'own'}], MISS)
+    assert time.monotonic() - started < 1
+    assert cache.counters['shared_fallbacks'] == 1
+    release.set()
+    owner.join()
+
+
+def test_waiter_does_not_inherit_owner_deadline():
+    cache = CandidateCache()
+    release, owner = owned_by_slow_fetch(cache, 'k', DeadlineExceeded('owner out of time'))
+    threading.Timer(0.05, release.set).start()
+    assert cache.get('k', lambda: [{'n': 'own'}], timeout=lambda: 5) == ([{'n': 'own'}], MISS)
+    owner.join()
+
+
+def test_waiter_shares_other_owner_failures():
+    cache = CandidateCache()
+    release, owner = owned_by_slow_fetch(cache, 'k', RuntimeError('ServiceNow down'))
+    threading.Timer(0.05, release.set).start()
+    with pytest.raises(RuntimeError):
+        cache.get('k', lambda: [{'n': 'own'}], timeout=lambda: 5)
+    owner.join()
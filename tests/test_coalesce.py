@@ -0,0 +1,78 @@
+"""
+Request coalescing and forced re-enrichment
+"""
+
+import threading
+import time
+
+import pytest
+
+from stand_ins import open_incidents, running
+
+from ciia.coalesce import SingleFlight
+
+
+def test_fresh_call_skips_recent_result():
+    flight = SingleFlight(window=10)
+    assert flight.do('inc', lambda: 'first') == ('first', None)
+    assert flight.do('inc', lambda: 'second') == ('first', 'recent')
+    assert flight.do('inc', lambda: 'forced', fresh=True) == ('forced', None)
+    # Later triggers in the window reuse the forced run
+    assert flight.do('inc', lambda: 'third') == ('forced', 'recent')
+
+
+def test_fresh_call_does_not_join_in_flight_run():
+    flight = SingleFlight(window=10)
+    release = threading.Event()
+    results = []
+
+    def slow():
+        release.wait(5)
+        return 'slow'
+
+    worker = threading.Thread(target=lambda: results.append(flight.do('inc', slow)))
+    worker.start()
+    time.sleep(0.05)
+    assert flight.do('inc', lambda: 'forced', fresh=True) == ('forced', None)
+    release.set()
+    worker.join()
+    assert results == [('slow', None)]
+
+
+@pytest.fixture(scope='module')
+def stand_ins():
+    with running(CIIA_COALESCE_WINDOW='10') as context:
+        yield context
+
+
+def test_force_within_coalescing_window_patches_again(stand_ins):
+    enrich, snow_state = stand_ins
+    credentials = enrich.enrichment_credentials()
+    sys_id = open_incidents(snow_state)[0]
+    updates = snow_state.counters['update']
+
+    first = enrich.IncidentEnricher().enrich_incident(sys_id, *credentials)
+    assert first['status'] == 'success'
+    assert snow_state.counters['update'] == updates + 1
+
+    repeat = enrich.IncidentEnricher().enrich_incident(sys_id, *credentials)
+    assert repeat['coalesced'] == 'recent'
+    assert snow_state.counters['update'] == updates + 1
+
+    forced = enrich.IncidentEnricher().enrich_incident(sys_id, *credentials, force=True)
+    assert forced['status'] == 'success'
+    assert 'coalesced' not in forced
+    assert snow_state.counters['update'] == updates + 2
+
+
+def test_forced_batch_member_patches_again(stand_ins):
+    enrich, snow_state = stand_ins
+    credentials = enrich.enrichment_credentials()
+    sys_id = open_incidents(snow_state)[1]
+    updates = snow_state.counters['update']
+
+    enrich.IncidentEnricher().enrich_batch([sys_id], *credentials)
+    forced = enrich.IncidentEnricher().enrich_batch([sys_id], *credentials, force=True)
+    assert forced['results'][0]['status'] == 'success'
+    assert 'coalesced' not in forced['results'][0]
+    assert snow_state.counters['update'] == updates + 2
@@ -0,0 +1,57 @@
+"""
+Health checks stay light with the local store and vector index configured
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from stand_ins import ROOT
+
+from ciia.incident_store import IncidentStore
+from ciia.vector_index import VectorIndex
+
+# Fresh interpreter: import the handler, serve one GET, report what got loaded
+CHILD = r'''
+import io, json, sys
+sys.path.insert(0, sys.argv[1])
+from api.enrich import handler
+
+class Probe(handler):
+    def __init__(self):
+        self.path = '/api/enrich'
+        self.wfile = io.BytesIO()
+        self.sent = None
+    def send_response(self, code, message=None):
+        self.code = code
+    def send_header(self, *args):
+        pass
+    def end_headers(self):
+        pass
+
+probe = Probe()
+probe.do_GET()
+body = json.loads(probe.wfile.getvalue())
+heavy = [m for m in ('numpy', 'groq', 'httpx', 'requests') if m in sys.modules]
+print(json.dumps({'code': probe.code, 'heavy': heavy, 'keys': sorted(body)}))
+'''
+
+
+def test_health_check_loads_no_heavy_dependency(tmp_path):
+    records = [{'sys_id': f"inc{i}", 'state': '7', 'number': f"INC{i:07d}", 'sys_updated_on': '2026-01-01 00:00:00',
+                'short_description': f"disk full on host {i}", 'description': '', 'close_notes': 'cleaned /var'}
+               for i in range(20)]
+    store_path = str(tmp_path / 'incidents.db')
+    IncidentStore(store_path).commit_page(IncidentStore(store_path)._connect(), records,
+                                          ('2026-01-01 00:00:00', 'inc19'))
+    vector_path = str(tmp_path / 'vectors.db')
+    VectorIndex(vector_path).build(records)
+
+    env = dict(os.environ, CIIA_INCIDENT_STORE=store_path, CIIA_VECTOR_INDEX=vector_path)
+    out = subprocess.run([sys.executable, '-c', CHILD, ROOT], env=env, capture_output=True, text=True, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert result['code'] == 200
+    assert 'incident_store' in result['keys'] and 'vector_index' in result['keys']
+    assert result['heavy'] == []
@@ -0,0 +1,33 @@
+"""
+Time budgets of synchronous requests vs. async jobs
+"""
+
+import pytest
+
+from stand_ins import open_incidents, running
+
+
+@pytest.fixture(scope='module')
+def stand_ins():
+    # A request budget far too short for the batch below, and a slow Groq
+    with running(groq_latency=0.5, CIIA_DEADLINE_S='1', CIIA_BATCH_CONCURRENCY='4') as context:
+        yield context
+
+
+def test_async_batch_job_is_not_bound_by_request_deadline(stand_ins):
+    enrich, snow_state = stand_ins
+    batch = open_incidents(snow_state)[:12]
+
+    result = enrich.run_enrichment_job({'incident_sys_id': 'batch:12', 'payload': {'incident_sys_ids': batch}})
+    assert result['deadline']['budget_s'] is None
+    assert [r['status'] for r in result['results']] == ['success'] * 12
+
+
+def test_sync_request_keeps_request_deadline(stand_ins):
+    enrich, snow_state = stand_ins
+    batch = open_incidents(snow_state)[12:24]
+
+    result = enrich.IncidentEnricher().enrich_batch(batch, *enrich.enrichment_credentials(),
+                                                    deadline=enrich.new_deadline())
+    assert result['deadline']['budget_s'] == 1
+    assert any(r.get('not_started') for r in result['results'])
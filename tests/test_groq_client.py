@@ -0,0 +1,110 @@
+"""
+Groq admission control: token buckets, AIMD concurrency, rate-limit headers
+"""
+
+import time
+
+import pytest
+
+from stand_ins import fake_groq_server
+
+from ciia.groq_client import GroqScheduler, RateLimitedGroq, RateLimitQueueTimeout, TokenBucket
+
+MESSAGES = [{'role': 'user', 'content': 'Analyse INC0000001: VPN disconnects'}]
+
+
+def test_token_bucket_refills_at_its_per_minute_rate():
+    bucket = TokenBucket(60)
+    now = time.monotonic()
+    bucket.take(60, now)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == pytest.approx(0.0)
+
+    bucket.refund(30, now + 1.0)
+    assert bucket.level == pytest.approx(31.0)
+    # Never above capacity, and a request larger than it only waits for a full bucket
+    bucket.refund(1000, now + 1.0)
+    assert bucket.level == 60.0
+    assert bucket.wait_time(500, now + 1.0) == 0.0
+
+
+def test_throttling_halves_the_window_and_successes_grow_it_back():
+    scheduler = GroqScheduler(rpm=1000, tpm=1000000, max_concurrency=8)
+    scheduler.limit = 4.0
+
+    scheduler.acquire(10)
+    scheduler.release(10, throttled=True, retry_after=0.01)
+    assert scheduler.limit == 2.0
+    assert scheduler.counters['throttled'] == 1
+
+    # Additive increase: +1/limit per success
+    time.sleep(0.02)
+    scheduler.acquire(10)
+    scheduler.release(10, used_tokens=5)
+    assert scheduler.limit == pytest.approx(2.5)
+    scheduler.acquire(10)
+    scheduler.release(10, used_tokens=5)
+    assert scheduler.limit == pytest.approx(2.9)
+    assert scheduler.in_flight == 0
+
+
+def test_rate_limit_headers_replace_the_configured_budget():
+    scheduler = GroqScheduler(rpm=1000, tpm=6000, max_concurrency=8)
+    scheduler.limit = 4.0
+
+    scheduler.acquire(100)
+    scheduler.release(100, used_tokens=100, headers={
+        'x-ratelimit-limit-tokens': '12000',
+        'x-ratelimit-remaining-tokens': '3000',
+        'x-ratelimit-reset-tokens': '7.5s',
+        'x-ratelimit-remaining-requests': '500',
+    })
+    assert scheduler.tokens.capacity == 12000
+    assert scheduler.tokens.level <= 3000
+    # The 9000-token deficit is back within the 7.5s reset
+    assert scheduler.tokens.rate >= 9000 / 7.5
+    assert scheduler.stats()['tpm'] == 12000
+    assert scheduler.limit > 4.0
+
+    # An exhausted daily request budget halves the window and blocks until its reset
+    scheduler.acquire(100)
+    scheduler.release(100, used_tokens=100, headers={
+        'x-ratelimit-remaining-requests': '0',
+        'x-ratelimit-reset-requests': '2m',
+    })
+    assert scheduler.limit < 4.0
+    with pytest.raises(RateLimitQueueTimeout):
+        scheduler.acquire(100, deadline=time.monotonic() + 0.1)
+
+
+def test_stream_past_its_timeout_returns_truncated_text():
+    groq, state = fake_groq_server.serve(port=0, latency=0.0, completion_tokens=200, tokens_per_s=20.0,
+                                         rpm=1000, tpm=1000000)
+    try:
+        client = RateLimitedGroq('test', GroqScheduler(rpm=1000, tpm=1000000),
+                                 base_url=f"http://127.0.0.1:{groq.server_port}")
+        deltas = []
+        started = time.monotonic()
+        content, stats = client.stream(MESSAGES, 'fake', 0.2, 200, deltas.append, timeout=0.5)
+        assert time.monotonic() - started < 2.0
+        assert stats['truncated']
+        assert content and content == ''.join(deltas)
+        assert len(deltas) < 200
+    finally:
+        groq.shutdown()
+
+
+def test_server_429_throttles_the_scheduler():
+    # rpm=0: the stand-in answers every call with a 429 and retry-after
+    groq, state = fake_groq_server.serve(port=0, latency=0.0, rpm=0, tpm=1000000)
+    try:
+        scheduler = GroqScheduler(rpm=1000, tpm=1000000)
+        client = RateLimitedGroq('test', scheduler, base_url=f"http://127.0.0.1:{groq.server_port}")
+        with pytest.raises(RateLimitQueueTimeout):
+            client.complete(MESSAGES, 'fake', 0.2, 50, timeout=0.5)
+        assert state.throttled == 1 and state.served == 0
+        assert scheduler.counters['throttled'] == 1
+        assert scheduler.stats()['concurrency_limit'] == 1.0
+        assert scheduler.in_flight == 0
+    finally:
+        groq.shutdown()
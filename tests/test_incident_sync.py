@@ -0,0 +1,57 @@
+"""
+Watermark sync into the local incident store
+"""
+
+import time
+
+from stand_ins import fake_servicenow_server
+
+from ciia.incident_store import IncidentStore
+from ciia.incident_sync import IncidentSync
+
+
+def stored(store):
+    with store._connect() as conn:
+        return {row[0] for row in conn.execute("SELECT sys_id FROM incident_docs")}
+
+
+def test_reopened_incident_leaves_the_store(tmp_path):
+    snow, snow_state = fake_servicenow_server.serve(port=0, incidents=200, latency=0.0, open_ratio=0.2)
+    try:
+        store = IncidentStore(str(tmp_path / 'incidents.db'))
+        sync = IncidentSync(store, f"http://127.0.0.1:{snow.server_port}", 'test', 'test', page_size=50)
+        sync.run()
+
+        resolved = [r['sys_id'] for r in snow_state.records.values() if r['state'] in ('6', '7')]
+        assert stored(store) == set(resolved)
+
+        # sys_updated_on has one-second resolution: land the change after the watermark
+        time.sleep(1.1)
+        snow_state.update(resolved[0], {'state': '2'})
+        assert sync.run()['records'] >= 1
+
+        assert stored(store) == set(resolved[1:])
+        assert store.resolution_for(resolved[0]) is None
+        assert store.sync_metrics()['seconds_since_sync'] is not None
+    finally:
+        snow.shutdown()
+
+
+def test_partial_run_does_not_mark_the_store_fresh(tmp_path):
+    snow, snow_state = fake_servicenow_server.serve(port=0, incidents=200, latency=0.0, open_ratio=0.2)
+    try:
+        store = IncidentStore(str(tmp_path / 'incidents.db'))
+        sync = IncidentSync(store, f"http://127.0.0.1:{snow.server_port}", 'test', 'test', page_size=50)
+
+        partial = sync.run(max_pages=1)
+        assert partial['pages'] == 1 and not partial['caught_up']
+        assert store.sync_metrics()['caught_up'] is False
+        assert store.sync_metrics()['seconds_since_sync'] is None
+        assert not store.usable(24)
+
+        assert sync.run()['caught_up']
+        assert store.sync_metrics()['caught_up'] is True
+        assert store.sync_metrics()['seconds_since_sync'] is not None
+        assert store.usable(24)
+    finally:
+        snow.shutdown()
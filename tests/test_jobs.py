@@ -0,0 +1,58 @@
+"""
+SQLite job queue leases and worker recovery
+"""
+
+import time
+
+from ciia.jobs import FAILED, RUNNING, SUCCEEDED, SQLiteJobQueue, WorkerPool
+
+
+def test_job_of_dead_worker_is_claimed_again(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.db'), lease_s=0.2)
+    job = queue.enqueue('inc1')
+
+    # The first worker claims the job and dies without finishing it
+    claimed = queue.claim('dead', timeout=0)
+    assert claimed['job_id'] == job['job_id'] and claimed['attempts'] == 1
+    assert queue.claim('live', timeout=0) is None
+
+    time.sleep(0.3)
+    reclaimed = queue.claim('live', timeout=0)
+    assert reclaimed['job_id'] == job['job_id']
+    assert reclaimed['worker'] == 'live' and reclaimed['attempts'] == 2
+
+    # A late result of the first claim no longer counts
+    queue.finish(job['job_id'], error='stale', worker='dead')
+    assert queue.get(job['job_id'])['status'] == RUNNING
+    queue.finish(job['job_id'], result={'status': 'success'}, worker='live')
+    assert queue.get(job['job_id'])['status'] == SUCCEEDED
+
+
+def test_job_fails_after_max_attempts(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.db'), lease_s=0.05, max_attempts=2)
+    job = queue.enqueue('inc1')
+    for worker in ('dead1', 'dead2'):
+        assert queue.claim(worker, timeout=0)['job_id'] == job['job_id']
+        time.sleep(0.1)
+
+    assert queue.claim('live', timeout=0) is None
+    failed = queue.get(job['job_id'])
+    assert failed['status'] == FAILED and failed['attempts'] == 2
+    assert 'Lease expired' in failed['error']
+
+
+def test_pool_renews_lease_of_long_job(tmp_path):
+    queue = SQLiteJobQueue(str(tmp_path / 'jobs.db'), lease_s=0.3)
+    job = queue.enqueue('inc1')
+    pool = WorkerPool(queue, lambda job: time.sleep(1.0) or {'status': 'success'}, workers=1).start()
+    try:
+        time.sleep(0.6)
+        # Past the first lease, but the heartbeat kept it
+        assert queue.claim('other', timeout=0) is None
+        deadline = time.time() + 5
+        while queue.get(job['job_id'])['status'] != SUCCEEDED and time.time() < deadline:
+            time.sleep(0.05)
+        finished = queue.get(job['job_id'])
+        assert finished['status'] == SUCCEEDED and finished['attempts'] == 1
+    finally:
+        pool.stop()
@@ -0,0 +1,52 @@
+"""
+Single-pass keyword extraction against the original multi-regex extractor
+"""
+
+from stand_ins import ROOT  # noqa: F401  (puts scripts/ on sys.path)
+
+from bench_keywords import legacy_matches, log_dump
+
+from ciia.keywords import MAX_SCAN_CHARS, bounded_text, extract_keywords
+
+# (short description, description, single-pass top 5)
+CORPUS = [
+    ("SAP login timeout", "Users get ERROR: 401 when logging into SAP since 9am",
+     ['SAP', 'ERROR: 401', 'LOGIN', 'TIMEOUT']),
+    ("Outlook crash", "Outlook crashes on start, event 0x8007045D in the log",
+     ['CRASH', '0X8007045D']),
+    ("Payments API returns 503", "HTTP 503 from the PAYMENTS gateway; database connection refused",
+     ['API', 'HTTP 503', 'PAYMENTS', 'DATABASE', 'CONNECTION']),
+    ("VPN slow", "latency above 300ms on the VPN, no errors",
+     ['VPN', 'SLOW', 'LATENCY', 'ERROR']),
+    ("ERW login timeout - users unable to access", log_dump(3000),
+     ['CONNECTION', 'LOGIN', 'ERW1234', 'ERROR 53300', 'AUTH']),
+]
+
+
+def test_ranked_output_on_a_fixed_corpus():
+    for short_description, description, expected in CORPUS:
+        assert extract_keywords(short_description, description) == expected
+
+
+def test_keywords_are_ones_the_original_extractor_found():
+    for short_description, description, expected in CORPUS:
+        baseline = ' | '.join(legacy_matches(short_description, description))
+        for keyword in expected:
+            # Hex codes are the one kind the original patterns never matched
+            if not keyword.startswith('0X'):
+                assert keyword in baseline, (keyword, baseline)
+
+
+def test_long_descriptions_are_scanned_at_head_and_tail_only():
+    filler = "nothing to see here " * (MAX_SCAN_CHARS // 10)
+    description = "SAP down. " + filler + " ORA600 in the middle " + filler + " last line ERW1234"
+    scanned = bounded_text(description)
+    assert len(scanned) == MAX_SCAN_CHARS + 1
+    assert scanned.startswith("SAP down.") and scanned.endswith("ERW1234")
+    assert 'ORA600' not in scanned
+
+    keywords = extract_keywords("Portal outage", description)
+    assert 'SAP' in keywords and 'ERW1234' in keywords
+    assert 'ORA600' not in keywords
+    # Scanning everything finds the middle too
+    assert 'ORA600' in extract_keywords("Portal outage", description, max_chars=len(description))
@@ -0,0 +1,61 @@
+"""
+LLM analysis cache keys and expiry
+"""
+
+from ciia import llm_cache
+from ciia.llm_cache import LLMCache, cache_key
+
+MESSAGES = [{'role': 'system', 'content': 'You are an ITSM analyst.'},
+            {'role': 'user', 'content': 'INC0000001: VPN disconnects – café Wi-Fi'}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def time(self):
+        return self.now
+
+
+def test_cache_key_is_stable_and_covers_the_request():
+    key = cache_key('llama-3.3-70b-versatile', MESSAGES, 0.2, 800)
+    # Same request built independently (dict order does not matter)
+    rebuilt = [dict(reversed(list(m.items()))) for m in MESSAGES]
+    assert cache_key('llama-3.3-70b-versatile', rebuilt, 0.2, 800) == key
+    assert len(key) == 64 and int(key, 16) >= 0
+
+    assert cache_key('llama-3.1-8b-instant', MESSAGES, 0.2, 800) != key
+    assert cache_key('llama-3.3-70b-versatile', MESSAGES, 0.3, 800) != key
+    assert cache_key('llama-3.3-70b-versatile', MESSAGES, 0.2, 400) != key
+    assert cache_key('llama-3.3-70b-versatile', MESSAGES[1:], 0.2, 800) != key
+
+
+def test_entries_expire_after_the_ttl_in_both_tiers(tmp_path, monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, 'time', clock)
+    path = str(tmp_path / 'llm.db')
+    cache = LLMCache(ttl=60, path=path)
+    key = cache_key('m', MESSAGES, 0.2)
+    cache.put(key, 'analysis', model='m')
+
+    clock.now += 59
+    assert cache.get(key) == 'analysis'
+    # Another instance reads the disk tier, keeping the original creation time
+    other = LLMCache(ttl=60, path=path)
+    assert other.get(key) == 'analysis'
+    assert other.counters['disk_hits'] == 1
+
+    clock.now += 2
+    assert cache.get(key) is None
+    assert other.get(key) is None
+    assert cache.counters['expirations'] >= 1 and other.counters['expirations'] >= 1
+    assert LLMCache(ttl=60, path=path).get(key) is None
+
+
+def test_zero_ttl_never_expires(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(llm_cache, 'time', clock)
+    cache = LLMCache(ttl=0)
+    cache.put('k', 'analysis')
+    clock.now += 10 * 365 * 86400
+    assert cache.get('k') == 'analysis'
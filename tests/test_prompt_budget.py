@@ -0,0 +1,78 @@
+"""
+Token-budgeted prompt compaction
+"""
+
+from ciia.prompt_budget import estimate_tokens, fit_prompt
+
+PROSE = "Users on floor 3 report the ordering portal fails at checkout since 09:00."
+TRACE = '\n'.join(
+    [PROSE]
+    + ["2026-01-01 09:00:%02d INFO request served in 12ms path=/cart" % i for i in range(40)]
+    + ["2026-01-01 09:01:00 ERROR java.sql.SQLException: connection pool exhausted",
+       "    at com.shop.db.Pool.borrow(Pool.java:88)",
+       "    at com.shop.db.Pool.get(Pool.java:41)",
+       "    at com.shop.cart.Checkout.run(Checkout.java:120)",
+       "    at com.shop.cart.Checkout.main(Checkout.java:12)"]
+)
+
+
+def resolution(i, text):
+    return {'incident_number': f"INC{i:07d}", 'resolution': text, 'root_cause': '', 'workaround': ''}
+
+
+RESOLUTIONS = [resolution(1, 'Raised the pool size to 200'), resolution(2, 'Raised the pool size to 200'),
+               resolution(3, 'Restarted the app servers ' * 10), resolution(4, 'Rolled back the release ' * 10)]
+SIMILAR = [{'number': f"INC{i:07d}", 'short_description': f"checkout failing with pool errors, case {i} " * 4}
+           for i in range(10, 16)]
+
+
+def render(description, resolutions, similar):
+    sections = {
+        'description': description,
+        'resolutions': '\n'.join(f"{r['incident_number']}: {r['resolution']}" for r in resolutions),
+        'similar': '\n'.join(f"{s['number']}: {s['short_description']}" for s in similar),
+    }
+    prompt = "Analyse this incident.\n\n" + '\n\n'.join(sections.values())
+    return prompt, sections
+
+
+def test_generous_budget_only_dedupes():
+    prompt, report = fit_prompt(render, TRACE, RESOLUTIONS, SIMILAR, 100000)
+    assert report['compactions'] == ['deduped resolutions 4->3']
+    assert 'INC0000001 (also INC0000002)' in prompt
+    assert report['within_budget']
+
+
+def test_compactions_run_in_priority_order_until_within_budget():
+    full = estimate_tokens(render(TRACE, RESOLUTIONS, SIMILAR)[0])
+    budget = full // 4
+    prompt, report = fit_prompt(render, TRACE, RESOLUTIONS, SIMILAR, budget)
+
+    # Dedupe, signature lines, then whole similar incidents: no resolution dropped, nothing truncated
+    assert report['compactions'] == ['deduped resolutions 4->3', 'description reduced to signature lines',
+                                     'similar incidents 6->1']
+
+    assert report['within_budget']
+    assert report['estimated_tokens'] == estimate_tokens(prompt) <= budget
+    assert sum(report['sections'].values()) == report['estimated_tokens']
+    # The signature lines survive, the repeated INFO lines do not
+    assert 'connection pool exhausted' in prompt
+    assert 'request served' not in prompt
+
+
+def test_truncation_is_the_last_resort():
+    huge = "Checkout broken. " + "The customer pasted a very long narrative without any log lines. " * 200
+    budget = 400
+    prompt, report = fit_prompt(render, huge, RESOLUTIONS, SIMILAR, budget)
+
+    assert report['compactions'] == ['deduped resolutions 4->3', 'description reduced to signature lines',
+                                     'similar incidents 6->0', 'resolutions 3->0',
+                                     'description truncated to ~393 tokens']
+    assert report['within_budget'] and report['estimated_tokens'] <= budget
+    assert '[... truncated]' in prompt
+
+
+def test_zero_budget_is_unlimited():
+    prompt, report = fit_prompt(render, TRACE, RESOLUTIONS, SIMILAR, 0)
+    assert report['within_budget']
+    assert report['compactions'] == ['deduped resolutions 4->3']
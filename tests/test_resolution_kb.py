@@ -0,0 +1,42 @@
+"""
+Resolution knowledge base lookups and write-through
+"""
+
+from ciia import resolution_kb
+from ciia.resolution_kb import ResolutionKB
+
+
+def incident(i):
+    return {'sys_id': f"inc{i}", 'number': f"INC{i:07d}", 'sys_updated_on': '2026-01-01 00:00:00',
+            'short_description': 'VPN disconnects', 'close_notes': 'Resolution: renewed the gateway certificate',
+            'work_notes': ''}
+
+
+def test_extraction_runs_outside_the_lock(tmp_path, monkeypatch):
+    kb = ResolutionKB(path=str(tmp_path / 'kb.db'))
+    held = []
+    extract = resolution_kb.extract_resolution
+
+    def spy(record):
+        held.append(kb._lock.locked())
+        return extract(record)
+
+    monkeypatch.setattr(resolution_kb, 'extract_resolution', spy)
+    records = [incident(i) for i in range(3)]
+    first = kb.resolutions(records)
+    assert held == [False] * 3
+
+    # Served from memory, then from SQLite by a fresh instance, without extracting again
+    assert kb.resolutions(records) == first
+    assert ResolutionKB(path=kb.path).resolutions(records) == first
+    assert len(held) == 3
+
+
+def test_records_without_sys_id_skip_the_disk_lookup(tmp_path):
+    kb = ResolutionKB(path=str(tmp_path / 'kb.db'))
+    statements = []
+    kb._disk().set_trace_callback(statements.append)
+    [found] = kb.resolutions([dict(incident(0), sys_id='')])
+    assert 'gateway certificate' in found['resolution']
+    assert not any('IN ()' in statement for statement in statements)
+    assert kb.counters['disk_errors'] == 0
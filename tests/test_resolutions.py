@@ -0,0 +1,57 @@
+"""
+Single-pass marker scanning over case-folded windows
+"""
+
+from ciia.resolutions import DEFAULT_MARKERS, MarkerScanner
+
+
+def brute_force(markers, text):
+    """(start, end, category, keyword) of every marker, one slice comparison at a time"""
+    found = []
+    for start in range(len(text)):
+        for category, keywords in markers.items():
+            for keyword in keywords:
+                if text[start:start + len(keyword)].lower() == keyword:
+                    found.append((start, start + len(keyword), category, keyword))
+    return sorted(found)
+
+
+def scanned(scanner, text):
+    return sorted((m.start, m.end, m.category, m.keyword) for m in scanner.finditer(text))
+
+
+def test_marker_straddling_a_window_boundary_is_found_once():
+    scanner = MarkerScanner(DEFAULT_MARKERS, window=16)
+    assert scanner.window == 16
+    # 'Resolved by' starts at 12 and ends at 23, across the boundary at 16
+    text = "Ticket note Resolved by restarting. Root cause: expired cert"
+    markers = scanned(scanner, text)
+    assert (12, 23, 'resolution', 'resolved by') in markers
+    assert markers == brute_force(DEFAULT_MARKERS, text)
+
+    # Every offset of a marker relative to the window gives the same result
+    for pad in range(40):
+        text = 'x' * pad + "FIXED BY patch; workaround: reboot; caused by disk"
+        assert scanned(scanner, text) == brute_force(DEFAULT_MARKERS, text)
+
+
+def test_window_never_smaller_than_the_longest_marker():
+    scanner = MarkerScanner(DEFAULT_MARKERS, window=2)
+    assert scanner.window == len('interim solution')
+    text = "an interim solution was applied, then Resolution: patched"
+    assert scanned(scanner, text) == brute_force(DEFAULT_MARKERS, text)
+
+
+def test_length_changing_case_folding_keeps_spans_exact():
+    # 'İ'.lower() is two characters, so the folded window is longer than the original
+    assert len('İ'.lower()) == 2
+    scanner = MarkerScanner(DEFAULT_MARKERS, window=16)
+    text = "İstanbul İİ office: Resolved by İT, root cause: İPv6 route"
+    markers = list(scanner.finditer(text))
+    assert sorted((m.start, m.end, m.category, m.keyword) for m in markers) == brute_force(DEFAULT_MARKERS, text)
+    for marker in markers:
+        assert text[marker.start:marker.end].lower() == marker.keyword
+
+    best = scanner.best_markers(text)
+    assert text[best['resolution'].start:].startswith('Resolved by')
+    assert text[best['root_cause'].start:].startswith('root cause:')
@@ -0,0 +1,23 @@
+"""
+Full-text index rebuilds seen by already open readers
+"""
+
+from ciia.search_index import IncidentSearchIndex
+
+
+def incidents(words, n):
+    return [{'sys_id': f"{words[0]}{i}", 'state': '7', 'number': f"INC{i:07d}",
+             'short_description': ' '.join(words), 'description': '', 'close_notes': 'restarted'}
+            for i in range(n)]
+
+
+def test_reader_sees_rebuild_by_another_instance(tmp_path):
+    path = str(tmp_path / 'search.db')
+    reader = IncidentSearchIndex(path)
+    IncidentSearchIndex(path).build(incidents(['printer', 'jammed'], 3))
+    assert len(reader.search(['printer'])) == 3
+
+    # Another instance (another process in production) swaps in a new build
+    IncidentSearchIndex(path).build(incidents(['vpn', 'disconnects'], 4))
+    assert reader.search(['printer']) == []
+    assert len(reader.search(['vpn'])) == 4
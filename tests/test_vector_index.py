@@ -0,0 +1,43 @@
+"""
+Vector index builds, swaps and incremental adds
+"""
+
+import glob
+
+from ciia.vector_index import VectorIndex
+
+
+def incidents(prefix, n, state='7'):
+    return [{'sys_id': f"{prefix}{i:04d}", 'state': state, 'number': f"INC{i:07d}",
+             'short_description': f"{prefix} database connection timeout on node {i}",
+             'description': f"{prefix} pool exhausted after failover {i % 7}"} for i in range(n)]
+
+
+def test_reader_keeps_its_build_across_a_rebuild(tmp_path):
+    path = str(tmp_path / 'vectors.db')
+    index = VectorIndex(path)
+    index.build(incidents('old', 50))
+    old_matrix, _, old_reader = index._load()
+
+    index.build(incidents('new', 80))
+
+    # The matrix and rows loaded before the swap still belong together
+    rows = old_reader.execute("SELECT COUNT(*) FROM vector_rows").fetchone()[0]
+    assert rows == len(old_matrix) == 50
+    # New lookups move to the new build, and the old matrix file is gone
+    results = index.search({'short_description': 'database connection timeout'}, limit=5)
+    assert results and all(r['sys_id'].startswith('new') for r in results)
+    assert len(index._load()[0]) == 80
+    assert glob.glob(f"{path}.*.f32") == [index.matrix_path]
+
+
+def test_add_drops_reopened_incidents(tmp_path):
+    index = VectorIndex(str(tmp_path / 'vectors.db'))
+    index.build(incidents('inc', 20))
+
+    reopened = incidents('inc', 3, state='2')
+    added, updated = index.add(reopened + incidents('more', 5))
+    assert (added, updated) == (5, 0)
+    assert index.count() == 22
+    results = index.search({'short_description': 'inc database connection timeout on node 1'}, limit=30)
+    assert not {r['sys_id'] for r in results} & {r['sys_id'] for r in reopened}